@@ -6,10 +6,18 @@ import types
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
-    # Also ensure the `api/` directory is importable for local imports like `from simple_connector import ...`
-    API_DIR = ROOT / "api"
-    if str(API_DIR) not in sys.path:
-        sys.path.insert(0, str(API_DIR))
+# Also ensure the `api/` directory is importable for local imports like `from simple_connector import ...`
+API_DIR = ROOT / "api"
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+# RAG helpers (`rag_memory`, `pgvector_store`) live in `agents/` and are imported flat as well
+AGENTS_DIR = ROOT / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.append(str(AGENTS_DIR))
+# Server helpers under `api/scripts/` (`query_engine`, ...) are imported flat by api_server.py
+SCRIPTS_DIR = API_DIR / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
 
 # Provide a minimal mock for `ollama` when running tests locally without the real package.
 if 'ollama' not in sys.modules:
@@ -0,0 +1,72 @@
+import json
+import os
+
+from agent_catalog import AgentCatalog
+
+
+def _make_agent(root, name, prompt=True):
+    path = root / name
+    (path / "prompts").mkdir(parents=True)
+    if prompt:
+        (path / "prompts" / "system.txt").write_text("You are " + name, encoding="utf-8")
+    return path
+
+
+def _bump(path, step=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + step * 1_000_000_000))
+
+
+def test_scan_detects_new_and_changed_agents(tmp_path):
+    agents = tmp_path / "agents"
+    _make_agent(agents, "CEO")
+    cfo = _make_agent(agents, "CFO", prompt=False)
+    catalog = AgentCatalog(str(tmp_path / "missing.json"), str(agents), cache_path=str(tmp_path / "cache.json"))
+    assert catalog.valid == {"ceo"}
+    assert not catalog.refresh()
+
+    (cfo / "prompts" / "system.txt").write_text("You are CFO", encoding="utf-8")
+    _bump(cfo / "prompts")
+    _make_agent(agents, "CTO")
+    _bump(agents)
+    assert catalog.refresh()
+    assert catalog.valid == {"ceo", "cfo", "cto"}
+
+
+def test_cache_seeds_new_workers_and_registry_wins(tmp_path):
+    agents = tmp_path / "agents"
+    _make_agent(agents, "CEO")
+    registry = tmp_path / "webui_agents.json"
+    cache = str(tmp_path / "cache.json")
+    AgentCatalog(str(registry), str(agents), cache_path=cache)
+
+    second = AgentCatalog(str(registry), str(agents), cache_path=cache)
+    assert second.valid == {"ceo"}
+
+    registry.write_text(json.dumps([{"code": "COO", "status": "active"}]), encoding="utf-8")
+    assert second.is_valid("coo")
+    assert second.valid == {"coo"}
+
+
+def test_falls_back_to_scan_when_registry_goes_away(tmp_path, monkeypatch):
+    agents = tmp_path / "agents"
+    _make_agent(agents, "CEO")
+    registry = tmp_path / "webui_agents.json"
+    registry.write_text(json.dumps([{"code": "COO", "status": "active"}]), encoding="utf-8")
+    catalog = AgentCatalog(str(registry), str(agents))
+    assert catalog.valid == {"coo"}
+
+    registry.write_text("not json", encoding="utf-8")
+    assert catalog.refresh()
+    assert catalog.valid == {"ceo"}
+
+    registry.write_text(json.dumps([{"code": "COO", "status": "active"}]), encoding="utf-8")
+    _bump(registry)
+    assert catalog.refresh() and catalog.valid == {"coo"}
+    registry.unlink()
+    assert catalog.refresh()
+    assert catalog.valid == {"ceo"}
+
+    monkeypatch.chdir(tmp_path)
+    AgentCatalog(str(registry), str(agents), cache_path="catalog.json")
+    assert (tmp_path / "catalog.json").exists()
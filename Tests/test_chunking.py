@@ -0,0 +1,32 @@
+from chunking import chunk_markdown, embedding_text, estimate_tokens
+
+
+def test_chunks_follow_headings_and_token_limit():
+    text = "# Plan\n\nIntro paragraph.\n\n## Budget\n\n" + "\n\n".join(
+        f"Line {i} about spending and forecasts for the quarter." for i in range(60)
+    ) + "\n\n## Hiring\n\nTwo engineers."
+    chunks = chunk_markdown(text, max_tokens=100, overlap_tokens=20)
+
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    assert chunks[0]["heading"] == "Plan" and chunks[0]["text"] == "Intro paragraph."
+    budget = [c for c in chunks if c["heading"] == "Plan > Budget"]
+    assert len(budget) > 1
+    assert all(estimate_tokens(c["text"]) <= 100 for c in chunks)
+    assert chunks[-1]["heading"] == "Plan > Hiring"
+    assert embedding_text(chunks[-1]) == "Plan > Hiring\n\nTwo engineers."
+
+
+def test_overlap_repeats_previous_tail():
+    text = "\n\n".join(f"Paragraph number {i} with some words." for i in range(20))
+    chunks = chunk_markdown(text, max_tokens=50, overlap_tokens=10)
+    assert len(chunks) > 1
+    overlap = chunks[1]["text"].split("\n\n")[0]
+    assert overlap and chunks[0]["text"].endswith(overlap)
+
+
+def test_oversized_paragraph_and_code_fence():
+    text = "```\n# not a heading\n```\n\n" + "word " * 1000
+    chunks = chunk_markdown(text, max_tokens=80, overlap_tokens=0)
+    assert chunks[0]["heading"] == ""
+    assert "# not a heading" in chunks[0]["text"]
+    assert all(estimate_tokens(c["text"]) <= 80 for c in chunks)
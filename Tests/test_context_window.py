@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import context_window
+from context_window import ContextBuilder, estimate_tokens, message_tokens, split_for_budget
+
+
+class _Session:
+    def __init__(self, path: Path):
+        self.path = path
+
+
+def _settle():
+    context_window._SUMMARY_EXECUTOR.submit(lambda: None).result(timeout=5)
+
+
+def _turns(n, size=400):
+    msgs = []
+    for i in range(n):
+        msgs.append({"role": "user", "content": f"q{i} " + "x" * size})
+        msgs.append({"role": "assistant", "content": f"a{i} " + "y" * size})
+    return msgs
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_split_fits_budget_and_starts_on_user():
+    history = _turns(30)
+    older, recent = split_for_budget(history, budget=1000)
+    assert older + recent == history
+    assert sum(message_tokens(m) for m in recent) <= 1000
+    assert recent[0]["role"] == "user"
+    assert older
+
+
+def test_split_always_keeps_latest_message():
+    history = [{"role": "user", "content": "z" * 10_000}]
+    older, recent = split_for_budget(history, budget=10)
+    assert older == []
+    assert recent == history
+
+
+def test_build_folds_older_turns_into_a_background_summary(tmp_path, monkeypatch):
+    calls = []
+
+    def summarize(self, previous, messages):
+        calls.append((previous, [m["content"][:3] for m in messages]))
+        return f"summary of {len(messages)} messages"
+
+    monkeypatch.setattr(ContextBuilder, "_summarize", summarize)
+    builder = ContextBuilder(_Session(tmp_path / "ceo" / "s1.json"), budget=600)
+    history = _turns(6)
+
+    first = builder.build(history)
+    assert first[0]["role"] == "user"  # no summary yet; only the recent window
+    _settle()
+    assert len(calls) == 1 and calls[0][0] == ""
+
+    second = builder.build(history)
+    assert second[0] == {"role": "system", "content": "Summary of earlier conversation:\nsummary of " +
+                         f"{len(calls[0][1])} messages"}
+    _settle()
+    assert len(calls) == 1  # everything older is already folded
+    assert builder.summary_path.exists()
+
+
+def test_lost_fingerprint_does_not_refold_summarized_turns(tmp_path, monkeypatch):
+    calls = []
+
+    def summarize(self, previous, messages):
+        calls.append((previous, [m["content"][:3] for m in messages]))
+        return f"summary {len(calls)}"
+
+    monkeypatch.setattr(ContextBuilder, "_summarize", summarize)
+    builder = ContextBuilder(_Session(tmp_path / "ceo" / "s2.json"), budget=600)
+    history = _turns(6)
+    builder.build(history)
+    _settle()
+    folded = len(calls[0][1])
+
+    # the last folded message was edited: only turns past the stored count are folded
+    history[folded - 1] = dict(history[folded - 1], content="edited " + "y" * 400)
+    history += _turns(1)
+    builder.build(history)
+    _settle()
+    assert len(calls) == 2 and calls[1][0] == "summary 1"
+    assert calls[1][1][0] == history[folded]["content"][:3]
+
+    # the session store was trimmed below the stored count: rebuild without the old summary
+    builder.build(history[-4:] + _turns(3))
+    _settle()
+    assert len(calls) == 3 and calls[2][0] == ""
+
+
+def test_summary_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(context_window, "SUMMARY_CACHE_SIZE", 2)
+    monkeypatch.setattr(context_window, "_SUMMARY_CACHE", context_window.OrderedDict())
+    for i in range(5):
+        ContextBuilder(_Session(tmp_path / f"s{i}.json")).build([])
+    assert list(context_window._SUMMARY_CACHE) == [str(tmp_path / "s3.json"), str(tmp_path / "s4.json")]
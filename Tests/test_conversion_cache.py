@@ -0,0 +1,62 @@
+import os
+import time
+
+from conversion_cache import ConversionCache, cached_markdown, conversion_options
+
+
+def test_cached_markdown_converts_once_per_content_and_options(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=1 << 20, version="1.0")
+    doc = tmp_path / "a.pdf"
+    doc.write_bytes(b"%PDF-1.4 alpha")
+    calls = []
+
+    def convert():
+        calls.append(1)
+        return "# Alpha"
+
+    assert cached_markdown(doc, conversion_options(), convert, cache) == "# Alpha"
+    assert cached_markdown(doc, conversion_options(), convert, cache) == "# Alpha"
+    assert len(calls) == 1 and cache.hits == 1
+
+    # a renamed copy hits; other OCR settings or docling versions do not
+    copy = tmp_path / "renamed.pdf"
+    copy.write_bytes(doc.read_bytes())
+    cached_markdown(copy, conversion_options(), convert, cache)
+    assert len(calls) == 1
+    cached_markdown(doc, conversion_options("tesseract"), convert, cache)
+    assert len(calls) == 2
+    upgraded = ConversionCache(cache.directory, max_bytes=1 << 20, version="2.0")
+    cached_markdown(doc, conversion_options(), convert, upgraded)
+    assert len(calls) == 3
+
+
+def test_empty_results_are_not_cached(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=1 << 20, version="1.0")
+    doc = tmp_path / "blank.pdf"
+    doc.write_bytes(b"%PDF-1.4")
+    calls = []
+
+    def convert():
+        calls.append(1)
+        return "  \n"
+
+    cached_markdown(doc, conversion_options(), convert, cache)
+    cached_markdown(doc, conversion_options(), convert, cache)
+    assert len(calls) == 2
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=1 << 20, version="1.0")
+    payload = os.urandom(3000).hex()
+    keys = [cache.key(f"hash-{i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, payload)
+        cache.max_bytes = int(cache._entry(keys[0]).stat().st_size * 3.5)  # room for three entries
+        path = cache._entry(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+    assert cache.get(keys[0]) is not None  # bumps the oldest entry
+
+    cache.put(cache.key("hash-3"), payload)
+    assert cache.evictions >= 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
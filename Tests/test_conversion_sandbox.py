@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from conversion_sandbox import ConversionTimeout, Quarantine, Quarantined, SandboxExecutor, WorkerInitError
+
+
+def echo(path, suffix=""):
+    return f"{path}{suffix}"
+
+
+def fail(path):
+    raise ValueError(f"cannot convert {path}")
+
+
+def hang(path):
+    time.sleep(60)
+
+
+def slow_start():
+    time.sleep(2)
+
+
+def broken_start():
+    raise RuntimeError("OCR engine not installed")
+
+
+def test_sandbox_runs_jobs_times_out_and_quarantines(tmp_path):
+    doc = tmp_path / "bad.pdf"
+    doc.write_bytes(b"%PDF-1.4 pathological")
+    quarantine = Quarantine(str(tmp_path / "quarantine.json"), max_failures=1)
+    pool = SandboxExecutor(1, timeout=3, max_rss_mb=0, recycle_after=2, quarantine=quarantine)
+    try:
+        assert pool.submit(echo, "a", suffix="!").result() == "a!"
+        with pytest.raises(ValueError, match="cannot convert b"):
+            pool.submit(fail, "b").result()  # ordinary errors pass through and do not quarantine
+
+        with pytest.raises(ConversionTimeout):
+            pool.submit(hang, str(doc)).result()
+        with pytest.raises(Quarantined):
+            pool.submit(echo, str(doc)).result()
+
+        # the hung worker was replaced
+        assert pool.submit(echo, "c").result() == "c"
+    finally:
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["quarantined"] == 1 and stats["recycled"] >= 1
+    assert Quarantine(str(tmp_path / "quarantine.json"), max_failures=1).is_quarantined(doc)
+
+
+def test_startup_is_not_charged_to_documents(tmp_path):
+    doc = tmp_path / "fine.pdf"
+    doc.write_bytes(b"%PDF-1.4 fine")
+    quarantine = Quarantine(str(tmp_path / "quarantine.json"), max_failures=1)
+
+    pool = SandboxExecutor(1, timeout=1.5, max_rss_mb=0, quarantine=quarantine, initializer=slow_start)
+    try:
+        assert pool.submit(echo, str(doc)).result() == str(doc)  # model loading does not eat the job timeout
+    finally:
+        pool.shutdown()
+
+    pool = SandboxExecutor(1, timeout=5, max_rss_mb=0, quarantine=quarantine, initializer=broken_start)
+    try:
+        for _ in range(2):
+            with pytest.raises(WorkerInitError, match="OCR engine not installed"):
+                pool.submit(echo, str(doc)).result()
+    finally:
+        pool.shutdown()
+    assert not quarantine.is_quarantined(doc) and quarantine.entries == {}
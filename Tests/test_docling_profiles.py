@@ -0,0 +1,27 @@
+import pytest
+
+from conversion_cache import ConversionCache, conversion_options
+from docling_profiles import DOCLING_PROFILE, PROFILES, validate_profile
+
+
+def test_profiles_validate_and_key_the_cache(tmp_path):
+    assert set(PROFILES) == {"fast", "balanced", "accurate"}
+    assert validate_profile(None) == DOCLING_PROFILE
+    assert validate_profile("FAST") == "fast"
+    with pytest.raises(ValueError):
+        validate_profile("turbo")
+
+    cache = ConversionCache(str(tmp_path), version="1.0")
+    keys = {cache.key("hash", conversion_options(profile=p)) for p in PROFILES}
+    assert len(keys) == 3
+    assert cache.key("hash", conversion_options()) == cache.key("hash", conversion_options(profile=DOCLING_PROFILE))
+
+
+def test_scanned_page_converter_always_runs_ocr():
+    pytest.importorskip("docling")
+    from docling_profiles import pipeline_options
+
+    for profile in PROFILES:
+        assert pipeline_options(profile).do_ocr
+    assert not pipeline_options("fast", scanned_pages=False).do_ocr
+    assert pipeline_options("accurate", scanned_pages=False).do_ocr
@@ -0,0 +1,48 @@
+import pytest
+import requests
+
+import embedding
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if isinstance(self.body, str):
+            raise ValueError("not JSON")
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}: {self.body}")
+
+
+class FakeSession:
+    def __init__(self, routes):
+        self.routes = routes
+        self.urls = []
+
+    def post(self, url, json):
+        self.urls.append(url.rsplit("/", 1)[-1])
+        return self.routes[self.urls[-1]]
+
+
+def test_falls_back_to_single_embeddings_when_batch_endpoint_is_missing(monkeypatch):
+    session = FakeSession({"embed": FakeResponse(404, "404 page not found"),
+                           "embeddings": FakeResponse(200, {"embedding": [0.1, 0.2]})})
+    monkeypatch.setattr(embedding, "_session", session)
+    assert embedding.get_embeddings(["a", "b"]) == [[0.1, 0.2], [0.1, 0.2]]
+    assert session.urls == ["embed", "embeddings", "embeddings"]
+
+
+def test_unknown_model_is_reported_not_hidden_by_the_fallback(monkeypatch):
+    missing_model = FakeResponse(404, {"error": 'model "nope" not found, try pulling it first'})
+    session = FakeSession({"embed": missing_model, "embeddings": missing_model})
+    monkeypatch.setattr(embedding, "_session", session)
+    with pytest.raises(requests.HTTPError, match="not found"):
+        embedding.get_embeddings(["a"])
+    assert session.urls == ["embed"]
+    with pytest.raises(requests.HTTPError):
+        embedding.get_embedding("a")
@@ -0,0 +1,37 @@
+from extraction_router import extract, page_runs
+
+
+def test_page_runs_groups_contiguous_pages():
+    assert page_runs([False, False, True, True, False]) == [(1, 2, False), (3, 4, True), (5, 5, False)]
+    assert page_runs([]) == []
+
+
+def test_routes_by_format_and_text_layer(tmp_path):
+    calls = []
+
+    def docling(path, page_range):
+        calls.append(page_range)
+        return f"[ocr {page_range}]"
+
+    md = tmp_path / "notes.md"
+    md.write_text("# Notes\n\nbody", encoding="utf-8")
+    text, metrics = extract(md, docling)
+    assert text == "# Notes\n\nbody" and metrics["route"] == "text" and calls == []
+
+    pdf = tmp_path / "pack.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    digital = "Quarterly results were strong across every region we operate in."
+    text, metrics = extract(pdf, docling, page_texts_fn=lambda p, r=None: [digital, digital])
+    assert metrics["route"] == "pdf_text" and metrics["ocr_pages"] == 0 and calls == []
+
+    text, metrics = extract(pdf, docling, page_texts_fn=lambda p, r=None: [digital, " \n", "", digital])
+    assert metrics["route"] == "pdf_mixed" and metrics["ocr_pages"] == 2
+    assert calls == [(2, 3)]
+    assert text == f"{digital}\n\n[ocr (2, 3)]\n\n{digital}"
+
+    # no text layer at all, or no pypdfium2: the whole file goes to docling
+    calls.clear()
+    assert extract(pdf, docling, page_texts_fn=lambda p, r=None: ["", ""])[1]["route"] == "docling"
+    assert extract(pdf, docling, page_texts_fn=lambda p, r=None: None)[1]["route"] == "docling"
+    assert calls == [None, None]
+    assert extract(md, docling, fast_paths=False)[1]["route"] == "docling"
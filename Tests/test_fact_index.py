@@ -0,0 +1,50 @@
+import numpy as np
+
+import fact_index
+from fact_index import FactVectorIndex
+from shared_memory import SharedKnowledgeStore, fact_hash as shared_hash
+
+VECTORS = {
+    "The budget is 2M": [1.0, 0.0, 0.0],
+    "The codename is Falcon": [0.0, 1.0, 0.0],
+    "Remember the offsite in May": [0.0, 0.0, 1.0],
+}
+
+
+def _fake_embed(texts):
+    return np.asarray([VECTORS[t] for t in texts], dtype=np.float32)
+
+
+def test_search_returns_only_relevant_facts(tmp_path, monkeypatch):
+    monkeypatch.setattr(fact_index, "embed_texts", _fake_embed)
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    new_items = store.append_facts([(t, "CEO") for t in VECTORS])
+
+    index = FactVectorIndex(store)
+    assert index.index_items(new_items) == 3
+    assert (tmp_path / "knowledge.vectors.jsonl").exists()
+
+    query = np.asarray([0.9, 0.1, 0.0], dtype=np.float32)
+    assert index.search(query, min_score=0.5) == ["The budget is 2M"]
+
+    # A second process picks the vectors up from the sidecar without re-embedding.
+    monkeypatch.setattr(fact_index, "embed_texts", lambda texts: None)
+    other = FactVectorIndex(SharedKnowledgeStore(tmp_path / "knowledge.jsonl"))
+    assert other.search(np.asarray([0.0, 1.0, 0.0], dtype=np.float32)) == ["The codename is Falcon"]
+
+
+def test_search_hashes_only_new_facts(tmp_path, monkeypatch):
+    monkeypatch.setattr(fact_index, "embed_texts", _fake_embed)
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    index = FactVectorIndex(store)
+    index.index_items(store.append_facts([("The budget is 2M", "CEO")]))
+    query = np.asarray([1.0, 0.0, 0.0], dtype=np.float32)
+    index.search(query)
+
+    hashed = []
+    monkeypatch.setattr(fact_index, "fact_hash", lambda text: hashed.append(text) or shared_hash(text))
+    index.index_items(store.append_facts([("The codename is Falcon", "CFO")]))
+    hashed.clear()
+    assert index.search(query, min_score=0.5) == ["The budget is 2M"]
+    assert index.search(query, min_score=0.5) == ["The budget is 2M"]
+    assert hashed == ["The codename is Falcon"]
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from fact_worker import FactExtractionWorker
+from shared_memory import SharedKnowledgeStore
+
+
+def test_worker_extracts_and_batches_facts(tmp_path):
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    calls = []
+    original = store.append_facts
+
+    def counting_append(facts):
+        calls.append(len(facts))
+        return original(facts)
+
+    store.append_facts = counting_append
+    worker = FactExtractionWorker(store_getter=lambda: store, index_getter=None, batch_size=10, flush_interval=5.0)
+    for i in range(5):
+        worker.submit(f"The deadline is day {i}", "COO")
+    worker.submit("just chatting", "COO")
+    worker.stop()
+
+    assert calls == [5]
+    assert len(store.load()) == 5
+    assert worker.stats()["written"] == 5
+
+
+def test_stop_does_not_hang_on_a_full_queue(tmp_path):
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    release = threading.Event()
+    original = store.append_facts
+
+    def slow_append(facts):
+        release.wait(5)
+        return original(facts)
+
+    store.append_facts = slow_append
+    worker = FactExtractionWorker(store_getter=lambda: store, index_getter=None, maxsize=1, batch_size=1)
+    worker.submit("The deadline is day 1", "COO")
+    time.sleep(0.2)  # the worker is now blocked writing the first fact
+    worker.submit("The deadline is day 2", "COO")  # fills the queue
+
+    started = time.monotonic()
+    worker.stop(timeout=0.5)
+    assert time.monotonic() - started < 2
+
+    release.set()
+    worker._thread.join(5)
+    assert not worker._thread.is_alive()
+    assert len(store.load()) == 2
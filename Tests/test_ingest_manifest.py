@@ -0,0 +1,143 @@
+import os
+
+import pytest
+
+from ingest_manifest import IngestManifest
+
+
+def _entry(manifest, agent, files):
+    todo, unchanged = manifest.classify(agent, files, "m1", "s1")
+    return todo, unchanged
+
+
+def test_classify_skips_by_stat_and_detects_changes(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    a, b = docs / "a.md", docs / "b.md"
+    a.write_text("alpha", encoding="utf-8")
+    b.write_text("beta", encoding="utf-8")
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+
+    todo, unchanged = _entry(manifest, "ceo", [a, b])
+    assert [t["path"] for t in todo] == [a, b] and unchanged == []
+    for t in todo:
+        manifest.record("ceo", t, t["path"].name, [f"{t['path'].name}-0"], "m1", "s1")
+
+    todo, unchanged = _entry(manifest, "ceo", [a, b])
+    assert todo == [] and unchanged == [a, b]
+
+    # touched but identical content: still unchanged, and the new mtime is remembered
+    st = os.stat(a)
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    assert _entry(manifest, "ceo", [a])[0] == []
+    assert manifest.rows("ceo")[str(a.resolve())]["mtime_ns"] == os.stat(a).st_mtime_ns
+
+    b.write_text("beta v2", encoding="utf-8")
+    todo, _ = _entry(manifest, "ceo", [a, b])
+    assert [t["path"] for t in todo] == [b]
+    assert todo[0]["previous"]["chunk_ids"] == ["b.md-0"]
+
+    # a different embedding model invalidates everything
+    assert len(manifest.classify("ceo", [a], "m2", "s1")[0]) == 1
+
+
+def test_classify_drops_files_deleted_after_listing(tmp_path):
+    a, gone = tmp_path / "a.md", tmp_path / "gone.md"
+    a.write_text("alpha", encoding="utf-8")
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    todo, unchanged = _entry(manifest, "ceo", [a, gone])
+    assert [t["path"] for t in todo] == [a] and unchanged == []
+
+
+def test_missing_files_are_reported_and_forgotten(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    a, b = docs / "a.md", docs / "b.md"
+    for f in (a, b):
+        f.write_text(f.name, encoding="utf-8")
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    for t in manifest.classify("ceo", [a, b], "m1", "s1")[0]:
+        manifest.record("ceo", t, t["path"].name, ["x"], "m1", "s1")
+
+    b.unlink()
+    gone = manifest.missing("ceo", docs, [a])
+    assert list(gone) == [str(b.resolve())]
+    assert manifest.missing("cfo", docs, [a]) == {}
+    manifest.forget("ceo", gone)
+    assert list(manifest.rows("ceo")) == [str(a.resolve())]
+
+
+def test_runs_checkpoint_and_resume(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    files = []
+    for name in ("a.md", "b.md", "c.md"):
+        (docs / name).write_text(name, encoding="utf-8")
+        files.append(docs / name)
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    todo, _ = manifest.classify("ceo", files, "m1", "s1")
+    run_id = manifest.start_run("ceo", docs, files)
+
+    manifest.record("ceo", todo[0], "a", ["a-0"], "m1", "s1", run_id=run_id)
+    manifest.mark(run_id, [files[1]], "failed", {str(files[1].resolve()): "embed: timeout"})
+    # crash here: the run is still "running"
+
+    run = manifest.last_unfinished_run("ceo", docs)
+    assert run["run_id"] == run_id
+    assert manifest.run_files(run_id) == [str(files[1].resolve()), str(files[2].resolve())]
+    assert manifest.run_counts(run_id) == {"done": 1, "failed": 1, "pending": 1}
+
+    manifest.finish_run(run_id, "completed")
+    assert manifest.last_unfinished_run("ceo", docs) is None
+
+
+class _FakeQdrant:
+    def __init__(self):
+        self.points = {}
+
+    def upsert(self, collection_name, points, wait=True):
+        self.points.update({p.id: p.payload for p in points})
+
+    def delete(self, collection_name, points_selector, wait=True):
+        if isinstance(points_selector, list):
+            for point_id in points_selector:
+                self.points.pop(point_id, None)
+
+    def set_payload(self, collection_name, payload, points, wait=True):
+        for point_id in points:
+            self.points[point_id].update(payload)
+
+
+def test_same_file_name_in_two_folders_are_separate_documents(tmp_path, monkeypatch):
+    pytest.importorskip("qdrant_client")
+    from concurrent.futures import ThreadPoolExecutor
+    import ingest_doc
+    from embedding import EMBED_MODEL
+
+    monkeypatch.setattr(ingest_doc, "get_embeddings", lambda texts: [[0.0, 1.0] for _ in texts])
+    docs = tmp_path / "docs"
+    for folder, text in (("a", "# Alpha\n\nalpha notes"), ("b", "# Beta\n\nbeta notes")):
+        (docs / folder).mkdir(parents=True)
+        (docs / folder / "x.md").write_text(text, encoding="utf-8")
+    files = sorted(docs.rglob("*.md"))
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    client = _FakeQdrant()
+
+    def run():
+        settings = f"chunks={ingest_doc.CHUNK_TOKENS}/{ingest_doc.CHUNK_OVERLAP}"
+        todo, _ = manifest.classify("ceo", files, EMBED_MODEL, settings)
+        if not todo:
+            return None
+        run_id = manifest.start_run("ceo", docs, [e["path"] for e in todo])
+        with ThreadPoolExecutor(1) as executor:
+            return ingest_doc.run_pipeline("ceo", todo, client, "agent_ceo_memory", manifest, run_id,
+                                           executor=executor, root=docs)
+
+    summary = run()
+    assert summary["ingested"] == 2 and summary["status"] == "completed"
+    rows = manifest.rows("ceo")
+    assert len({row["doc_id"] for row in rows.values()}) == 2
+    assert {p["filename"] for p in client.points.values()} == {"a/x.md", "b/x.md"}
+    assert all(point_id in client.points for row in rows.values() for point_id in row["chunk_ids"])
+    monkeypatch.setattr(ingest_doc, "get_embeddings", lambda texts: pytest.fail("re-ingested"))
+    assert run() is None
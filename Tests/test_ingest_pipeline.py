@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ingest_pipeline import IngestPipeline
+
+
+def fake_convert(path):
+    name = Path(path).name
+    if name == "broken.pdf":
+        raise ValueError("docling failed")
+    if name == "empty.md":
+        return []
+    return [{"index": i, "heading": "", "text": f"{name} part {i}"} for i in range(5)]
+
+
+def test_pipeline_batches_and_reports(tmp_path):
+    embed_batches, written, deleted = [], [], []
+
+    def embed(texts):
+        embed_batches.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+    def write(records):
+        written.extend(records)
+
+    files = [tmp_path / n for n in ("a.md", "b.md", "c.md", "broken.pdf", "empty.md", "seen.md")]
+    pipeline = IngestPipeline(
+        "ceo", embed_fn=embed, write_fn=write, delete_fn=deleted.append,
+        exists_fn=lambda doc_id: doc_id == "seen.md", convert_fn=fake_convert,
+        executor=ThreadPoolExecutor(2), workers=2, embed_workers=2, write_workers=1,
+        embed_batch=4, upsert_batch=3, queue_size=4,
+    )
+    summary = asyncio.run(pipeline.run(files))
+
+    assert sorted(pipeline.ingested) == ["a.md", "b.md", "c.md"]
+    assert sorted(pipeline.skipped) == ["empty.md", "seen.md"]
+    assert set(summary["errors"]) == {"broken.pdf"}
+    assert max(embed_batches) <= 4
+    assert len({(r["doc_id"], r["chunk"]["index"]) for r in written}) == 15
+    assert sorted(deleted) == ["a.md", "b.md", "c.md"]
+    stages = {s["stage"]: s for s in summary["stages"]}
+    assert stages["convert"]["items"] == 4
+    assert stages["embed"]["items"] == stages["write"]["items"] == 15
+
+
+def test_large_documents_stream_by_page_window(tmp_path):
+    written, done = [], []
+
+    def window(path, first, last):
+        return [{"index": 0, "heading": "", "text": f"pages {first}-{last} part {i}"} for i in range(2)], {"route": "pdf_text"}
+
+    pipeline = IngestPipeline(
+        "ceo", embed_fn=lambda texts: [[1.0] for _ in texts], write_fn=written.extend, done_fn=done.append,
+        convert_fn=fake_convert, windows_fn=lambda p: [(1, 10), (11, 20), (21, 25)] if p.endswith("pack.pdf") else None,
+        window_fn=window, executor=ThreadPoolExecutor(2), workers=2, embed_batch=2, upsert_batch=2, queue_size=2,
+    )
+    summary = asyncio.run(pipeline.run([tmp_path / "pack.pdf", tmp_path / "a.md"]))
+
+    assert sorted(pipeline.ingested) == ["a.md", "pack.pdf"]
+    streamed = sorted(r["chunk"]["index"] for r in written if r["filename"] == "pack.pdf")
+    assert streamed == list(range(6))
+    assert {r["filename"]: r["chunk_count"] for r in done} == {"a.md": 5, "pack.pdf": 6}
+    assert summary["extraction"] == {"pdf_text": 3}
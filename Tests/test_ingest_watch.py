@@ -0,0 +1,123 @@
+from ingest_watch import DropFolderWatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_debounce_batch_and_purge(tmp_path):
+    inbox = tmp_path / "CEO"
+    inbox.mkdir()
+    ingested, purged = [], []
+    clock = FakeClock()
+    watcher = DropFolderWatcher(
+        {"ceo": inbox},
+        ingest_fn=lambda agent, paths: ingested.append((agent, sorted(p.name for p in paths))) or {
+            "ingested": len(paths), "errors": {}, "ingested_paths": paths},
+        purge_fn=lambda agent, paths: purged.extend(p.name for p in paths) or len(paths),
+        debounce=2.0, use_inotify=False, clock=clock,
+    )
+
+    (inbox / "plan.md").write_text("draft", encoding="utf-8")
+    (inbox / "upload.pdf.part").write_text("...", encoding="utf-8")
+    watcher.scan()
+    watcher.settle()
+    assert watcher.metrics()["debouncing"] == 1
+
+    # still being written: the size changes, so the debounce window restarts
+    clock.now += 1.5
+    (inbox / "plan.md").write_text("draft, longer", encoding="utf-8")
+    watcher.settle()
+    clock.now += 1.5
+    watcher.settle()
+    assert watcher.metrics()["queued"] == 0
+
+    clock.now += 1.0
+    (inbox / "notes.txt").write_text("hi", encoding="utf-8")
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+    metrics = watcher.metrics()
+    assert metrics["queued"] == 2 and metrics["oldest_lag_sec"] == 6.0
+
+    assert watcher.process_ready() == 2
+    assert ingested == [("CEO", ["notes.txt", "plan.md"])]
+    assert watcher.metrics()["ingested"] == 2 and watcher.metrics()["max_lag_sec"] == 6.0
+
+    # unchanged on the next poll, then deleted
+    watcher.scan()
+    watcher.settle()
+    assert watcher.metrics()["debouncing"] == 0
+    (inbox / "notes.txt").unlink()
+    watcher.scan()
+    watcher.process_ready()
+    assert purged == ["notes.txt"] and watcher.metrics()["purged"] == 1
+
+
+def test_unchanged_files_are_not_counted_as_ingested(tmp_path):
+    inbox = tmp_path / "CEO"
+    inbox.mkdir()
+    (inbox / "old.md").write_text("seen before", encoding="utf-8")
+    clock = FakeClock()
+    watcher = DropFolderWatcher(
+        {"ceo": inbox},
+        ingest_fn=lambda agent, paths: {"ingested": 0, "skipped": 0, "unchanged": len(paths), "errors": {}},
+        debounce=1.0, use_inotify=False, clock=clock,
+    )
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+    assert watcher.process_ready() == 1
+    metrics = watcher.metrics()
+    assert metrics["ingested"] == 0 and metrics["unchanged"] == 1 and metrics["max_lag_sec"] is None
+
+
+def test_delete_then_recreate_ingests_instead_of_purging(tmp_path):
+    inbox = tmp_path / "CEO"
+    inbox.mkdir()
+    (inbox / "a.md").write_text("first", encoding="utf-8")
+    calls = []
+    clock = FakeClock()
+    watcher = DropFolderWatcher(
+        {"ceo": inbox},
+        ingest_fn=lambda agent, paths: calls.append(("ingest", [p.name for p in paths])) or {
+            "ingested": len(paths), "errors": {}, "ingested_paths": paths},
+        purge_fn=lambda agent, paths: calls.append(("purge", [p.name for p in paths])) or len(paths),
+        debounce=1.0, use_inotify=False, clock=clock,
+    )
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+    watcher.process_ready()
+    calls.clear()
+
+    # one window: ingest b, purge a, a re-created and ingested again
+    (inbox / "b.md").write_text("new", encoding="utf-8")
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+    (inbox / "a.md").unlink()
+    watcher.scan()
+    (inbox / "a.md").write_text("second", encoding="utf-8")
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+
+    assert watcher.process_ready() == 3
+    assert calls == [("ingest", ["b.md", "a.md"])]
+    assert watcher.metrics()["purged"] == 0
+
+    # and the reverse: queued for ingest, then deleted before the batch ran
+    (inbox / "b.md").write_text("newer", encoding="utf-8")
+    watcher.scan()
+    clock.now += 2.0
+    watcher.settle()
+    (inbox / "b.md").unlink()
+    watcher.scan()
+    calls.clear()
+    watcher.process_ready()
+    assert calls == [("purge", ["b.md"])]
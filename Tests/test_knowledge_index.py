@@ -0,0 +1,60 @@
+import pytest
+
+import knowledge_index
+from knowledge_index import KnowledgeIndex, chunk_text
+
+
+def test_chunk_text_respects_size():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(20))
+    chunks = chunk_text(text, size=300, overlap=50)
+    assert len(chunks) > 1
+    assert all(len(c) <= 300 for c in chunks)
+
+
+def test_chunk_text_rejects_overlap_not_below_size():
+    with pytest.raises(ValueError):
+        chunk_text("x" * 1000, size=100, overlap=100)
+
+
+def test_search_returns_relevant_chunks_within_budget(tmp_path):
+    kb = tmp_path / "kb.md"
+    paras = [f"Topic {i}: " + "filler " * 60 for i in range(10)]
+    paras[7] = "Revenue target for Q3 is twelve million dollars. " + "filler " * 40
+    kb.write_text("\n\n".join(paras), encoding="utf-8")
+
+    index = KnowledgeIndex("ceo", [("kb.md", kb)])
+    hits = index.search("what is the revenue target", None, top_k=2, token_budget=200)
+    assert hits
+    assert "Revenue target" in hits[0][1]
+
+
+def test_index_picks_up_file_changes(tmp_path):
+    kb = tmp_path / "kb.md"
+    kb.write_text("alpha", encoding="utf-8")
+    index = KnowledgeIndex("ceo", [("kb.md", kb)])
+    assert index.search("alpha", None)[0][1] == "alpha"
+
+    kb.write_text("beta gamma", encoding="utf-8")
+    assert index.search("beta", None)[0][1] == "beta gamma"
+
+
+def test_failed_embedding_is_not_retried_on_every_lookup(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(knowledge_index, "embed_texts", lambda chunks: calls.append(len(chunks)))
+    kb = tmp_path / "kb.md"
+    kb.write_text("alpha", encoding="utf-8")
+    index = KnowledgeIndex("ceo", [("kb.md", kb)])
+
+    assert index.search("alpha", None)[0][1] == "alpha"
+    assert index.search("alpha", None)[0][1] == "alpha"
+    assert len(calls) == 1  # still within the retry window
+
+    kb.write_text("alpha beta", encoding="utf-8")  # a changed file is rebuilt straight away
+    index.search("beta", None)
+    assert len(calls) == 2
+
+    monkeypatch.setattr(knowledge_index, "KNOWLEDGE_EMBED_RETRY_SEC", 0)
+    kb.write_text("alpha beta gamma", encoding="utf-8")
+    index.search("gamma", None)
+    index.search("gamma", None)
+    assert len(calls) == 4
@@ -0,0 +1,55 @@
+import pytest
+
+from qdrant_writer import BARRIER_ID, QdrantWriter
+
+
+class FakeClient:
+    def __init__(self, failures=0, error=ConnectionError("connection reset")):
+        self.calls = []
+        self.failures = failures
+        self.error = error
+
+    def upsert(self, collection_name, points, wait=True):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.calls.append(("upsert", list(points), wait))
+
+    def delete(self, collection_name, points_selector, wait=True):
+        self.calls.append(("delete", list(points_selector), wait))
+
+
+def test_add_accumulates_batches_and_barrier_waits_once():
+    client = FakeClient()
+    writer = QdrantWriter(client, "agent_ceo_memory", batch_size=4, backoff=0)
+    writer.add([1, 2, 3])
+    assert client.calls == []
+    writer.add([4, 5, 6, 7, 8, 9])
+    assert client.calls == [("upsert", [1, 2, 3, 4], False), ("upsert", [5, 6, 7, 8], False)]
+
+    writer.barrier()
+    assert client.calls[2:] == [("upsert", [9], False), ("delete", [BARRIER_ID], True)]
+    assert writer.stats() == {"points": 9, "requests": 3, "retries": 0}
+
+    writer.barrier()  # nothing sent since the last barrier
+    assert len(client.calls) == 4
+
+
+def test_transient_errors_are_retried():
+    client = FakeClient(failures=2)
+    writer = QdrantWriter(client, "agent_ceo_memory", batch_size=10, backoff=0)
+    writer.write([1, 2])
+    assert client.calls == [("upsert", [1, 2], False)]
+    assert writer.stats()["retries"] == 2
+
+
+def test_gives_up_after_retries_and_on_permanent_errors():
+    writer = QdrantWriter(FakeClient(failures=5), "agent_ceo_memory", retries=2, backoff=0)
+    with pytest.raises(ConnectionError):
+        writer.write([1])
+
+    client = FakeClient(failures=1, error=ValueError("bad vector size"))
+    writer = QdrantWriter(client, "agent_ceo_memory", backoff=0)
+    with pytest.raises(ValueError):
+        writer.write([1])
+    assert writer.stats()["retries"] == 0
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from query_engine import QueryEngine, QueryFailed, QueryTimeout
+
+
+def echo_handler(agent, query):
+    if query == "boom":
+        raise ValueError("bad query")
+    if query == "slow":
+        time.sleep(5)
+    return {"agent": agent, "response": f"{agent}:{query}:{os.getpid()}"}
+
+
+def test_inprocess_runs_handler_and_counts():
+    async def run():
+        engine = QueryEngine(mode="inprocess", handler=echo_handler, warm=False)
+        await engine.start()
+        assert (await engine.run("ceo", "hi")).startswith("ceo:hi:")
+        with pytest.raises(QueryFailed):
+            await engine.run("ceo", "boom")
+        return engine.stats()
+
+    stats = asyncio.run(run())
+    assert stats["served"] == 1 and stats["failed"] == 1
+
+
+def test_pool_reuses_workers_and_replaces_timed_out_ones():
+    async def run():
+        engine = QueryEngine(mode="pool", workers=1, timeout=1, handler=echo_handler, warm=False)
+        await engine.start()
+        try:
+            first = await engine.run("cfo", "a")
+            second = await engine.run("cfo", "b")
+            assert first.split(":")[-1] == second.split(":")[-1] != str(os.getpid())
+            with pytest.raises(QueryTimeout):
+                await engine.run("cfo", "slow")
+            third = await engine.run("cfo", "c")
+            assert third.split(":")[-1] != first.split(":")[-1]
+        finally:
+            await engine.close()
+
+    asyncio.run(run())
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        QueryEngine(mode="threads")
+
+
+def test_pool_does_not_reuse_worker_of_cancelled_request():
+    async def run():
+        engine = QueryEngine(mode="pool", workers=1, timeout=10, handler=echo_handler, warm=False)
+        await engine.start()
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(engine.run("coo", "slow"), 0.5)
+            assert (await engine.run("coo", "next")).startswith("coo:next:")
+        finally:
+            await engine.close()
+
+    asyncio.run(run())
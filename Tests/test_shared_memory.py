@@ -0,0 +1,44 @@
+import json
+
+from shared_memory import SharedKnowledgeStore, maybe_extract_fact
+
+
+def test_append_dedupes_and_caches_block(tmp_path):
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    assert store.block_text() == ""
+
+    assert store.append_fact("The budget is 2M", "CFO")
+    assert not store.append_fact("  the BUDGET is 2m ", "CEO")
+    block = store.block_text()
+    assert block.endswith("- The budget is 2M")
+
+    version = store.version
+    assert store.block_text() is block
+    assert store.version == version
+
+    lines = (tmp_path / "knowledge.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+
+
+def test_second_process_sees_appends(tmp_path):
+    path = tmp_path / "knowledge.jsonl"
+    reader = SharedKnowledgeStore(path)
+    writer = SharedKnowledgeStore(path)
+    assert reader.load() == []
+
+    writer.append_facts([("Codename is Falcon", "CEO"), ("Deadline is Friday", "COO")])
+    assert [i["text"] for i in reader.load()] == ["Codename is Falcon", "Deadline is Friday"]
+    assert not reader.append_fact("codename is falcon", "CTO")
+
+
+def test_legacy_json_is_imported(tmp_path):
+    legacy = tmp_path / "knowledge.json"
+    legacy.write_text(json.dumps({"items": [{"ts": 1, "source": "CEO", "type": "fact", "text": "Remember X"}]}),
+                      encoding="utf-8")
+    store = SharedKnowledgeStore(tmp_path / "knowledge.jsonl")
+    assert [i["text"] for i in store.load()] == ["Remember X"]
+
+
+def test_maybe_extract_fact():
+    assert maybe_extract_fact("The project codename is Falcon") == "The project codename is Falcon"
+    assert maybe_extract_fact("hello there") is None
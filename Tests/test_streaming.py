@@ -0,0 +1,45 @@
+import asyncio
+
+from streaming import coalesce_tokens, encode_event, negotiate_format
+
+
+async def _tokens(items, delay=0.0):
+    for t in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield t
+
+
+async def _collect(agen):
+    return [f async for f in agen]
+
+
+def test_negotiate_format():
+    assert negotiate_format(None, None) == "ndjson"
+    assert negotiate_format(None, "text/event-stream") == "sse"
+    assert negotiate_format("ndjson", "text/event-stream") == "ndjson"
+    assert negotiate_format("bogus", None) == "ndjson"
+
+
+def test_encode_event_framing():
+    assert encode_event({"token": "hi"}, "sse") == 'data: {"token": "hi"}\n\n'
+    assert encode_event({"token": "hi"}, "ndjson") == '{"token": "hi"}\n'
+    # legacy NDJSON keeps \u escapes; SSE sends UTF-8
+    assert encode_event({"token": "café"}, "ndjson") == '{"token": "caf\\u00e9"}\n'
+    assert encode_event({"token": "café"}, "sse") == 'data: {"token": "café"}\n\n'
+
+
+def test_fast_tokens_are_coalesced():
+    frames = asyncio.run(_collect(coalesce_tokens(_tokens(list("abcdef")), flush_interval=1.0)))
+    assert frames == ["abcdef"]
+
+
+def test_frames_split_on_size():
+    frames = asyncio.run(_collect(coalesce_tokens(_tokens(["ab", "cd", "ef"]), flush_interval=1.0, max_frame_chars=4)))
+    assert frames == ["abcd", "ef"]
+
+
+def test_heartbeat_when_idle():
+    frames = asyncio.run(_collect(coalesce_tokens(_tokens(["a"], delay=0.05), heartbeat_interval=0.01)))
+    assert None in frames
+    assert frames[-1] == "a"
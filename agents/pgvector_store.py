@@ -0,0 +1,224 @@
+"""
+pgvector retrieval backend.
+
+Mirrors the Qdrant path in rag_memory.py on Postgres: chunks live in a table
+LIST-partitioned by agent_role (one partition per agent, plus a default), each
+partition carries an HNSW (or IVFFlat) cosine index, ingestion goes through
+binary COPY, and search runs an ANN query scoped to one agent's partition.
+
+The embedding dimension and index type are configurable; sql/schema.sql is the
+default rendering of ``render_schema()`` (768-dim embeddinggemma vectors, HNSW).
+``check_embedding_dim`` compares a probe embedding with PGVECTOR_DIM and the
+existing table so a model/schema mismatch fails at start-up.
+"""
+
+import os
+import json
+import re
+
+PGVECTOR_DIM = int(os.getenv("PGVECTOR_DIM", "768"))
+PGVECTOR_INDEX = os.getenv("PGVECTOR_INDEX", "hnsw").lower()  # hnsw | ivfflat
+HNSW_M = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("PGVECTOR_HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("PGVECTOR_IVFFLAT_PROBES", "10"))
+
+DEFAULT_AGENTS = ["air", "ceo", "cfo", "clo", "cmo", "coo", "cos", "cto", "sec"]
+
+CHUNK_COLUMNS = ["document_id", "agent_role", "content", "embedding", "chunk_index", "metadata", "token_count"]
+
+_AGENT_RE = re.compile(r"^[a-z0-9_]+$")
+
+
+def _agent_key(agent: str) -> str:
+    key = agent.lower()
+    if not _AGENT_RE.match(key):
+        raise ValueError(f"Invalid agent role for partition name: {agent!r}")
+    return key
+
+
+def index_clause(index: str = PGVECTOR_INDEX) -> str:
+    if index == "hnsw":
+        return f"USING hnsw (embedding vector_cosine_ops) WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+    if index == "ivfflat":
+        return f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {IVFFLAT_LISTS})"
+    raise ValueError(f"Unsupported pgvector index type: {index!r} (use 'hnsw' or 'ivfflat')")
+
+
+def partition_ddl(agent: str) -> str:
+    key = _agent_key(agent)
+    return f"CREATE TABLE IF NOT EXISTS chunks_{key} PARTITION OF chunks FOR VALUES IN ('{key}');"
+
+
+def render_schema(dim: int = PGVECTOR_DIM, index: str = PGVECTOR_INDEX, agents=DEFAULT_AGENTS) -> str:
+    """Full DDL for the documents/chunks schema with the given vector size and ANN index."""
+    partitions = "\n".join(partition_ddl(a) for a in agents)
+    return f"""CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS documents (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    agent_role TEXT,
+    metadata JSONB,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- One partition per agent keeps each ANN index small and lets agent-scoped
+-- searches touch a single partition.
+CREATE TABLE IF NOT EXISTS chunks (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    document_id INT REFERENCES documents(id) ON DELETE CASCADE,
+    agent_role TEXT NOT NULL,
+    content TEXT,
+    embedding vector({dim}),
+    chunk_index INT,
+    metadata JSONB,
+    token_count INT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (agent_role, id)
+) PARTITION BY LIST (agent_role);
+
+{partitions}
+CREATE TABLE IF NOT EXISTS chunks_default PARTITION OF chunks DEFAULT;
+
+CREATE INDEX IF NOT EXISTS chunks_embedding_idx ON chunks {index_clause(index)};
+CREATE INDEX IF NOT EXISTS chunks_document_idx ON chunks (document_id);
+
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector({dim}),
+    match_count int,
+    agent_filter text DEFAULT NULL
+)
+RETURNS TABLE(id bigint, document_id int, content text, similarity float)
+LANGUAGE sql STABLE
+AS $$
+    SELECT c.id, c.document_id, c.content, 1 - (c.embedding <=> query_embedding) AS similarity
+    FROM chunks c
+    WHERE agent_filter IS NULL OR c.agent_role = agent_filter
+    ORDER BY c.embedding <=> query_embedding
+    LIMIT match_count;
+$$;
+"""
+
+
+async def register_vector_codec(conn):
+    """asyncpg pool ``init`` hook: binary codec for the vector type (needs the pgvector package)."""
+    from pgvector.asyncpg import register_vector
+    await register_vector(conn)
+
+
+async def schema_dim(pool):
+    """Dimension of chunks.embedding in the database, or None before the schema exists."""
+    return await pool.fetchval(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = to_regclass('chunks') AND attname = 'embedding'"
+    )
+
+
+async def check_embedding_dim(pool, embedding_dim: int, dim: int = PGVECTOR_DIM, model: str = "") -> None:
+    """
+    Raise RuntimeError unless vectors of embedding_dim fit both the configured
+    PGVECTOR_DIM and the chunks table already in the database (CREATE IF NOT
+    EXISTS would silently keep an older size).
+    """
+    source = f"Embedding model {model!r}" if model else "The embedding model"
+    if embedding_dim != dim:
+        raise RuntimeError(
+            f"{source} returns {embedding_dim}-d vectors but PGVECTOR_DIM={dim}; "
+            f"set PGVECTOR_DIM={embedding_dim} or use a {dim}-d embedding model"
+        )
+    existing = await schema_dim(pool)
+    if existing is not None and existing > 0 and existing != embedding_dim:
+        raise RuntimeError(
+            f"{source} returns {embedding_dim}-d vectors but the chunks table stores vector({existing}); "
+            f"re-create the schema or switch back to a {existing}-d embedding model"
+        )
+
+
+async def ensure_schema(pool, dim: int = PGVECTOR_DIM, index: str = PGVECTOR_INDEX, agents=DEFAULT_AGENTS,
+                        embedding_dim: int = None, model: str = ""):
+    """Create the schema; with embedding_dim (e.g. len() of a probe embedding), first check that it fits."""
+    if embedding_dim is not None:
+        await check_embedding_dim(pool, embedding_dim, dim, model)
+    async with pool.acquire() as conn:
+        await conn.execute(render_schema(dim, index, agents))
+
+
+async def ensure_agent_partition(pool, agent: str):
+    """Create the agent's partition; the parent's ANN index is created on it automatically."""
+    async with pool.acquire() as conn:
+        await conn.execute(partition_ddl(agent))
+
+
+async def insert_document(pool, name: str, agent: str, metadata: dict = None) -> int:
+    return await pool.fetchval(
+        "INSERT INTO documents (name, agent_role, metadata) VALUES ($1, $2, $3::jsonb) RETURNING id",
+        name, _agent_key(agent), json.dumps(metadata or {}),
+    )
+
+
+def _chunk_records(key: str, document_id: int, contents, embeddings, metadata=None, token_counts=None) -> list:
+    metadata = metadata or [{}] * len(contents)
+    token_counts = token_counts or [None] * len(contents)
+    return [
+        (document_id, key, content, list(map(float, emb)), i, json.dumps(meta), tokens)
+        for i, (content, emb, meta, tokens) in enumerate(zip(contents, embeddings, metadata, token_counts))
+    ]
+
+
+async def copy_chunks(pool, agent: str, document_id: int, contents, embeddings, metadata=None, token_counts=None) -> int:
+    """Bulk-load chunks with binary COPY; returns the number of rows written."""
+    key = _agent_key(agent)
+    records = _chunk_records(key, document_id, contents, embeddings, metadata, token_counts)
+    if not records:
+        return 0
+    await ensure_agent_partition(pool, key)
+    async with pool.acquire() as conn:
+        await conn.copy_records_to_table("chunks", records=records, columns=CHUNK_COLUMNS)
+    return len(records)
+
+
+async def ingest_document(pool, agent: str, name: str, contents, embeddings, metadata: dict = None,
+                          chunk_metadata=None, token_counts=None) -> int:
+    """
+    Replace a document and its chunks in one transaction: earlier rows with the same
+    (name, agent_role) are deleted (chunks cascade), then the chunks are bulk-loaded
+    with binary COPY. Returns the new documents.id.
+    """
+    key = _agent_key(agent)
+    await ensure_agent_partition(pool, key)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("DELETE FROM documents WHERE name = $1 AND agent_role = $2", name, key)
+            document_id = await conn.fetchval(
+                "INSERT INTO documents (name, agent_role, metadata) VALUES ($1, $2, $3::jsonb) RETURNING id",
+                name, key, json.dumps(metadata or {}),
+            )
+            records = _chunk_records(key, document_id, contents, embeddings, chunk_metadata, token_counts)
+            if records:
+                await conn.copy_records_to_table("chunks", records=records, columns=CHUNK_COLUMNS)
+    return document_id
+
+
+async def search(pool, agent: str, vector, top_k: int = 5, index: str = PGVECTOR_INDEX):
+    """ANN search within one agent's partition; returns [{document_id, content, score}]."""
+    key = _agent_key(agent)
+    setting = f"SET LOCAL hnsw.ef_search = {max(HNSW_EF_SEARCH, top_k)}" if index == "hnsw" \
+        else f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}"
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(setting)
+            # Literal agent_role predicate (not a bind parameter or match_chunks' optional
+            # filter) so the planner prunes to the agent's partition at plan time and uses
+            # its ANN index. key is validated by _agent_key, so inlining it is safe.
+            rows = await conn.fetch(
+                f"""
+                SELECT document_id, content, 1 - (embedding <=> $1) AS score
+                FROM chunks
+                WHERE agent_role = '{key}'
+                ORDER BY embedding <=> $1
+                LIMIT $2
+                """,
+                list(map(float, vector)), top_k,
+            )
+    return [{"document_id": r["document_id"], "content": r["content"], "score": float(r["score"])} for r in rows]
@@ -0,0 +1,202 @@
+"""
+Token-budgeted context window for agent prompts.
+
+Recent history is packed newest-first into a per-agent token budget. Turns that
+fall outside the window are folded into a running summary, which a small model
+refreshes in the background and which is cached per session (in memory and in a
+sidecar file next to the session), so prompt size stays bounded however long a
+session runs. The in-memory cache keeps the ``SUMMARY_CACHE_SIZE`` most recently
+used sessions; evicted ones are reloaded from their sidecar file.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+
+import ollama
+
+logger = logging.getLogger("VBoarderAPI")
+
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "qwen2.5:0.5b")
+SUMMARY_MAX_TOKENS = 200
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+
+_SUMMARY_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_SUMMARY_LOCK = threading.Lock()
+_IN_FLIGHT = set()
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vboarder-summary")
+
+
+def _cache_get(key: str):
+    with _SUMMARY_LOCK:
+        entry = _SUMMARY_CACHE.get(key)
+        if entry is not None:
+            _SUMMARY_CACHE.move_to_end(key)
+        return entry
+
+
+def _cache_put(key: str, entry: Dict[str, Any]) -> None:
+    with _SUMMARY_LOCK:
+        _SUMMARY_CACHE[key] = entry
+        _SUMMARY_CACHE.move_to_end(key)
+        while len(_SUMMARY_CACHE) > max(SUMMARY_CACHE_SIZE, 1):
+            _SUMMARY_CACHE.popitem(last=False)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Estimated prompt tokens for one chat message, including role framing."""
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fingerprint(message: Dict[str, Any]) -> str:
+    """Stable identity for a stored message, used to track what a summary covers."""
+    raw = f"{message.get('role')}|{message.get('timestamp', '')}|{message.get('content', '')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def split_for_budget(messages: List[Dict[str, Any]], budget: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split history into (older, recent) so that recent fits within budget tokens.
+
+    The newest message is always kept. The window is aligned to start on a user
+    message so the model never sees an assistant reply without its question.
+    """
+    if not messages:
+        return [], []
+
+    used = 0
+    cut = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = message_tokens(messages[i])
+        if used + cost > budget and cut < len(messages):
+            break
+        used += cost
+        cut = i
+
+    while cut < len(messages) - 1 and messages[cut].get("role") != "user":
+        cut += 1
+    return messages[:cut], messages[cut:]
+
+
+class ContextBuilder:
+    """Builds the history portion of a prompt for one session within a token budget."""
+
+    def __init__(self, session, budget: int = DEFAULT_CONTEXT_BUDGET, summary_model: str = SUMMARY_MODEL):
+        self.session = session
+        self.budget = budget
+        self.summary_model = summary_model
+        self.key = str(session.path)
+        self.summary_path = session.path.with_suffix(".summary.json")
+
+    # ----- summary cache -----
+    def _cached_summary(self) -> Dict[str, Any]:
+        entry = _cache_get(self.key)
+        if entry is not None:
+            return entry
+
+        entry = {"summary": "", "last_fp": "", "covered": 0}
+        if self.summary_path.exists():
+            try:
+                with self.summary_path.open("r", encoding="utf-8") as f:
+                    entry.update(json.load(f))
+            except Exception as e:
+                logger.warning(f"Failed to read summary file {self.summary_path}: {e}")
+        _cache_put(self.key, entry)
+        return entry
+
+    def _store_summary(self, summary: str, last_fp: str, covered: int) -> None:
+        entry = {"summary": summary, "last_fp": last_fp, "covered": covered}
+        _cache_put(self.key, entry)
+        try:
+            self.summary_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.summary_path.open("w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Failed to write summary file {self.summary_path}: {e}")
+
+    @staticmethod
+    def _unfolded(older: List[Dict[str, Any]], last_fp: str, covered: int = 0) -> Tuple[int, bool]:
+        """Where the summary's coverage of ``older`` ends, and whether the summary still applies.
+
+        The last folded message is found by fingerprint. If it is gone (pruned, edited,
+        or the session store was trimmed), the stored message count is used instead; when
+        that no longer fits either, the summary is rebuilt from the start of ``older``.
+        """
+        if not last_fp:
+            return 0, True
+        for i in range(len(older) - 1, -1, -1):
+            if fingerprint(older[i]) == last_fp:
+                return i + 1, True
+        if 0 < covered <= len(older):
+            return covered, True
+        return 0, False
+
+    # ----- background refresh -----
+    def _summarize(self, previous: str, messages: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(f"{m.get('role', 'user').upper()}: {m.get('content', '')}" for m in messages)
+        prompt = (
+            "Update the running summary of an executive conversation. Keep decisions, facts, "
+            "names, numbers and open questions; drop pleasantries. Reply with the summary only, "
+            f"at most {SUMMARY_MAX_TOKENS * 3 // 4} words.\n\n"
+            f"CURRENT SUMMARY:\n{previous or '(none)'}\n\nNEW TURNS:\n{transcript}"
+        )
+        response = ollama.chat(
+            model=self.summary_model,
+            messages=[{"role": "user", "content": prompt}],
+            options={"temperature": 0.2, "num_predict": SUMMARY_MAX_TOKENS},
+        )
+        return response["message"]["content"].strip()
+
+    def _refresh(self, previous: str, pending: List[Dict[str, Any]], covered: int) -> None:
+        try:
+            summary = self._summarize(previous, pending)
+            if summary:
+                self._store_summary(summary, fingerprint(pending[-1]), covered)
+        except Exception as e:
+            logger.warning(f"Summary refresh failed for {self.key}: {e}")
+        finally:
+            with _SUMMARY_LOCK:
+                _IN_FLIGHT.discard(self.key)
+
+    def schedule_refresh(self, previous: str, pending: List[Dict[str, Any]], covered: int) -> None:
+        """Queue a summary refresh (covering the first ``covered`` messages) unless one is already running."""
+        with _SUMMARY_LOCK:
+            if self.key in _IN_FLIGHT:
+                return
+            _IN_FLIGHT.add(self.key)
+        _SUMMARY_EXECUTOR.submit(self._refresh, previous, list(pending), covered)
+
+    # ----- public -----
+    def build(self, history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Return prompt messages for history: optional summary block plus the recent window."""
+        cached = self._cached_summary()
+        summary = cached.get("summary", "")
+        summary_tokens = estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+
+        older, recent = split_for_budget(history, max(self.budget - summary_tokens, 0))
+
+        start, keep = self._unfolded(older, cached.get("last_fp", ""), cached.get("covered", 0))
+        pending = older[start:]
+        if pending:
+            self.schedule_refresh(summary if keep else "", pending, len(older))
+
+        messages: List[Dict[str, str]] = []
+        if summary and older:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in recent)
+        return messages
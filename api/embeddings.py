@@ -0,0 +1,52 @@
+"""
+Embedding helper for the chat API.
+
+Wraps Ollama's embedding endpoint and returns L2-normalised numpy vectors so
+callers can rank with a plain dot product. Failures return ``None`` and callers
+fall back to non-vector behaviour instead of failing the chat turn.
+"""
+
+from typing import List, Optional
+import logging
+import os
+
+import numpy as np
+import ollama
+
+logger = logging.getLogger("VBoarderAPI")
+
+EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "embeddinggemma:300m")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_texts(texts: List[str], model: str = EMBED_MODEL) -> Optional[np.ndarray]:
+    """Embed a batch of texts in one call; returns an (n, dim) float32 array or None."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    try:
+        if hasattr(ollama, "embed"):
+            vectors = ollama.embed(model=model, input=texts)["embeddings"]
+        else:
+            vectors = [ollama.embeddings(model=model, prompt=t)["embedding"] for t in texts]
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.ndim != 2 or arr.shape[0] != len(texts):
+            raise ValueError(f"unexpected embedding shape {arr.shape}")
+        return _normalize(arr)
+    except Exception as e:
+        logger.warning(f"Embedding failed ({model}, {len(texts)} texts): {e}")
+        return None
+
+
+def embed_query(text: str, model: str = EMBED_MODEL) -> Optional[np.ndarray]:
+    """Embed a single query; returns a (dim,) vector or None."""
+    if not text or not text.strip():
+        return None
+    arr = embed_texts([text], model=model)
+    if arr is None or len(arr) == 0:
+        return None
+    return arr[0]
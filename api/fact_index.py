@@ -0,0 +1,168 @@
+"""
+Vector index over shared team facts.
+
+Facts are embedded when the fact worker writes them and the vectors are
+appended to a sidecar log next to the shared knowledge file
+(``knowledge.vectors.jsonl``), keyed by the fact's dedupe hash. Each process
+keeps the vectors in an in-memory matrix and reads only newly appended lines.
+At prompt time the connector injects only facts whose similarity to the
+current message clears ``SHARED_FACT_MIN_SCORE``, within a token budget,
+instead of the most recent N facts.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from context_window import estimate_tokens
+from embeddings import embed_texts, EMBED_MODEL
+from shared_memory import get_store, fact_hash, shared_block_text, file_lock
+
+logger = logging.getLogger("VBoarderAPI")
+
+SHARED_FACT_MIN_SCORE = float(os.getenv("SHARED_FACT_MIN_SCORE", "0.35"))
+SHARED_FACT_TOKEN_BUDGET = int(os.getenv("SHARED_FACT_TOKEN_BUDGET", "200"))
+SHARED_FACT_TOP_K = int(os.getenv("SHARED_FACT_TOP_K", "8"))
+FALLBACK_MAX_ITEMS = 20
+
+
+class FactVectorIndex:
+    """Append-only sidecar of fact vectors with an in-memory matrix for ranking."""
+
+    def __init__(self, store):
+        self.store = store
+        self.path = Path(store.path).with_name(Path(store.path).stem + ".vectors.jsonl")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._rows: Dict[str, int] = {}
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._offset = 0
+        self._facts: List[Tuple[str, str]] = []  # (text, hash) of the log's facts, hashed once
+        self._seen = 0  # store items consumed into _facts
+        self._generation = None
+        self._lock = threading.RLock()
+        self._catching_up = False
+
+    def _sync(self) -> None:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("model") != EMBED_MODEL or row.get("h") in self._rows:
+                continue
+            self._rows[row["h"]] = len(self._vectors)
+            self._vectors.append(np.asarray(row["v"], dtype=np.float32))
+            self._matrix = None
+        self._offset += end
+
+    def _sync_facts(self) -> None:
+        """Hash only the facts appended to the store since the last call."""
+        generation, new = self.store.items_since(self._seen, self._generation)
+        if generation != self._generation:
+            self._facts, self._seen, self._generation = [], 0, generation
+        self._seen += len(new)
+        self._facts.extend((f.get("text", ""), fact_hash(f.get("text", ""))) for f in new if f.get("type") == "fact")
+
+    def index_items(self, items: List[dict]) -> int:
+        """Embed fact items in one batch and append their vectors; returns how many were indexed."""
+        with self._lock:
+            self._sync()
+            todo = [i for i in items if fact_hash(i.get("text", "")) not in self._rows]
+        if not todo:
+            return 0
+        vectors = embed_texts([i["text"] for i in todo])
+        if vectors is None:
+            return 0
+        lines = "".join(
+            json.dumps({"h": fact_hash(i["text"]), "model": EMBED_MODEL, "v": v.round(6).tolist()}) + "\n"
+            for i, v in zip(todo, vectors)
+        )
+        with self._lock:
+            with file_lock(self.lock_path):
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            self._sync()
+        return len(todo)
+
+    def catch_up(self) -> None:
+        """Index facts that have no vector yet (legacy facts or failed embeddings)."""
+        try:
+            self.index_items(self.store.load(max_items=0))
+        except Exception as e:
+            logger.warning(f"Shared fact catch-up indexing failed: {e}")
+        finally:
+            self._catching_up = False
+
+    def _schedule_catch_up(self) -> None:
+        with self._lock:
+            if self._catching_up:
+                return
+            self._catching_up = True
+        threading.Thread(target=self.catch_up, name="vboarder-fact-index", daemon=True).start()
+
+    def search(self, query_vector: np.ndarray, min_score: float = SHARED_FACT_MIN_SCORE,
+               token_budget: int = SHARED_FACT_TOKEN_BUDGET, top_k: int = SHARED_FACT_TOP_K) -> List[str]:
+        """Texts of facts similar to the query, best first, within token_budget."""
+        with self._lock:
+            self._sync_facts()
+            self._sync()
+            if any(h not in self._rows for _, h in self._facts):
+                self._schedule_catch_up()
+            indexed = [(text, self._rows[h]) for text, h in self._facts if h in self._rows]
+            if not indexed:
+                return []
+            if self._matrix is None:
+                self._matrix = np.stack(self._vectors)
+            if self._matrix.shape[1] != query_vector.shape[0]:
+                return []
+            scores = self._matrix[[row for _, row in indexed]] @ query_vector
+
+        picked, used = [], 0
+        for idx in np.argsort(-scores)[:top_k]:
+            if scores[idx] < min_score:
+                break
+            text = indexed[idx][0]
+            cost = estimate_tokens(text) + 1
+            if used + cost > token_budget:
+                break
+            picked.append(text)
+            used += cost
+        return picked
+
+
+_INDEX: Optional[FactVectorIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_fact_index() -> FactVectorIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = FactVectorIndex(get_store())
+        return _INDEX
+
+
+def relevant_block_text(query_vector: Optional[np.ndarray]) -> str:
+    """Shared-facts prompt block ranked by relevance; falls back to recent facts without a query vector."""
+    if query_vector is None:
+        return shared_block_text(max_items=FALLBACK_MAX_ITEMS)
+    facts = get_fact_index().search(query_vector)
+    if not facts:
+        return ""
+    return "Shared team knowledge relevant to this request:\n" + "\n".join(f"- {t}" for t in facts)
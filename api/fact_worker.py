@@ -0,0 +1,146 @@
+"""
+Background fact extraction for chat messages.
+
+Chat endpoints hand each user message to ``FactExtractionWorker.submit``, which
+only enqueues it. A daemon thread drains the queue, runs the fact matcher,
+writes extracted facts to the shared knowledge store in batches and embeds each
+batch for the shared-fact vector index, so chat latency never depends on
+shared-knowledge file I/O and bursts are absorbed by the queue.
+"""
+
+from typing import Callable, List, Optional, Tuple
+import logging
+import os
+import queue
+import threading
+import time
+
+from shared_memory import get_store, maybe_extract_fact
+from fact_index import get_fact_index
+
+logger = logging.getLogger("VBoarderAPI")
+
+FACT_QUEUE_SIZE = int(os.getenv("FACT_QUEUE_SIZE", "1000"))
+FACT_BATCH_SIZE = int(os.getenv("FACT_BATCH_SIZE", "50"))
+FACT_FLUSH_SEC = float(os.getenv("FACT_FLUSH_SEC", "0.5"))
+
+_STOP = object()
+
+
+class FactExtractionWorker:
+    """Queue + daemon thread that extracts facts and writes them in batches."""
+
+    def __init__(
+        self,
+        store_getter: Callable = get_store,
+        index_getter: Optional[Callable] = get_fact_index,
+        maxsize: int = FACT_QUEUE_SIZE,
+        batch_size: int = FACT_BATCH_SIZE,
+        flush_interval: float = FACT_FLUSH_SEC,
+    ):
+        self.store_getter = store_getter
+        self.index_getter = index_getter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.written = 0
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="vboarder-facts", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str, source_agent: str) -> bool:
+        """Enqueue a message for extraction; never blocks the caller."""
+        if not text:
+            return False
+        self.start()
+        try:
+            self.queue.put_nowait((text, source_agent))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Fact queue full ({self.queue.maxsize}); dropped message from {source_agent}")
+            return False
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending messages and stop the worker thread (waits at most timeout seconds)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._stopping.set()
+        try:
+            self.queue.put_nowait(_STOP)  # wake the thread if it is idle
+        except queue.Full:
+            pass  # it is busy draining and checks the stop event between items
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def _flush(self, batch: List[Tuple[str, str]]) -> None:
+        facts = []
+        for text, source_agent in batch:
+            fact = maybe_extract_fact(text)
+            if fact:
+                facts.append((fact, source_agent))
+        if not facts:
+            return
+        try:
+            new_items = self.store_getter().append_facts(facts)
+        except Exception as e:
+            logger.warning(f"Fact batch write failed ({len(facts)} facts): {e}")
+            return
+        self.written += len(new_items)
+        if new_items and self.index_getter is not None:
+            try:
+                self.index_getter().index_items(new_items)
+            except Exception as e:
+                logger.warning(f"Fact embedding failed ({len(new_items)} facts): {e}")
+
+    def _drain(self, batch: List[Tuple[str, str]]) -> None:
+        """Flush the current batch and everything still queued."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self._flush(batch[start:start + self.batch_size])
+
+    def _run(self) -> None:
+        batch: List[Tuple[str, str]] = []
+        deadline = 0.0
+        while True:
+            if self._stopping.is_set():
+                self._drain(batch)
+                return
+            # idle waits are bounded so a stop whose wake-up could not be queued is still seen
+            timeout = max(deadline - time.monotonic(), 0.0) if batch else self.flush_interval
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                continue
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            self._flush(batch)
+            batch = []
+
+
+fact_worker = FactExtractionWorker()
@@ -0,0 +1,193 @@
+"""
+Per-agent retrieval index over ``knowledge_files``.
+
+Knowledge files are chunked and embedded once; the chunks and vectors are
+cached in memory for the life of the process and on disk under
+``api/cache/knowledge/``. Each cache entry is keyed by the file's mtime and
+size, so an edited file is re-embedded on the next lookup and untouched files
+are never re-read. A file whose embedding failed is served without vectors
+(lexical ranking) and retried only after ``KNOWLEDGE_EMBED_RETRY_SEC`` or when
+it changes, so an embedding outage doesn't cost every chat turn a re-embed.
+At prompt time only the top-k chunks for the current message are injected
+instead of the whole knowledge base.
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from context_window import estimate_tokens
+from embeddings import embed_texts, EMBED_MODEL
+
+logger = logging.getLogger("VBoarderAPI")
+
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "4"))
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "400"))
+KNOWLEDGE_EMBED_RETRY_SEC = float(os.getenv("KNOWLEDGE_EMBED_RETRY_SEC", "60"))
+CHUNK_CHARS = 600
+CHUNK_OVERLAP = 100
+
+CACHE_DIR = Path(__file__).parent / "cache" / "knowledge"
+
+_INDEXES: Dict[str, "KnowledgeIndex"] = {}
+_INDEXES_LOCK = threading.Lock()
+
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text on paragraph boundaries into chunks of roughly ``size`` characters."""
+    if not 0 <= overlap < size:
+        raise ValueError(f"chunk overlap must be in [0, size): overlap={overlap}, size={size}")
+    chunks: List[str] = []
+    current = ""
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        while len(para) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:size])
+            para = para[size - overlap:]
+        if current and len(current) + len(para) + 2 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _signature(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class KnowledgeIndex:
+    """Chunks + vectors for one agent's knowledge files, refreshed on file change."""
+
+    def __init__(self, agent_role: str, files: List[Tuple[str, Path]]):
+        self.agent_role = agent_role
+        self.files = files
+        self.cache_dir = CACHE_DIR / agent_role.lower()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _cache_file(self, path: Path) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(str(path).encode('utf-8')).hexdigest()}.json"
+
+    def _load_cached(self, path: Path, sig: List[int]) -> Optional[Dict[str, Any]]:
+        cache_file = self._cache_file(path)
+        if not cache_file.exists():
+            return None
+        try:
+            with cache_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("sig") != sig or data.get("model") != EMBED_MODEL:
+                return None
+            vectors = np.asarray(data["vectors"], dtype=np.float32) if data.get("vectors") else None
+            return {"sig": sig, "chunks": data["chunks"], "vectors": vectors}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable knowledge cache {cache_file}: {e}")
+            return None
+
+    def _build(self, name: str, path: Path, sig: List[int]) -> Dict[str, Any]:
+        try:
+            text = path.read_text(encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"Error loading knowledge file {name}: {e}")
+            return {"sig": sig, "chunks": [], "vectors": None}
+
+        chunks = chunk_text(text)
+        vectors = embed_texts(chunks) if chunks else None
+        entry = {"sig": sig, "chunks": chunks, "vectors": vectors}
+        if vectors is None and chunks:
+            entry["retry_at"] = time.monotonic() + KNOWLEDGE_EMBED_RETRY_SEC
+        if vectors is not None:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                with self._cache_file(path).open("w", encoding="utf-8") as f:
+                    json.dump({"sig": sig, "model": EMBED_MODEL, "chunks": chunks,
+                               "vectors": vectors.tolist()}, f)
+            except Exception as e:
+                logger.warning(f"Failed to write knowledge cache for {name}: {e}")
+        return entry
+
+    def refresh(self) -> None:
+        """Re-chunk and re-embed only files whose mtime/size changed."""
+        with self._lock:
+            for name, path in self.files:
+                sig = _signature(path)
+                if sig is None:
+                    self._entries.pop(name, None)
+                    continue
+                entry = self._entries.get(name)
+                if entry is not None and entry["sig"] == sig:
+                    # Entries without vectors (embedding was down) are retried once retry_at passes.
+                    if entry["vectors"] is not None or time.monotonic() < entry.get("retry_at", 0):
+                        continue
+                self._entries[name] = self._load_cached(path, sig) or self._build(name, path, sig)
+
+    def _candidates(self) -> List[Tuple[str, str, Optional[np.ndarray]]]:
+        out = []
+        for name, entry in self._entries.items():
+            vectors = entry["vectors"]
+            for i, chunk in enumerate(entry["chunks"]):
+                out.append((name, chunk, vectors[i] if vectors is not None else None))
+        return out
+
+    def search(self, query: str, query_vector: Optional[np.ndarray], top_k: int = KNOWLEDGE_TOP_K,
+               token_budget: int = KNOWLEDGE_TOKEN_BUDGET) -> List[Tuple[str, str]]:
+        """Return (file name, chunk) pairs most relevant to the query, within token_budget."""
+        self.refresh()
+        candidates = self._candidates()
+        if not candidates:
+            return []
+
+        # A knowledge base that already fits the budget is injected whole; no ranking needed.
+        if sum(estimate_tokens(c) for _, c, _ in candidates) <= token_budget:
+            return [(name, chunk) for name, chunk, _ in candidates]
+
+        if query_vector is not None and all(v is not None and v.shape == query_vector.shape for _, _, v in candidates):
+            scores = np.stack([v for _, _, v in candidates]) @ query_vector
+        else:
+            # Lexical fallback when embeddings are unavailable.
+            terms = set(_WORD_RE.findall(query.lower()))
+            scores = np.asarray([len(terms & set(_WORD_RE.findall(c.lower()))) for _, c, _ in candidates],
+                                dtype=np.float32)
+
+        picked: List[Tuple[str, str]] = []
+        used = 0
+        for idx in np.argsort(-scores)[:top_k]:
+            name, chunk, _ = candidates[idx]
+            cost = estimate_tokens(chunk)
+            if picked and used + cost > token_budget:
+                break
+            picked.append((name, chunk))
+            used += cost
+        return picked
+
+
+def get_index(agent_role: str, agent_folder: str, knowledge_files: List[str]) -> KnowledgeIndex:
+    """Process-wide index per agent, rebuilt only if the configured file list changes."""
+    files = [(name, Path(agent_folder) / name) for name in knowledge_files]
+    key = agent_role.lower()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None or index.files != files:
+            index = KnowledgeIndex(agent_role, files)
+            _INDEXES[key] = index
+    return index
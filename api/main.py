@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -18,7 +18,13 @@ logger = logging.getLogger("VBoarderAPI")
 # Assuming these are available in your environment
 # NOTE: AgentConnector is assumed to now contain the async generator method `chat_stream`
 from simple_connector import AgentConnector 
-from shared_memory import shared_block_text, maybe_extract_fact, append_fact
+from session_store import SessionManager, CONV_DIR
+from streaming import (
+    negotiate_format, encode_event, coalesce_tokens, stream_headers,
+    MEDIA_TYPES, STREAM_FORMAT_SSE, SSE_HEARTBEAT, HEARTBEAT_SEC,
+)
+from fact_worker import fact_worker
+from rag_memory import get_resources, close_resources
 
 # Initialize FastAPI app
 app = FastAPI(title="VBoarder API", version="1.0.0")
@@ -35,10 +41,8 @@ app.add_middleware(
 # Configuration
 SESSION_ID_PATTERN = re.compile(r"[a-zA-Z0-9_\-]+")
 MAX_SESSION_ID_LEN = 100
-MAX_TURNS_PER_SESSION = 50  
 
 BASE_DIR = Path(__file__).parent
-CONV_DIR = BASE_DIR / "conversations"
 CONV_DIR.mkdir(exist_ok=True)
 
 # Request model
@@ -47,7 +51,19 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = "default"
     concise: Optional[bool] = False
 
-# ===== Session Manager (Unchanged) =====
+# ===== Lifecycle =====
+
+@app.on_event("startup")
+async def start_background_workers():
+    fact_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    fact_worker.stop()
+    await close_resources()
+
+# ===== Session Helpers =====
 
 def sanitize_session_id(sid: Optional[str]) -> str:
     """Sanitize session ID to prevent filesystem issues."""
@@ -59,46 +75,6 @@ def sanitize_session_id(sid: Optional[str]) -> str:
     cleaned = re.sub(r"-{2,}", "-", cleaned).strip("-")
     return cleaned or "default"
 
-
-class SessionManager:
-    """Centralized class for managing conversation history persistence."""
-    
-    def __init__(self, agent_role: str, session_id: str, conv_dir: Path = CONV_DIR):
-        self.path = conv_dir / f"{agent_role}_{session_id}.json"
-
-    @staticmethod
-    def prune_history(messages: List[Dict[str, Any]], max_turns: int = MAX_TURNS_PER_SESSION) -> List[Dict[str, Any]]:
-        """Keep only the last max_turns conversational pairs (user+assistant)."""
-        if not messages:
-            return messages
-        user_idxs = [i for i, m in enumerate(messages) if m.get("role") == "user"]
-        if len(user_idxs) <= max_turns:
-            return messages
-        start_idx = user_idxs[-max_turns]
-        return messages[start_idx:]
-        
-    def read_messages(self) -> List[Dict[str, Any]]:
-        """Read conversation history from file."""
-        if not self.path.exists():
-            return []
-        try:
-            with self.path.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.warning(f"Failed to read session file {self.path}: {e}")
-            return []
-
-    def write_messages(self, messages: List[Dict[str, Any]]) -> None:
-        """Write conversation history to file (after pruning)."""
-        pruned_messages = self.prune_history(messages)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            with self.path.open("w", encoding="utf-8") as f:
-                json.dump(pruned_messages, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to write session file {self.path}: {e}")
-            raise
-
 # ===== Agent Role Validation Utility =====
 def get_valid_roles() -> List[str]:
     """Reads agent roles from registry, falling back to an empty list on failure."""
@@ -133,6 +109,16 @@ async def root():
         }
     }
 
+@app.get("/health/rag")
+async def rag_health():
+    """Postgres/Qdrant reachability plus connection pool metrics for RAG recall."""
+    try:
+        resources = await get_resources()
+        return await resources.health()
+    except Exception as e:
+        logger.warning(f"RAG health check failed: {e}")
+        raise HTTPException(status_code=503, detail=f"RAG resources unavailable: {e}")
+
 @app.post("/chat/{agent_role}")
 async def chat_with_agent(agent_role: str, request: ChatRequest):
     """Chat with a specific C-suite agent with session management."""
@@ -145,29 +131,16 @@ async def chat_with_agent(agent_role: str, request: ChatRequest):
     manager = SessionManager(agent_role, sid)
     
     try:
-        history = manager.read_messages()
-        user_msg = {"role": "user", "content": request.message}
-        history.append(user_msg)
-        history_for_llm = manager.prune_history(history)
-        connector = AgentConnector(agent_role=agent_role, session_id=sid)
+        # The connector owns the turn: it reads, prunes and writes the session once.
+        connector = AgentConnector(agent_role=agent_role, session_id=sid, session=manager)
         
-        try:
-            _role_val = agent_role.upper()
-            fact = maybe_extract_fact(request.message or "")
-            if fact:
-                append_fact(fact, source_agent=_role_val)
-        except Exception as fact_e:
-            logger.warning(f"Fact extraction failed: {fact_e}")
+        # Fact extraction and shared-knowledge writes happen on the background worker.
+        fact_worker.submit(request.message or "", source_agent=agent_role.upper())
 
         response = connector.chat(request.message, concise=request.concise)
-        
-        assistant_msg = {"role": "assistant", "content": response}
-        history.append(assistant_msg)
-        manager.write_messages(history)
-        pruned_history = manager.prune_history(history)
 
         elapsed_time = (time.time() - start_time) * 1000
-        turns = len([m for m in pruned_history if m.get("role") == "user"])
+        turns = manager.count_turns(connector.conversation_history)
 
         # Structured Logging for non-streaming chat
         logger.info(json.dumps({
@@ -198,9 +171,18 @@ async def chat_with_agent(agent_role: str, request: ChatRequest):
 # =====================================================
 
 @app.post("/chat_stream/{agent_role}")
-async def chat_stream(agent_role: str, request: ChatRequest):
+async def chat_stream(
+    agent_role: str,
+    request: ChatRequest,
+    http_request: Request,
+    stream_format: Optional[str] = Query(None, alias="format"),
+):
     """
     Stream live responses from a specific agent with full session management.
+
+    Tokens are coalesced into frames. Pass ``?format=sse`` (or
+    ``Accept: text/event-stream``) for SSE framing with heartbeats; the default
+    keeps the legacy NDJSON lines for existing clients.
     """
     start_time = time.time()
     
@@ -215,52 +197,37 @@ async def chat_stream(agent_role: str, request: ChatRequest):
     sid = sanitize_session_id(request.session_id)
     manager = SessionManager(agent_role, sid)
     
-    # 1. Read existing conversation history
-    history = manager.read_messages()
+    # 1. Initialize connector (owns history read/prune/write for this turn) and Shared Knowledge
+    connector = AgentConnector(agent_role=agent_role, session_id=sid, session=manager)
     
-    # 2. Add user message
-    user_msg = {"role": "user", "content": message}
-    history.append(user_msg)
-    
-    # 3. Initialize connector and Shared Knowledge
-    connector = AgentConnector(agent_role=agent_role, session_id=sid)
-    
-    try:
-        _role_val = agent_role.upper()
-        fact = maybe_extract_fact(message or "")
-        if fact:
-            append_fact(fact, source_agent=_role_val)
-    except Exception as fact_e:
-        logger.warning(f"Fact extraction failed: {fact_e}")
+    # Fact extraction and shared-knowledge writes happen on the background worker.
+    fact_worker.submit(message or "", source_agent=agent_role.upper())
         
+    fmt = negotiate_format(stream_format, http_request.headers.get("accept"))
+    # Heartbeats are SSE comments; the legacy NDJSON shape stays heartbeat-free.
+    heartbeat = HEARTBEAT_SEC if fmt == STREAM_FORMAT_SSE else None
+
     # --- Streaming Generator ---
     async def generate_stream():
-        full_response = ""
         try:
-            yield json.dumps({"status": "start", "agent": agent_role, "session_id": sid}) + "\n"
+            yield encode_event({"status": "start", "agent": agent_role, "session_id": sid}, fmt)
             
-            # 4. Get streamed response (Uses the newly implemented connector.chat_stream)
+            # 2. Get streamed response; the connector persists the turn once the stream completes
             try:
-                # This is now the primary path, yielding true token chunks
-                async for token_chunk in connector.chat_stream(message, concise=concise):
-                    full_response += token_chunk
-                    yield json.dumps({"token": token_chunk}) + "\n"
+                # Tokens are coalesced into time/size-bounded frames before encoding
+                async for frame in coalesce_tokens(
+                    connector.chat_stream(message, concise=concise), heartbeat_interval=heartbeat
+                ):
+                    yield SSE_HEARTBEAT if frame is None else encode_event({"token": frame}, fmt)
             except AttributeError:
                 # Should not happen if simple_connector.py is updated, but kept for safety.
                 error_msg = "Connector streaming method failed or is missing."
                 logger.error(error_msg)
-                yield json.dumps({"error": error_msg}) + "\n"
-            
-            # 5. Add assistant response and Save History
-            assistant_msg = {"role": "assistant", "content": full_response}
-            history.append(assistant_msg)
-            
-            manager.write_messages(history)
-            pruned_history = manager.prune_history(history)
+                yield encode_event({"error": error_msg}, fmt)
             
-            # 6. Calculate metrics and finalize stream
+            # 3. Calculate metrics and finalize stream
             elapsed_time = (time.time() - start_time) * 1000
-            turns = len([m for m in pruned_history if m.get("role") == "user"])
+            turns = manager.count_turns(connector.conversation_history)
             
             # IMPLEMENTATION OF ADJUSTMENT 5: Structured Logging
             logger.info(json.dumps({
@@ -271,18 +238,18 @@ async def chat_stream(agent_role: str, request: ChatRequest):
                 "turns": turns
             }))
             
-            yield json.dumps({
+            yield encode_event({
                 "status": "done",
                 "response_time_ms": round(elapsed_time, 2),
                 "turns_in_session": turns
-            }) + "\n"
+            }, fmt)
 
         except Exception as e:
             logger.exception(f"Unexpected error in chat_stream generator for {agent_role}/{sid}")
-            yield json.dumps({"error": "An unexpected server error occurred during streaming."}) + "\n"
+            yield encode_event({"error": "An unexpected server error occurred during streaming."}, fmt)
 
     # Return the StreamingResponse
-    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+    return StreamingResponse(generate_stream(), media_type=MEDIA_TYPES[fmt], headers=stream_headers(fmt))
 
 
 # Remaining endpoints (@app.get("/sessions/{agent_role}"), @app.get("/sessions"), 
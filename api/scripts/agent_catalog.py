@@ -0,0 +1,244 @@
+"""
+Agent catalog for the API server.
+
+Replaces the one-shot ``load_agents()`` scan with a cache keyed by directory
+mtimes. ``refresh()`` only stats the registry file, the ``agents/`` folder
+and each agent's folders; an agent is re-probed only when one of its mtimes
+moved, and the folder is re-listed only when its own mtime moved. Results
+are persisted to ``AGENT_CATALOG_CACHE`` so each uvicorn worker starts from
+the cached scan instead of repeating it. A daemon thread refreshes every
+``AGENT_CATALOG_REFRESH_SEC`` seconds, and lookups of unknown agents refresh
+synchronously before failing, so a newly added agent is visible without a
+restart.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("vboarder.api")
+
+AGENT_CATALOG_REFRESH_SEC = float(os.getenv("AGENT_CATALOG_REFRESH_SEC", "5"))
+
+# Sub-folders whose contents feed discover_agent_files(); their mtimes are part of an agent's signature
+WATCHED_SUBDIRS = ("prompts", "memory", "state", "personas")
+
+
+def discover_agent_files(agent_dir: str) -> Dict[str, Optional[str]]:
+    """Locate key files within an agent directory."""
+    system_prompt, memory_file, persona_file = None, None, None
+
+    for candidate in [
+        "system.txt", "system_prompt.txt",
+        "prompts/system.txt", "prompts/system_detailed.txt",
+    ]:
+        p = os.path.join(agent_dir, candidate)
+        if os.path.exists(p):
+            system_prompt = p
+            break
+
+    for candidate in ["memory.json", "memory/memory.json", "state/memory.json"]:
+        p = os.path.join(agent_dir, candidate)
+        if os.path.exists(p):
+            memory_file = p
+            break
+
+    persona_path = os.path.join(agent_dir, "personas", "vision.txt")
+    if os.path.exists(persona_path):
+        persona_file = persona_path
+
+    return {
+        "system_prompt": system_prompt,
+        "memory": memory_file,
+        "persona": persona_file,
+    }
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def agent_signature(path: str) -> list:
+    return [_mtime(path)] + [_mtime(os.path.join(path, d)) for d in WATCHED_SUBDIRS]
+
+
+class AgentCatalog:
+    """mtime-keyed cache of agent discovery results with incremental refresh."""
+
+    def __init__(self, agent_json: str, agent_dir: str, cache_path: Optional[str] = None,
+                 refresh_interval: float = AGENT_CATALOG_REFRESH_SEC):
+        self.agent_json = agent_json
+        self.agent_dir = agent_dir
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.agents: List[dict] = []
+        self.valid: Set[str] = set()
+        self.reloads = 0
+        self._registry_sig = None
+        self._source: Optional[str] = None  # "registry" | "scan": where the published agents came from
+        self._dir_mtime = None
+        self._names: List[str] = []
+        self._entries: Dict[str, dict] = {}  # folder name -> {"sig": [...], "agent": {...}}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._load_cache()
+        self.refresh()
+
+    # -- persistence ---------------------------------------------------------
+    def _load_cache(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("agent_dir") != self.agent_dir:
+                return
+            self._dir_mtime = data.get("dir_mtime")
+            self._names = data.get("names", [])
+            self._entries = data.get("entries", {})
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable agent catalog cache ({self.cache_path}): {e}")
+
+    def _save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        data = {"agent_dir": self.agent_dir, "dir_mtime": self._dir_mtime,
+                "names": self._names, "entries": self._entries}
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            if os.path.dirname(self.cache_path):
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write agent catalog cache ({self.cache_path}): {e}")
+
+    # -- discovery -----------------------------------------------------------
+    def _load_registry(self) -> Optional[List[dict]]:
+        try:
+            with open(self.agent_json, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+            logger.info(f"Loaded {len(data)} agents from webui_agents.json")
+            return [
+                {**a, "code": a.get("agent_name", a.get("code", "")).lower()}
+                for a in data
+            ]
+        except Exception as e:
+            logger.error(f"Failed to read agent registry ({self.agent_json}): {e}")
+            return None
+
+    def _scan_dir(self) -> Tuple[List[dict], bool]:
+        changed = False
+        dir_mtime = _mtime(self.agent_dir)
+        if dir_mtime is None:
+            changed = bool(self._names) or not self.agents
+            if changed:
+                logger.warning("No /agents directory found.")
+            self._names, self._entries, self._dir_mtime = [], {}, None
+            return [], changed
+        if dir_mtime != self._dir_mtime:
+            names = sorted(n for n in os.listdir(self.agent_dir)
+                           if os.path.isdir(os.path.join(self.agent_dir, n)))
+            changed = names != self._names
+            self._names, self._dir_mtime = names, dir_mtime
+            self._entries = {n: e for n, e in self._entries.items() if n in names}
+
+        agents = []
+        for name in self._names:
+            path = os.path.join(self.agent_dir, name)
+            sig = agent_signature(path)
+            entry = self._entries.get(name)
+            if entry is None or entry["sig"] != sig:
+                files = discover_agent_files(path)
+                entry = {"sig": sig, "agent": {
+                    "code": name.lower(),
+                    "name": name.upper(),
+                    "system_prompt": files["system_prompt"],
+                    "memory": files["memory"],
+                    "persona": files["persona"],
+                    "path": path,
+                    "status": "active" if files["system_prompt"] else "incomplete",
+                }}
+                self._entries[name] = entry
+                changed = True
+                logger.info(f"Loaded agent {name.upper()} -> {files}")
+            agents.append(entry["agent"])
+        return agents, changed
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-read whatever changed on disk; returns True when the catalog changed."""
+        with self._lock:
+            if force:
+                self._registry_sig, self._dir_mtime, self._entries = None, None, {}
+
+            registry_sig = _file_sig(self.agent_json)
+            if registry_sig is not None:
+                if registry_sig == self._registry_sig:
+                    return False
+                agents = self._load_registry()
+                if agents is not None:
+                    self._registry_sig, self._source = registry_sig, "registry"
+                    return self._publish(agents)
+            self._registry_sig = None
+
+            agents, changed = self._scan_dir()
+            if changed:
+                self._save_cache()
+            elif self._source == "scan" and not force:
+                return False
+            self._source = "scan"  # also when falling back from a deleted or invalid registry
+            return self._publish(agents)
+
+    def _publish(self, agents: List[dict]) -> bool:
+        valid = {a["code"] for a in agents if a.get("status") == "active"}
+        changed = agents != self.agents
+        self.agents, self.valid = agents, valid
+        if changed:
+            self.reloads += 1
+            logger.info(f"Agent catalog: {len(agents)} agents, {len(valid)} active")
+        return changed
+
+    def is_valid(self, code: str) -> bool:
+        """Active agent check; unknown codes trigger a synchronous refresh first."""
+        if code in self.valid:
+            return True
+        self.refresh()
+        return code in self.valid
+
+    def stats(self) -> dict:
+        return {"agents_total": len(self.agents), "agents_active": len(self.valid), "reloads": self.reloads}
+
+    # -- background refresh --------------------------------------------------
+    def start(self) -> None:
+        if self.refresh_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vboarder-agent-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Agent catalog refresh failed: {e}")
@@ -1,14 +1,31 @@
 """
 Batch PDF to Markdown Converter
 Converts multiple PDFs in a directory to markdown files
+
+With --workers N the files are converted in a pool of N processes. Each
+worker keeps a warm docling converter per OCR configuration for its whole
+lifetime, and results are reported as they complete (in input order with
+--ordered).
+
+Workers are sandboxed (see conversion_sandbox): a file that exceeds
+--timeout or the memory ceiling fails on its own, its worker is replaced,
+and files that keep doing so are quarantined. --no-sandbox with a single
+worker converts in this process instead.
 """
 
 import os
 import sys
+from concurrent.futures import as_completed
 from pathlib import Path
-from docling_convert import convert_to_markdown
+from conversion_sandbox import CONVERT_TIMEOUT_SEC, SandboxExecutor
+import docling_profiles
+from docling_convert import CONVERT_WINDOW_PAGES, get_converter, iter_markdown, write_windows
+from docling_profiles import DOCLING_PROFILE, PROFILES
 import argparse
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "1"))
+CONVERT_SANDBOX = os.getenv("CONVERT_SANDBOX", "1") != "0"
 
 
 def find_pdfs(directory: str, recursive: bool = False) -> List[Path]:
@@ -38,12 +55,49 @@ def find_pdfs(directory: str, recursive: bool = False) -> List[Path]:
     return sorted(pdf_files)
 
 
+def _init_worker(ocr_engine: Optional[str], workers: int, profile: Optional[str] = None) -> None:
+    """Pool initializer: split the cores between workers and load the converter once per process."""
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    docling_profiles.set_threads(threads)
+    get_converter(ocr_engine, profile)
+
+
+def convert_file(pdf_file: Path, output_file: Path, ocr_engine: str = None, debug: bool = False,
+                 window_pages: int = CONVERT_WINDOW_PAGES, profile: Optional[str] = None) -> int:
+    """Convert one PDF and stream its markdown to output_file window by window; returns characters written."""
+    windows = iter_markdown(
+        str(pdf_file),
+        ocr_engine=ocr_engine,
+        debug=debug,
+        window_pages=window_pages,
+        profile=profile
+    )
+    
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            return write_windows(windows, f)
+    except Exception:
+        output_file.unlink(missing_ok=True)  # no partial output for failed files
+        raise
+
+
 def convert_batch(
     pdf_files: List[Path],
     output_dir: str,
     ocr_engine: str = None,
     debug: bool = False,
-    skip_errors: bool = True
+    skip_errors: bool = True,
+    workers: int = BATCH_WORKERS,
+    ordered: bool = False,
+    window_pages: int = CONVERT_WINDOW_PAGES,
+    sandbox: bool = CONVERT_SANDBOX,
+    timeout: float = CONVERT_TIMEOUT_SEC,
+    profile: Optional[str] = None
 ) -> Tuple[int, int, List[str]]:
     """
     Convert multiple PDF files to markdown.
@@ -54,6 +108,12 @@ def convert_batch(
         ocr_engine: OCR engine to use
         debug: Enable debug output
         skip_errors: Continue on errors instead of stopping
+        workers: Number of conversion processes
+        ordered: With workers > 1, report results in input order instead of completion order
+        window_pages: Convert PDFs longer than this many pages in windows (bounded memory)
+        sandbox: Convert in supervised worker processes (required when workers > 1)
+        timeout: Per-file conversion time limit in seconds (sandboxed only)
+        profile: docling pipeline profile (fast, balanced, accurate; default: DOCLING_PROFILE)
         
     Returns:
         Tuple of (successful, failed, error_messages)
@@ -70,8 +130,16 @@ def convert_batch(
     print(f"Output directory: {output_path}")
     if ocr_engine:
         print(f"OCR engine: {ocr_engine}")
+    if profile:
+        print(f"Profile: {profile}")
+    if workers > 1:
+        print(f"Workers: {workers}")
     print(f"{'='*60}\n")
     
+    if workers > 1 or sandbox:
+        return _convert_parallel(pdf_files, output_path, ocr_engine, debug, skip_errors, workers, ordered,
+                                 window_pages, timeout, profile)
+    
     for i, pdf_file in enumerate(pdf_files, 1):
         # Create output filename
         output_file = output_path / f"{pdf_file.stem}.md"
@@ -79,19 +147,11 @@ def convert_batch(
         print(f"[{i}/{len(pdf_files)}] Processing: {pdf_file.name}")
         
         try:
-            # Convert the PDF
-            markdown = convert_to_markdown(
-                str(pdf_file),
-                ocr_engine=ocr_engine,
-                debug=debug
-            )
-            
-            # Save the output
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(markdown)
+            # Convert the PDF and save the output
+            chars = convert_file(pdf_file, output_file, ocr_engine, debug, window_pages, profile)
             
             successful += 1
-            print(f"  ✓ Success: {output_file.name} ({len(markdown):,} chars)\n")
+            print(f"  ✓ Success: {output_file.name} ({chars:,} chars)\n")
             
         except Exception as e:
             failed += 1
@@ -105,6 +165,60 @@ def convert_batch(
     return successful, failed, errors
 
 
+def _convert_parallel(
+    pdf_files: List[Path],
+    output_path: Path,
+    ocr_engine: Optional[str],
+    debug: bool,
+    skip_errors: bool,
+    workers: int,
+    ordered: bool,
+    window_pages: int,
+    timeout: float,
+    profile: Optional[str]
+) -> Tuple[int, int, List[str]]:
+    """Convert in a sandboxed process pool, reporting each file as its result comes back."""
+    successful = 0
+    failed = 0
+    errors = []
+    
+    with SandboxExecutor(workers, timeout=timeout, initializer=_init_worker, initargs=(ocr_engine, workers, profile)) as pool:
+        futures = {
+            pool.submit(convert_file, pdf_file, output_path / f"{pdf_file.stem}.md", ocr_engine, debug,
+                        window_pages, profile): pdf_file
+            for pdf_file in pdf_files
+        }
+        results = futures if ordered else as_completed(futures)
+        
+        for i, future in enumerate(results, 1):
+            pdf_file = futures[future]
+            print(f"[{i}/{len(pdf_files)}] Processed: {pdf_file.name}")
+            
+            try:
+                chars = future.result()
+                successful += 1
+                print(f"  ✓ Success: {pdf_file.stem}.md ({chars:,} chars)\n")
+                
+            except Exception as e:
+                # a killed worker cannot clean up after itself
+                (output_path / f"{pdf_file.stem}.md").unlink(missing_ok=True)
+                failed += 1
+                error_msg = f"{pdf_file.name}: {str(e)}"
+                errors.append(error_msg)
+                print(f"  ✗ Failed: {str(e)}\n")
+                
+                if not skip_errors:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+    
+    stats = pool.stats()
+    if stats["timeouts"] or stats["crashes"] or stats["quarantined"]:
+        print(f"Sandbox: {stats['timeouts']} timed out, {stats['crashes']} crashed, "
+              f"{stats['quarantined']} quarantined, {stats['recycled']} workers recycled")
+    
+    return successful, failed, errors
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Batch convert PDF files to Markdown",
@@ -115,6 +229,8 @@ Examples:
   %(prog)s input_folder/ -o output_folder/
   %(prog)s . --recursive --ocr easyocr
   %(prog)s pdfs/ -o markdown/ --ocr tesseract --debug
+  %(prog)s pdfs/ -o markdown/ --workers 0 --ordered
+  %(prog)s pdfs/ -o markdown/ --workers 4 --profile fast
         """
     )
     
@@ -138,6 +254,12 @@ Examples:
         default=None,
         help="OCR engine for PDF processing"
     )
+    parser.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default=DOCLING_PROFILE,
+        help=f"docling CPU pipeline profile (default: {DOCLING_PROFILE})"
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -148,6 +270,34 @@ Examples:
         action="store_true",
         help="Stop processing on first error (default: skip errors)"
     )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=BATCH_WORKERS,
+        help="Number of conversion processes (default: BATCH_WORKERS or 1; 0 = all cores)"
+    )
+    parser.add_argument(
+        "--window-pages",
+        type=int,
+        default=CONVERT_WINDOW_PAGES,
+        help=f"Convert PDFs in windows of this many pages to bound memory (default: {CONVERT_WINDOW_PAGES})"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=CONVERT_TIMEOUT_SEC,
+        help=f"Per-file conversion time limit in seconds (default: {CONVERT_TIMEOUT_SEC:.0f})"
+    )
+    parser.add_argument(
+        "--no-sandbox",
+        action="store_true",
+        help="With one worker, convert in this process instead of a supervised worker"
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="With --workers, report results in input order instead of as they complete"
+    )
     
     args = parser.parse_args()
     
@@ -171,7 +321,13 @@ Examples:
             args.output,
             ocr_engine=args.ocr,
             debug=args.debug,
-            skip_errors=not args.stop_on_error
+            skip_errors=not args.stop_on_error,
+            workers=args.workers or os.cpu_count() or 1,
+            ordered=args.ordered,
+            window_pages=args.window_pages,
+            sandbox=not args.no_sandbox,
+            timeout=args.timeout,
+            profile=args.profile
         )
         
         # Print summary
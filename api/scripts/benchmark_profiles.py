@@ -0,0 +1,106 @@
+"""
+Benchmark docling CPU pipeline profiles.
+
+Converts the same PDFs with each profile (bypassing the conversion cache)
+and reports pages per second, so the speed/quality trade-off of ``fast``,
+``balanced`` and ``accurate`` can be measured on the ingestion hosts.
+Converter start-up (model loading) is timed separately from conversion.
+
+Usage:
+    python benchmark_profiles.py docs/ [--profiles fast,balanced] [--runs 2] [--json results.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from docling_profiles import DOCLING_THREADS, PROFILES, get_converter, set_threads
+from extraction_router import pdf_page_count
+
+
+def find_pdfs(paths: List[str]) -> List[Path]:
+    files = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.rglob("*.pdf")) if p.is_dir() else [p])
+    return [f for f in files if f.suffix.lower() == ".pdf"]
+
+
+def benchmark_profile(profile: str, pdfs: List[Path], runs: int = 1) -> Dict:
+    started = time.perf_counter()
+    converter = get_converter(profile=profile, scanned_pages=False)
+    load_sec = time.perf_counter() - started
+
+    pages = chars = failed = 0
+    elapsed = 0.0
+    for _ in range(runs):
+        for pdf in pdfs:
+            started = time.perf_counter()
+            try:
+                result = converter.convert(str(pdf))
+                chars += len(result.document.export_to_markdown())
+            except Exception as e:
+                failed += 1
+                print(f"  [ERROR] {profile}: {pdf.name}: {e}")
+                continue
+            elapsed += time.perf_counter() - started
+            pages += pdf_page_count(pdf) or len(getattr(result.document, "pages", {}) or {})
+
+    return {
+        "profile": profile,
+        "docs": len(pdfs) * runs - failed,
+        "failed": failed,
+        "pages": pages,
+        "load_sec": round(load_sec, 2),
+        "convert_sec": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+        "chars": chars,
+    }
+
+
+def print_results(results: List[Dict]) -> None:
+    baseline = next((r["pages_per_sec"] for r in results if r["profile"] == "accurate"), None)
+    print(f"\n{'Profile':<10}{'Docs':>6}{'Pages':>8}{'Load (s)':>10}{'Conv (s)':>10}{'Pages/s':>10}{'Speedup':>9}")
+    for r in results:
+        speedup = f"{r['pages_per_sec'] / baseline:.2f}x" if baseline else "-"
+        print(f"{r['profile']:<10}{r['docs']:>6}{r['pages']:>8}{r['load_sec']:>10.2f}"
+              f"{r['convert_sec']:>10.2f}{r['pages_per_sec']:>10.2f}{speedup:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare docling pipeline profiles in pages per second")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profiles (default: all)")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the files per profile")
+    parser.add_argument("--threads", type=int, default=DOCLING_THREADS, help="docling threads")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    profiles = [p.strip().lower() for p in args.profiles.split(",") if p.strip()]
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        print(f"ERROR: Unknown profile(s): {', '.join(unknown)} (use {', '.join(PROFILES)})", file=sys.stderr)
+        sys.exit(1)
+    pdfs = find_pdfs(args.paths)
+    if not pdfs:
+        print("No PDF files found", file=sys.stderr)
+        sys.exit(1)
+
+    set_threads(args.threads)
+    print(f"Benchmarking {len(profiles)} profile(s) on {len(pdfs)} PDF(s), {args.threads} thread(s)")
+    results = []
+    for profile in profiles:
+        print(f"  {profile}...")
+        results.append(benchmark_profile(profile, pdfs, args.runs))
+    print_results(results)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"threads": args.threads, "results": results}, indent=2),
+                                   encoding="utf-8")
+        print(f"\nSaved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, OptimizersConfigDiff
 from tenacity import retry, stop_after_attempt, wait_fixed
+from qdrant_writer import ensure_payload_indexes
 
 AGENTS = ["air", "ceo", "cfo", "clo", "cmo", "coo", "cos", "cto", "sec"]
 
@@ -40,6 +41,9 @@ def ensure_collections(vec_size: int):
             )
         else:
             print(f"[OK] Collection exists: {name}")
+        created = ensure_payload_indexes(client, name)
+        if created:
+            print(f"[NEW] Payload indexes on {name}: {', '.join(created)}")
 
 async def main():
     start_time = time.time()
@@ -0,0 +1,115 @@
+"""
+Markdown-aware chunking for document ingestion.
+
+Docling exports documents as Markdown, so chunks follow its structure: text is
+split into sections at headings, each section is packed paragraph by
+paragraph up to ``CHUNK_TOKENS``, oversized paragraphs are split at sentence
+and then word boundaries, and each chunk repeats the last ``CHUNK_OVERLAP``
+tokens of the previous chunk in the same section. Every chunk carries its
+heading path (e.g. "Budget > Q1") so it can be embedded with its context.
+
+Token counts use the same ~4 characters per token estimate as the API's
+context window, which keeps chunks comfortably inside embedding model limits
+without loading a tokenizer.
+"""
+
+import os
+import re
+from typing import Dict, List
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "60"))
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _sections(text: str):
+    """Yield (heading_path, body) pairs, splitting at Markdown headings."""
+    path: List[str] = []
+    body: List[str] = []
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            if any(b.strip() for b in body):
+                yield " > ".join(path), "\n".join(body)
+            level = len(match.group(1))
+            path = path[:level - 1] + [match.group(2)]
+            body = []
+        else:
+            body.append(line)
+    if any(b.strip() for b in body):
+        yield " > ".join(path), "\n".join(body)
+
+
+def _pieces(paragraph: str, max_tokens: int) -> List[str]:
+    """Split one paragraph into pieces that each fit max_tokens."""
+    if estimate_tokens(paragraph) <= max_tokens:
+        return [paragraph]
+    pieces: List[str] = []
+    max_chars = max_tokens * 4
+    for sentence in _SENTENCE_RE.split(paragraph):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        words, current = sentence.split(), ""
+        for word in words:
+            while len(word) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(word[:max_chars])
+                word = word[max_chars:]
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            pieces.append(current)
+    return pieces
+
+
+def _tail(text: str, tokens: int) -> str:
+    """Last ~tokens of text, starting at a word boundary."""
+    if tokens <= 0:
+        return ""
+    tail = text[-tokens * 4:]
+    if len(tail) < len(text) and " " in tail:
+        tail = tail.split(" ", 1)[1]
+    return tail.strip()
+
+
+def chunk_markdown(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP) -> List[Dict]:
+    """Split Markdown into [{"index", "heading", "text"}] chunks of at most ~max_tokens."""
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    chunks: List[Dict] = []
+    for heading, body in _sections(text):
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+        pieces = [piece for p in paragraphs for piece in _pieces(p, max_tokens - overlap_tokens)]
+        current = ""
+        for piece in pieces:
+            joined = f"{current}\n\n{piece}" if current else piece
+            if current and estimate_tokens(joined) > max_tokens:
+                chunks.append({"heading": heading, "text": current})
+                overlap = _tail(current, overlap_tokens)
+                current = f"{overlap}\n\n{piece}" if overlap else piece
+            else:
+                current = joined
+        if current:
+            chunks.append({"heading": heading, "text": current})
+    for i, chunk in enumerate(chunks):
+        chunk["index"] = i
+    return chunks
+
+
+def embedding_text(chunk: Dict) -> str:
+    """Text sent to the embedding model: the heading path gives the chunk its context."""
+    return f"{chunk['heading']}\n\n{chunk['text']}" if chunk["heading"] else chunk["text"]
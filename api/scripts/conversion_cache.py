@@ -0,0 +1,186 @@
+"""
+Content-addressed cache for docling Markdown output.
+
+Every conversion entry point (ingest_doc.extract_text, docling_convert /
+batch_convert, markdown_export_patch.safe_convert_to_markdown and
+pdf_test_suite) goes through ``cached_markdown``. The cache key is a hash of:
+
+- the file's content (not its name or mtime, so copies and renames hit),
+- the installed docling version, and
+- the conversion options (pipeline profile, OCR engine, exporter, ...),
+
+so re-processing a document after changing chunking or the embedding model
+skips conversion entirely, while a docling upgrade or different OCR settings
+produce a fresh entry. Entries are gzip-compressed Markdown files under
+``CONVERT_CACHE_DIR``, written atomically so several processes can share the
+cache. When the total size exceeds ``CONVERT_CACHE_MAX_MB`` the least
+recently used entries are evicted (reads bump an entry's mtime).
+``CONVERT_CACHE=0`` disables caching.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONVERT_CACHE_ENABLED = os.getenv("CONVERT_CACHE", "1") != "0"
+CONVERT_CACHE_DIR = os.getenv("CONVERT_CACHE_DIR", os.path.join(os.path.dirname(BASE_DIR), "cache", "docling"))
+CONVERT_CACHE_MAX_MB = float(os.getenv("CONVERT_CACHE_MAX_MB", "2048"))
+
+
+def conversion_options(ocr: Optional[str] = None, profile: Optional[str] = None, **extra) -> dict:
+    """Options that change docling's output; entry points using the same options share entries."""
+    from docling_profiles import DOCLING_PROFILE
+    return {"pipeline": "standard", "ocr": ocr, "profile": (profile or DOCLING_PROFILE).lower(), **extra}
+
+
+def docling_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("docling")
+    except Exception:
+        return "unknown"
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ConversionCache:
+    """gzip'd Markdown keyed by (content hash, docling version, options), LRU-evicted by size."""
+
+    def __init__(self, directory: str = CONVERT_CACHE_DIR, max_bytes: int = int(CONVERT_CACHE_MAX_MB * 1024 * 1024),
+                 version: Optional[str] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.version = version or docling_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def key(self, content_hash: str, options: Optional[dict] = None) -> str:
+        material = json.dumps({"content": content_hash, "docling": self.version, "options": options or {}},
+                              sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.md.gz"
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entry(key)
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                markdown = f.read()
+        except (FileNotFoundError, OSError, EOFError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(entry)  # LRU: reads keep the entry young
+        except OSError:
+            pass
+        self.hits += 1
+        return markdown
+
+    def put(self, key: str, markdown: str) -> None:
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(markdown)
+        written = tmp.stat().st_size
+        os.replace(tmp, entry)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += written
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        if not self.directory.is_dir():
+            return []
+        out = []
+        for sub in self.directory.iterdir():
+            if not sub.is_dir():
+                continue
+            for f in sub.iterdir():
+                if f.name.endswith(".md.gz"):
+                    try:
+                        st = f.stat()
+                    except FileNotFoundError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, f))
+        return out
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache is under 90% of max_bytes."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for _, size, f in entries:
+                if total <= target:
+                    break
+                try:
+                    f.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+            self.evictions += removed
+            return removed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "docling": self.version, "dir": str(self.directory)}
+
+
+_CACHE: Optional[ConversionCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> ConversionCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ConversionCache()
+        return _CACHE
+
+
+def cached_markdown(path, options: Optional[dict], convert: Callable[[], str],
+                    cache: Optional[ConversionCache] = None) -> str:
+    """Markdown for path under options: from the cache, or convert() and store the result.
+
+    Empty results are not cached so a failed/blank conversion is retried next time.
+    """
+    if not CONVERT_CACHE_ENABLED and cache is None:
+        return convert()
+    cache = cache or get_cache()
+    key = cache.key(file_hash(path), options)
+    markdown = cache.get(key)
+    if markdown is not None:
+        return markdown
+    markdown = convert()
+    if markdown and markdown.strip():
+        try:
+            cache.put(key, markdown)
+        except OSError:
+            pass  # a read-only or full cache dir must not break conversion
+    return markdown
@@ -0,0 +1,354 @@
+"""
+Supervised worker processes for document conversion.
+
+A single pathological PDF could hang ``DocumentConverter.convert`` or eat all
+memory, stalling a whole ``batch_convert`` or ``ingest_multiple`` run.
+``SandboxExecutor`` is a ``concurrent.futures.Executor`` (so it drops into
+``loop.run_in_executor`` and the batch converter) whose jobs run in
+long-lived spawned workers, each supervised by a dispatcher thread:
+
+- timeout: a job that runs longer than ``CONVERT_TIMEOUT_SEC`` fails with
+  ``ConversionTimeout`` and its worker is killed and replaced.
+- memory: a worker whose RSS exceeds ``CONVERT_MAX_RSS_MB`` is killed
+  (``ConversionCrashed``). The RSS is sampled with psutil while the job runs;
+  without psutil the worker gets ``RLIMIT_AS`` at the same size instead.
+- recycling: a worker is replaced after ``CONVERT_RECYCLE_AFTER`` jobs so
+  leaks in the converter stack cannot accumulate.
+- quarantine: the first positional argument of every job is the document
+  path. Documents that time out or crash a worker ``CONVERT_MAX_FAILURES``
+  times in a row are listed in ``CONVERT_QUARANTINE`` (keyed by content hash) and
+  later jobs for them fail fast with ``Quarantined``. Ordinary conversion
+  errors are cheap and do not count.
+- start-up: a worker reports "ready" once its initializer (converter and
+  model loading) has run, and only then does a job's timeout start
+  (start-up gets ``CONVERT_START_TIMEOUT_SEC``). If the initializer fails,
+  the executor is broken rather than the document: the job and every later
+  one fail with ``WorkerInitError`` and nothing is quarantined.
+
+The converter's own exceptions are re-raised in the caller as usual.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import Callable, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONVERT_TIMEOUT_SEC = float(os.getenv("CONVERT_TIMEOUT_SEC", "600"))
+CONVERT_START_TIMEOUT_SEC = float(os.getenv("CONVERT_START_TIMEOUT_SEC", "600"))
+CONVERT_MAX_RSS_MB = int(os.getenv("CONVERT_MAX_RSS_MB", "6144"))
+CONVERT_RECYCLE_AFTER = int(os.getenv("CONVERT_RECYCLE_AFTER", "50"))
+CONVERT_MAX_FAILURES = int(os.getenv("CONVERT_MAX_FAILURES", "2"))
+CONVERT_QUARANTINE = os.getenv("CONVERT_QUARANTINE", os.path.join(os.path.dirname(BASE_DIR), "cache", "convert_quarantine.json"))
+
+_POLL_SEC = 0.5
+
+
+class ConversionTimeout(RuntimeError):
+    """The document did not convert within the time limit."""
+
+
+class ConversionCrashed(RuntimeError):
+    """The worker died (or was killed for exceeding its memory ceiling) while converting."""
+
+
+class Quarantined(RuntimeError):
+    """The document has repeatedly hung or crashed conversion and is skipped."""
+
+
+class WorkerInitError(RuntimeError):
+    """A conversion worker could not start (its initializer failed, hung or crashed)."""
+
+
+def _psutil():
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+
+def _limit_memory(max_rss_mb: int) -> None:
+    if max_rss_mb <= 0 or _psutil() is not None:
+        return  # the parent enforces the RSS ceiling
+    try:
+        import resource
+        limit = max_rss_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass  # not available on this platform
+
+
+def _worker_main(conn, max_rss_mb: int, initializer: Optional[Callable], initargs: tuple) -> None:
+    """Worker loop: run (fn, args, kwargs) jobs until told to stop."""
+    _limit_memory(max_rss_mb)
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+    except BaseException as e:
+        conn.send(("init_error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        fn, args, kwargs = job
+        try:
+            result = ("ok", fn(*args, **kwargs))
+        except MemoryError:
+            conn.send(("crash", "MemoryError"))
+            return  # the heap may be in any state; let the supervisor start a fresh worker
+        except Exception as e:
+            result = ("error", e)
+        try:
+            conn.send(result)
+        except Exception as e:  # unpicklable result or exception
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    def __init__(self, ctx, max_rss_mb: int, initializer: Optional[Callable], initargs: tuple):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, max_rss_mb, initializer, initargs), daemon=True)
+        self.process.start()
+        child.close()
+        self.max_rss_mb = max_rss_mb
+        self.jobs = 0
+
+    def _rss_mb(self) -> float:
+        psutil = _psutil()
+        if psutil is None:
+            return 0.0
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    def wait_ready(self, timeout: float) -> None:
+        """Block until the worker has run its initializer; raises WorkerInitError if it could not."""
+        try:
+            if self.conn.poll(timeout if timeout > 0 else None):
+                status, error = self.conn.recv()
+                if status == "ready":
+                    return
+                raise WorkerInitError(f"Conversion worker failed to start: {error}")
+        except (EOFError, OSError):
+            raise WorkerInitError(f"Conversion worker exited during start-up (code {self.process.exitcode})")
+        raise WorkerInitError(f"Conversion worker did not start within {timeout:.0f}s")
+
+    def call(self, fn: Callable, args: tuple, kwargs: dict, timeout: float):
+        """Run one job; returns (status, payload) or raises ConversionTimeout / ConversionCrashed."""
+        self.jobs += 1
+        self.conn.send((fn, args, kwargs))
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        while True:
+            wait = _POLL_SEC if deadline is None else min(_POLL_SEC, deadline - time.monotonic())
+            if wait <= 0:
+                raise ConversionTimeout(f"Conversion timed out after {timeout:.0f}s")
+            try:
+                if self.conn.poll(wait):
+                    return self.conn.recv()
+            except (EOFError, OSError):
+                raise ConversionCrashed(f"Conversion worker exited (code {self.process.exitcode})")
+            if not self.process.is_alive():
+                raise ConversionCrashed(f"Conversion worker exited (code {self.process.exitcode})")
+            if self.max_rss_mb > 0 and self._rss_mb() > self.max_rss_mb:
+                raise ConversionCrashed(f"Conversion exceeded the {self.max_rss_mb} MB memory ceiling")
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(2)
+        self.conn.close()
+
+
+class Quarantine:
+    """Failure counts per document content hash, persisted as JSON."""
+
+    def __init__(self, path: str = CONVERT_QUARANTINE, max_failures: int = CONVERT_MAX_FAILURES):
+        self.path = Path(path)
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._hashes = {}
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def _key(self, path) -> Optional[str]:
+        """Content hash of path, memoised by (path, size, mtime) since windows of one file share it."""
+        from conversion_cache import file_hash
+        try:
+            st = os.stat(path)
+            memo = (str(path), st.st_size, st.st_mtime_ns)
+            if memo not in self._hashes:
+                self._hashes[memo] = file_hash(path)
+            return self._hashes[memo]
+        except (OSError, TypeError):
+            return None
+
+    def is_quarantined(self, path) -> bool:
+        if not self.entries:
+            return False
+        key = self._key(path)
+        with self._lock:
+            return key is not None and self.entries.get(key, {}).get("failures", 0) >= self.max_failures
+
+    def record_failure(self, path, error: str) -> None:
+        key = self._key(path)
+        if key is None:
+            return
+        with self._lock:
+            entry = self.entries.setdefault(key, {"failures": 0})
+            entry.update(failures=entry["failures"] + 1, file=str(path), error=error, at=time.time())
+            self._save()
+
+    def clear(self, path) -> None:
+        if not self.entries:
+            return
+        key = self._key(path)
+        with self._lock:
+            if key in self.entries:
+                del self.entries[key]
+                self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class SandboxExecutor(Executor):
+    """Executor running each job in a supervised, recyclable worker process."""
+
+    def __init__(self, max_workers: int = 1, timeout: float = CONVERT_TIMEOUT_SEC,
+                 max_rss_mb: int = CONVERT_MAX_RSS_MB, recycle_after: int = CONVERT_RECYCLE_AFTER,
+                 quarantine: Optional[Quarantine] = None, initializer: Optional[Callable] = None,
+                 initargs: tuple = (), start_timeout: float = CONVERT_START_TIMEOUT_SEC):
+        self.size = max(1, max_workers)
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.max_rss_mb = max_rss_mb
+        self.recycle_after = recycle_after
+        self.quarantine = quarantine if quarantine is not None else Quarantine()
+        self.initializer = initializer
+        self.initargs = initargs
+        self.counts = {"jobs": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "quarantined": 0}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._jobs: queue.Queue = queue.Queue()
+        self._shutdown = False
+        self._broken: Optional[WorkerInitError] = None
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(self.size)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new jobs after shutdown")
+            future = Future()
+            self._jobs.put((future, fn, args, kwargs))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        job = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is not None:
+                        job[0].cancel()
+            for _ in self._threads:
+                self._jobs.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def stats(self) -> dict:
+        return dict(self.counts)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _dispatch(self) -> None:
+        worker: Optional[_Worker] = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                future, fn, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                path = args[0] if args else None
+                if path is not None and self.quarantine.is_quarantined(path):
+                    self._count("quarantined")
+                    future.set_exception(Quarantined(f"{Path(path).name} is quarantined after repeated failures"))
+                    continue
+                if self._broken is not None:
+                    future.set_exception(self._broken)
+                    continue
+                if worker is None:
+                    worker = _Worker(self._ctx, self.max_rss_mb, self.initializer, self.initargs)
+                    try:
+                        worker.wait_ready(self.start_timeout)
+                    except WorkerInitError as e:
+                        # the environment is broken, not the document: no quarantine, fail fast from now on
+                        worker.stop(kill=True)
+                        worker = None
+                        self._broken = e
+                        future.set_exception(e)
+                        continue
+                self._count("jobs")
+                try:
+                    status, payload = worker.call(fn, args, kwargs, self.timeout)
+                except (ConversionTimeout, ConversionCrashed) as e:
+                    self._count("timeouts" if isinstance(e, ConversionTimeout) else "crashes")
+                    worker.stop(kill=True)
+                    worker = None
+                    if path is not None:
+                        self.quarantine.record_failure(path, str(e))
+                    future.set_exception(e)
+                    continue
+                if status == "ok":
+                    if path is not None:
+                        self.quarantine.clear(path)
+                    future.set_result(payload)
+                elif status == "crash":
+                    self._count("crashes")
+                    worker.stop(kill=True)
+                    worker = None
+                    error = ConversionCrashed(f"Conversion worker ran out of memory ({payload})")
+                    if path is not None:
+                        self.quarantine.record_failure(path, str(error))
+                    future.set_exception(error)
+                else:
+                    future.set_exception(payload)
+                if worker is not None and self.recycle_after > 0 and worker.jobs >= self.recycle_after:
+                    self._count("recycled")
+                    worker.stop()
+                    worker = None
+        finally:
+            if worker is not None:
+                worker.stop()
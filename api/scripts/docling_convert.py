@@ -3,37 +3,38 @@ Document Converter with Docling
 Converts PDF, MD, and TXT files to Markdown format with optional OCR support
 """
 
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.pipeline_options import (
-    PdfPipelineOptions,
-    TesseractOcrOptions,
-    EasyOcrOptions,
-    RapidOcrOptions
-)
-from docling.datamodel.base_models import InputFormat
+from docling.document_converter import DocumentConverter
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 import logging
 
+import docling_profiles
+from conversion_cache import cached_markdown, conversion_options
+from docling_profiles import DOCLING_PROFILE, PROFILES, validate_profile
+from extraction_router import (
+    CONVERT_WINDOW_PAGES,
+    EXTRACT_FAST_PATHS,
+    TEXT_SUFFIXES,
+    is_scanned,
+    page_runs,
+    page_windows,
+    pdf_page_texts
+)
+
 # Supported OCR engines
 SUPPORTED_OCR_ENGINES = {'tesseract', 'easyocr', 'rapidocr'}
 SUPPORTED_EXTENSIONS = {'.pdf', '.md', '.txt'}
 
-# Global converter instance (cached for performance)
-_converter: Optional[DocumentConverter] = None
-
-
-def get_converter() -> DocumentConverter:
+def get_converter(ocr_engine: Optional[str] = None, profile: Optional[str] = None,
+                  scanned_pages: bool = False) -> DocumentConverter:
     """
     Return cached DocumentConverter instance for better performance.
-    Creates instance only once and reuses it for multiple conversions.
+    Creates one instance per (pipeline profile, OCR engine) and reuses it for multiple conversions.
+    The default (scanned_pages=False) applies the profile's OCR setting to whole documents.
     """
-    global _converter
-    if _converter is None:
-        _converter = DocumentConverter()
-    return _converter
+    return docling_profiles.get_converter(ocr_engine, profile, scanned_pages)
 
 
 def validate_file(file_path: str) -> Path:
@@ -100,7 +101,10 @@ def validate_ocr_engine(ocr_engine: Optional[str]) -> Optional[str]:
 def convert_to_markdown(
     file_path: str,
     ocr_engine: Optional[str] = None,
-    debug: bool = False
+    debug: bool = False,
+    use_cache: bool = True,
+    window_pages: int = CONVERT_WINDOW_PAGES,
+    profile: Optional[str] = None
 ) -> str:
     """
     Convert document to markdown with optional OCR configuration.
@@ -113,6 +117,9 @@ def convert_to_markdown(
                    - easyocr: pip install easyocr
                    - rapidocr: pip install rapidocr-onnxruntime
         debug: Enable debug output
+        use_cache: Reuse/store the result in the conversion cache
+        window_pages: Convert PDFs longer than this many pages in windows
+        profile: docling pipeline profile (fast, balanced, accurate; default: DOCLING_PROFILE)
     
     Returns:
         Markdown content as string
@@ -121,9 +128,46 @@ def convert_to_markdown(
         FileNotFoundError: If file doesn't exist
         ValueError: If file format or OCR engine is invalid, or if conversion fails
     """
+    markdown = "\n\n".join(iter_markdown(file_path, ocr_engine, debug, use_cache, window_pages, profile))
+    
+    if not markdown.strip():
+        raise ValueError(
+            "Conversion failed: No content could be extracted from the document.\n"
+            "The document may be empty, corrupted, or in an unsupported format."
+        )
+    
+    if debug:
+        logger = logging.getLogger(__name__)
+        logger.info(f"Successfully extracted {len(markdown):,} characters")
+        logger.info(f"Preview (first 500 chars):\n{'-' * 60}\n{markdown[:500]}\n{'-' * 60}")
+    
+    return markdown
+
+
+def iter_markdown(
+    file_path: str,
+    ocr_engine: Optional[str] = None,
+    debug: bool = False,
+    use_cache: bool = True,
+    window_pages: int = CONVERT_WINDOW_PAGES,
+    profile: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Convert document to markdown, yielding it one page window at a time.
+    
+    PDFs longer than window_pages are converted window by window, so docling
+    only ever holds one window in memory and callers can write or chunk the
+    first pages while the rest is still converting. Shorter documents are
+    yielded in one piece. Empty windows are skipped.
+    
+    Raises:
+        FileNotFoundError: If file doesn't exist
+        ValueError: If file format or OCR engine is invalid
+    """
     # Validate inputs
     path = validate_file(file_path)
     ocr_engine = validate_ocr_engine(ocr_engine)
+    profile = validate_profile(profile)
     
     # Setup logging
     logger = logging.getLogger(__name__)
@@ -131,54 +175,110 @@ def convert_to_markdown(
         logger.info(f"Converting file: {path}")
         logger.info(f"File size: {path.stat().st_size:,} bytes")
         logger.info(f"OCR engine: {ocr_engine or 'None'}")
+        logger.info(f"Pipeline profile: {profile}")
     
-    # Get or create converter with OCR support if needed
-    if path.suffix.lower() == '.pdf' and ocr_engine:
-        # Select appropriate OCR options class
-        if ocr_engine == 'tesseract':
-            ocr_options = TesseractOcrOptions()
-        elif ocr_engine == 'easyocr':
-            ocr_options = EasyOcrOptions()
-        elif ocr_engine == 'rapidocr':
-            ocr_options = RapidOcrOptions()
-        else:
-            raise ValueError(f"Unsupported OCR engine: {ocr_engine}")
-        
-        # Configure PDF pipeline with OCR
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr = True
-        pipeline_options.ocr_options = ocr_options
-        
-        if debug:
-            logger.info(f"Using PDF pipeline with OCR enabled ({ocr_engine})")
-        
-        # Create converter with OCR-enabled pipeline
-        converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-            }
-        )
-        result = converter.convert(str(path))
-    else:
-        if debug:
-            logger.info("Using standard conversion pipeline")
-        converter = get_converter()
-        result = converter.convert(str(path))
+    # Markdown and plain text are already text: read them directly
+    if EXTRACT_FAST_PATHS and path.suffix.lower() in TEXT_SUFFIXES:
+        yield path.read_text(encoding='utf-8', errors='ignore')
+        return
     
-    # Extract markdown content
-    markdown = _extract_markdown(result, debug)
+    # OCR only changes the output of PDFs, so other formats share one cache entry
+    if path.suffix.lower() != '.pdf':
+        yield _cached_convert(path, None, None, profile, debug, use_cache)
+        return
     
-    if not markdown.strip():
+    windows = page_windows(path, window_pages) or [None]
+    if debug and windows[0]:
+        logger.info(f"Streaming {windows[-1][1]} pages in {len(windows)} windows of {window_pages}")
+    for page_range in windows:
+        markdown = _cached_convert(path, ocr_engine, page_range, profile, debug, use_cache)
+        if markdown.strip():
+            yield markdown
+
+
+def write_windows(windows: Iterator[str], out) -> int:
+    """
+    Write markdown windows to a text stream as they arrive; returns characters written.
+    
+    Raises:
+        ValueError: If no content could be extracted
+    """
+    chars = 0
+    for markdown in windows:
+        if chars:
+            out.write("\n\n")
+            chars += 2
+        out.write(markdown)
+        out.flush()
+        chars += len(markdown)
+    
+    if not chars:
         raise ValueError(
             "Conversion failed: No content could be extracted from the document.\n"
             "The document may be empty, corrupted, or in an unsupported format."
         )
+    return chars
+
+
+def _cached_convert(path: Path, ocr_engine: Optional[str], page_range: Optional[Tuple[int, int]],
+                    profile: str, debug: bool, use_cache: bool) -> str:
+    extra = {"pages": f"{page_range[0]}-{page_range[1]}"} if page_range else {}
+    if ocr_engine:
+        options = conversion_options(ocr_engine, profile, ocr_pages="scanned", **extra)
+        convert = lambda: _convert_scanned_pages(path, ocr_engine, page_range, profile, debug)
+    else:
+        options = conversion_options(None, profile, **extra)
+        convert = lambda: _convert(path, None, page_range, profile, debug)
+    return cached_markdown(path, options, convert) if use_cache else convert()
+
+
+def _convert_scanned_pages(path: Path, ocr_engine: str, page_range: Optional[Tuple[int, int]] = None,
+                           profile: Optional[str] = None, debug: bool = False) -> str:
+    """
+    OCR only the pages without a usable text layer.
+    
+    Contiguous runs of text pages go through the standard pipeline and runs of
+    scanned pages through the OCR pipeline, so born-digital pages never pay for OCR.
+    """
+    logger = logging.getLogger(__name__)
+    texts = pdf_page_texts(path, page_range) if EXTRACT_FAST_PATHS else None
+    if not texts:
+        return _convert(path, ocr_engine, page_range, profile, debug)
     
+    scanned = [is_scanned(t) for t in texts]
     if debug:
-        logger.info(f"Successfully extracted {len(markdown):,} characters")
-        logger.info(f"Preview (first 500 chars):\n{'-' * 60}\n{markdown[:500]}\n{'-' * 60}")
+        logger.info(f"Pages needing OCR: {sum(scanned)}/{len(scanned)}")
+    if all(scanned):
+        return _convert(path, ocr_engine, page_range, profile, debug)
     
-    return markdown
+    offset = page_range[0] - 1 if page_range else 0
+    parts = []
+    for first, last, is_scan in page_runs(scanned):
+        parts.append(_convert(path, ocr_engine if is_scan else None, (first + offset, last + offset), profile, debug))
+    return "\n\n".join(p for p in parts if p.strip())
+
+
+def _convert(path: Path, ocr_engine: Optional[str], page_range: Optional[Tuple[int, int]] = None,
+             profile: Optional[str] = None, debug: bool = False) -> str:
+    """Run docling on path (or a 1-based inclusive page range) and return its markdown (no caching)."""
+    logger = logging.getLogger(__name__)
+    
+    # Get cached converter with OCR support if needed
+    if path.suffix.lower() == '.pdf' and ocr_engine:
+        if debug:
+            logger.info(f"Using PDF pipeline with OCR enabled ({ocr_engine})")
+        converter = get_converter(ocr_engine, profile)
+    else:
+        if debug:
+            logger.info("Using standard conversion pipeline")
+        converter = get_converter(profile=profile)
+    if page_range:
+        result = converter.convert(str(path), page_range=page_range)
+    else:
+        result = converter.convert(str(path))
+    
+    # Extract markdown content
+    return _extract_markdown(result, debug)
 
 
 def _extract_markdown(result, debug: bool = False) -> str:
@@ -251,6 +351,7 @@ def main():
 Examples:
   %(prog)s document.pdf
   %(prog)s document.pdf --ocr tesseract
+  %(prog)s document.pdf --profile fast
   %(prog)s document.pdf -o output.md --debug
   %(prog)s path/to/document.pdf --ocr easyocr -o result.md
 
@@ -280,6 +381,23 @@ OCR Engine Requirements:
         action="store_true",
         help="Enable verbose debug output"
     )
+    parser.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default=DOCLING_PROFILE,
+        help=f"docling CPU pipeline profile (default: {DOCLING_PROFILE})"
+    )
+    parser.add_argument(
+        "--window-pages",
+        type=int,
+        default=CONVERT_WINDOW_PAGES,
+        help=f"Convert PDFs in windows of this many pages to bound memory (default: {CONVERT_WINDOW_PAGES})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always run docling instead of reusing a cached conversion"
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -289,11 +407,14 @@ OCR Engine Requirements:
     args = parser.parse_args()
     
     try:
-        # Convert document
-        markdown = convert_to_markdown(
+        # Convert document, writing each page window as soon as it is ready
+        windows = iter_markdown(
             args.input_file,
             ocr_engine=args.ocr,
-            debug=args.debug
+            debug=args.debug,
+            use_cache=not args.no_cache,
+            window_pages=args.window_pages,
+            profile=args.profile
         )
         
         # Write output
@@ -302,12 +423,13 @@ OCR Engine Requirements:
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(markdown)
+                chars = write_windows(windows, f)
             
             print(f"✓ Successfully saved to: {output_path}")
-            print(f"  Size: {len(markdown):,} characters")
+            print(f"  Size: {chars:,} characters")
         else:
-            print(markdown)
+            write_windows(windows, sys.stdout)
+            print()
     
     except FileNotFoundError as e:
         print(f"ERROR: {e}", file=sys.stderr)
@@ -0,0 +1,133 @@
+"""
+CPU pipeline profiles for docling.
+
+Ingestion hosts have no GPU, and docling's default PDF pipeline spends most of
+its CPU time in the table-structure and layout models. A profile sets the
+knobs that trade quality for speed together:
+
+- ``fast``: no table-structure model, no OCR on text pages, no page or
+  picture images. Tables come out as plain text.
+- ``balanced``: TableFormer in FAST mode without cell matching, no OCR on
+  text pages.
+- ``accurate``: docling's defaults: TableFormer ACCURATE with cell
+  matching and OCR of bitmaps on every page.
+
+Whatever the profile, the converter for scanned pages (the default; the
+extraction router only sends docling the pages without a text layer) always
+runs OCR, with the default engine unless one is given. ``ocr_text_pages``
+only applies to whole-document conversions built with ``scanned_pages=False``.
+
+Every profile runs on the CPU with ``DOCLING_THREADS`` threads (default: all
+cores; process pools give each worker its share via ``set_threads``).
+``DOCLING_PROFILE`` picks the default profile; it is ``accurate`` so output
+is unchanged unless a faster profile is chosen. Converters are built once per
+(profile, OCR engine, scanned_pages) and reused for the life of the process.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+PROFILES: Dict[str, dict] = {
+    "fast": {
+        "table_structure": False,
+        "table_mode": None,
+        "cell_matching": False,
+        "ocr_text_pages": False,
+        "images": False,
+    },
+    "balanced": {
+        "table_structure": True,
+        "table_mode": "fast",
+        "cell_matching": False,
+        "ocr_text_pages": False,
+        "images": False,
+    },
+    "accurate": {
+        "table_structure": True,
+        "table_mode": "accurate",
+        "cell_matching": True,
+        "ocr_text_pages": True,
+        "images": False,
+    },
+}
+
+DOCLING_PROFILE = os.getenv("DOCLING_PROFILE", "accurate").lower()
+DOCLING_THREADS = int(os.getenv("DOCLING_THREADS", str(os.cpu_count() or 1)))
+
+_converters: Dict[Tuple[str, Optional[str], bool], object] = {}
+_threads = DOCLING_THREADS
+
+
+def set_threads(threads: int) -> None:
+    """Threads for converters built from now on in this process (e.g. cores / pool workers)."""
+    global _threads
+    _threads = max(1, threads)
+
+
+def validate_profile(profile: Optional[str]) -> str:
+    """
+    Normalise a profile name (None = DOCLING_PROFILE).
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    name = (profile or DOCLING_PROFILE).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown docling profile: {profile}\nSupported profiles: {', '.join(PROFILES)}")
+    return name
+
+
+def _ocr_options(ocr_engine: str):
+    from docling.datamodel.pipeline_options import EasyOcrOptions, RapidOcrOptions, TesseractOcrOptions
+
+    options = {"tesseract": TesseractOcrOptions, "easyocr": EasyOcrOptions, "rapidocr": RapidOcrOptions}
+    if ocr_engine not in options:
+        raise ValueError(f"Unsupported OCR engine: {ocr_engine}")
+    return options[ocr_engine]()
+
+
+def pipeline_options(profile: Optional[str] = None, ocr_engine: Optional[str] = None,
+                     threads: Optional[int] = None, scanned_pages: bool = True):
+    """PdfPipelineOptions for a profile: OCR for scanned pages, or per the profile for whole documents."""
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+
+    settings = PROFILES[validate_profile(profile)]
+    options = PdfPipelineOptions()
+
+    options.do_table_structure = settings["table_structure"]
+    if settings["table_mode"]:
+        options.table_structure_options.mode = (
+            TableFormerMode.ACCURATE if settings["table_mode"] == "accurate" else TableFormerMode.FAST
+        )
+        options.table_structure_options.do_cell_matching = settings["cell_matching"]
+
+    options.generate_page_images = settings["images"]
+    options.generate_picture_images = settings["images"]
+
+    if ocr_engine:
+        options.do_ocr = True
+        options.ocr_options = _ocr_options(ocr_engine)
+    else:
+        options.do_ocr = scanned_pages or settings["ocr_text_pages"]
+
+    try:
+        from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
+    except ImportError:  # docling < 2.40
+        from docling.datamodel.pipeline_options import AcceleratorDevice, AcceleratorOptions
+    options.accelerator_options = AcceleratorOptions(num_threads=threads or _threads, device=AcceleratorDevice.CPU)
+    return options
+
+
+def get_converter(ocr_engine: Optional[str] = None, profile: Optional[str] = None, scanned_pages: bool = True):
+    """Cached DocumentConverter for (profile, OCR engine, scanned_pages)."""
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    key = (validate_profile(profile), ocr_engine, scanned_pages or bool(ocr_engine))
+    if key not in _converters:
+        _converters[key] = DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options(key[0], ocr_engine, scanned_pages=key[2]))
+            }
+        )
+    return _converters[key]
@@ -1,8 +1,51 @@
-﻿import requests
+﻿import os
+import requests
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "embeddinggemma:300m")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+_session = requests.Session()
+
 
 def get_embedding(text: str):
-    response = requests.post(
-        'http://localhost:11434/api/embeddings',
-        json={'model': 'embeddinggemma:300m', 'prompt': text}
+    response = _session.post(
+        f"{OLLAMA_BASE_URL}/api/embeddings",
+        json={'model': EMBED_MODEL, 'prompt': text}
     )
-    return response.json()['embedding']
\ No newline at end of file
+    response.raise_for_status()
+    return response.json()['embedding']
+
+
+def _endpoint_missing(response) -> bool:
+    """True for the plain-text 404 of an Ollama without the endpoint, not a JSON error such as an unknown model."""
+    if response.status_code != 404:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    return not (isinstance(body, dict) and "error" in body)
+
+
+def get_embeddings(texts, batch_size: int = EMBED_BATCH_SIZE):
+    """Embed many texts with Ollama's batched /api/embed endpoint, batch_size inputs per request.
+
+    Falls back to one /api/embeddings call per text on Ollama versions without /api/embed.
+    """
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = list(texts[start:start + batch_size])
+        response = _session.post(
+            f"{OLLAMA_BASE_URL}/api/embed",
+            json={'model': EMBED_MODEL, 'input': batch}
+        )
+        if _endpoint_missing(response):
+            vectors.extend(get_embedding(t) for t in batch)
+            continue
+        response.raise_for_status()
+        embeddings = response.json()['embeddings']
+        if len(embeddings) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+        vectors.extend(embeddings)
+    return vectors
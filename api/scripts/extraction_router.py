@@ -0,0 +1,168 @@
+"""
+Format-aware extraction router.
+
+Most of the corpus is born-digital, yet every PDF and Markdown file used to go
+through the full docling layout pipeline. The router picks the cheapest path
+that still yields the document's text:
+
+- ``text``: .md / .markdown / .txt files are read directly.
+- ``pdf_text``: every page of the PDF has a usable text layer; pages are read
+  with pypdfium2 (a dependency of docling) without any layout or OCR models.
+- ``pdf_mixed``: only the pages without a text layer (scanned images) go to
+  docling/OCR, one call per contiguous run of scanned pages; the rest are
+  read from the text layer.
+- ``docling``: the whole file goes to docling (every page is scanned,
+  pypdfium2 is unavailable or cannot open the file, or
+  ``EXTRACT_FAST_PATHS=0``).
+
+A page counts as scanned when its text layer has fewer than
+``EXTRACT_MIN_PAGE_CHARS`` non-whitespace characters. Each extraction returns
+a metrics dict (route, pages, OCR pages, seconds) that the ingest pipeline
+aggregates; set ``EXTRACT_METRICS_LOG`` to also append them to a JSONL file.
+
+Very large PDFs are converted in windows of ``CONVERT_WINDOW_PAGES`` pages
+(``extract(..., page_range=...)`` per window) so docling's working set stays
+flat. The default window is derived from ``CONVERT_PEAK_MB`` divided by
+``CONVERT_MB_PER_PAGE``, a rough per-page docling footprint (page images,
+layout and table model tensors); set ``CONVERT_WINDOW_PAGES`` to override it.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+EXTRACT_FAST_PATHS = os.getenv("EXTRACT_FAST_PATHS", "1") != "0"
+EXTRACT_MIN_PAGE_CHARS = int(os.getenv("EXTRACT_MIN_PAGE_CHARS", "32"))
+EXTRACT_METRICS_LOG = os.getenv("EXTRACT_METRICS_LOG", "")
+
+CONVERT_PEAK_MB = int(os.getenv("CONVERT_PEAK_MB", "1024"))
+CONVERT_MB_PER_PAGE = float(os.getenv("CONVERT_MB_PER_PAGE", "16"))
+CONVERT_WINDOW_PAGES = int(os.getenv("CONVERT_WINDOW_PAGES", "0")) or max(1, int(CONVERT_PEAK_MB / CONVERT_MB_PER_PAGE))
+
+TEXT_SUFFIXES = {".md", ".markdown", ".txt"}
+
+# docling_fn(path, page_range) -> markdown; page_range is a 1-based inclusive
+# (first, last) tuple, or None for the whole document.
+DoclingFn = Callable[[Path, Optional[Tuple[int, int]]], str]
+
+
+def pdf_page_count(path: Path) -> Optional[int]:
+    """Number of pages, or None when pypdfium2 is missing or cannot read the file."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        pdf = pdfium.PdfDocument(str(path))
+    except Exception:
+        return None
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def page_windows(path: Path, window_pages: int = CONVERT_WINDOW_PAGES) -> Optional[List[Tuple[int, int]]]:
+    """1-based inclusive page windows for a PDF longer than window_pages, else None (convert in one go)."""
+    if Path(path).suffix.lower() != ".pdf" or window_pages <= 0:
+        return None
+    count = pdf_page_count(path)
+    if not count or count <= window_pages:
+        return None
+    return [(first, min(first + window_pages - 1, count)) for first in range(1, count + 1, window_pages)]
+
+
+def pdf_page_texts(path: Path, page_range: Optional[Tuple[int, int]] = None) -> Optional[List[str]]:
+    """Text layer of each page (of page_range), or None when pypdfium2 is missing or cannot read the file."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        pdf = pdfium.PdfDocument(str(path))
+    except Exception:
+        return None
+    texts = []
+    try:
+        first, last = page_range or (1, len(pdf))
+        for i in range(first - 1, min(last, len(pdf))):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_range())
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+    return texts
+
+
+def is_scanned(text: str, min_chars: int = EXTRACT_MIN_PAGE_CHARS) -> bool:
+    return sum(1 for c in text if not c.isspace()) < min_chars
+
+
+def page_runs(scanned: List[bool]) -> List[Tuple[int, int, bool]]:
+    """Group pages into contiguous (first, last, scanned) runs, 1-based and inclusive."""
+    runs: List[Tuple[int, int, bool]] = []
+    for number, flag in enumerate(scanned, 1):
+        if runs and runs[-1][2] == flag:
+            runs[-1] = (runs[-1][0], number, flag)
+        else:
+            runs.append((number, number, flag))
+    return runs
+
+
+def _clean(text: str) -> str:
+    # pdfium separates lines with \r\n and marks soft hyphens/page breaks with control characters
+    return text.replace("\r\n", "\n").replace("\r", "\n").replace("\x02", "").replace("\x0c", "").strip()
+
+
+def extract(path: Path, docling_fn: DoclingFn, fast_paths: bool = EXTRACT_FAST_PATHS,
+            page_texts_fn: Callable[..., Optional[List[str]]] = pdf_page_texts,
+            page_range: Optional[Tuple[int, int]] = None) -> Tuple[str, dict]:
+    """Extract text from path (or one page window of a PDF) via the cheapest sufficient route; returns (text, metrics)."""
+    path = Path(path)
+    started = time.perf_counter()
+    suffix = path.suffix.lower()
+    metrics = {"file": path.name, "route": "docling", "pages": None, "ocr_pages": None}
+
+    if fast_paths and suffix in TEXT_SUFFIXES:
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        metrics["route"] = "text"
+    elif fast_paths and suffix == ".pdf" and (texts := page_texts_fn(path, page_range)):
+        scanned = [is_scanned(t) for t in texts]
+        offset = page_range[0] - 1 if page_range else 0
+        metrics["pages"] = len(texts)
+        metrics["ocr_pages"] = sum(scanned)
+        if all(scanned):
+            text = docling_fn(path, page_range)
+        else:
+            parts = []
+            for first, last, is_scan in page_runs(scanned):
+                if is_scan:
+                    parts.append(docling_fn(path, (first + offset, last + offset)))
+                else:
+                    parts.extend(_clean(t) for t in texts[first - 1:last])
+            text = "\n\n".join(p for p in parts if p)
+            metrics["route"] = "pdf_mixed" if any(scanned) else "pdf_text"
+    else:
+        text = docling_fn(path, page_range)
+
+    if page_range:
+        metrics["page_range"] = list(page_range)
+    metrics["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    log_metrics(metrics)
+    return text, metrics
+
+
+def log_metrics(metrics: dict, log_path: str = EXTRACT_METRICS_LOG) -> None:
+    if not log_path:
+        return
+    try:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**metrics, "ts": time.time()}) + "\n")
+    except OSError:
+        pass
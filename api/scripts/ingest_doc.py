@@ -1,26 +1,36 @@
-﻿import sys
+﻿import asyncio
+import sys
 from pathlib import Path
-from time import time
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, VectorParams, Distance
+from qdrant_client.models import PointStruct, VectorParams, Distance, Filter, FieldCondition, MatchValue
 from qdrant_client.http.exceptions import UnexpectedResponse
 import hashlib
-from docling.document_converter import DocumentConverter
+import os
+import uuid
+from docling_profiles import DOCLING_PROFILE, PROFILES, get_converter
+
+from chunking import CHUNK_TOKENS, CHUNK_OVERLAP
+from conversion_cache import cached_markdown, conversion_options
+from extraction_router import extract
+from qdrant_writer import QdrantWriter, ensure_payload_indexes
 
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
 VECTOR_SIZE = 768  # embeddinggemma:300m dimension
-
-converter = DocumentConverter()
-
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "128"))
 
 def get_embedding(text: str):
     from embedding import get_embedding
     return get_embedding(text)
 
 
+def get_embeddings(texts):
+    from embedding import get_embeddings
+    return get_embeddings(texts)
+
+
 def ensure_collection(client: QdrantClient, collection: str):
-    """Create collection if it doesn't exist"""
+    """Create collection if it doesn't exist, with keyword indexes on agent, filename and document_id"""
     try:
         client.get_collection(collection)
     except UnexpectedResponse:
@@ -29,6 +39,9 @@ def ensure_collection(client: QdrantClient, collection: str):
             collection_name=collection,
             vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
         )
+    created = ensure_payload_indexes(client, collection)
+    if created:
+        print(f"Indexing payload fields of {collection}: {', '.join(created)}")
 
 
 def generate_doc_id(agent: str, filename: str) -> str:
@@ -37,10 +50,25 @@ def generate_doc_id(agent: str, filename: str) -> str:
     return hashlib.md5(content.encode()).hexdigest()
 
 
+def document_key(p: Path, root: Path = None) -> str:
+    """Name a file is ingested under: its path relative to the ingest root (just the name at the top level)"""
+    if root is not None and Path(root).is_dir():
+        try:
+            return Path(p).resolve().relative_to(Path(root).resolve()).as_posix()
+        except ValueError:
+            pass
+    return Path(p).name
+
+
+def chunk_id(doc_id: str, index: int) -> str:
+    """Deterministic point ID per chunk, so re-ingesting a document overwrites its chunks"""
+    return str(uuid.uuid5(uuid.UUID(doc_id), str(index)))
+
+
 def document_exists(client: QdrantClient, collection: str, doc_id: str) -> bool:
-    """Check if document already ingested"""
+    """Check if document already ingested (its first chunk is present)"""
     try:
-        result = client.retrieve(collection_name=collection, ids=[doc_id])
+        result = client.retrieve(collection_name=collection, ids=[chunk_id(doc_id, 0)])
         return len(result) > 0
     except:
         return False
@@ -48,132 +76,312 @@ def document_exists(client: QdrantClient, collection: str, doc_id: str) -> bool:
 
 def extract_text(p: Path) -> str:
     """Extract text from document with fallback"""
+    return extract_with_route(p)[0]
+
+
+def extract_with_route(p: Path, profile: str = None):
+    """Extract text via the extraction router; returns (text, metrics) where metrics["route"] is the path taken"""
     if p.suffix.lower() in [".pdf", ".md"]:
-        doc = converter.convert(str(p))
-        
-        try:
-            return doc.document.export_to_markdown()
-        except AttributeError:
-            # Fallback: manual extraction
-            markdown_parts = []
-            if hasattr(doc.document, 'pages'):
-                for page in doc.document.pages:
-                    if hasattr(page, 'elements'):
-                        for element in page.elements:
-                            if hasattr(element, 'text'):
-                                markdown_parts.append(element.text)
-            return "\n".join(markdown_parts) if markdown_parts else ""
-    
-    return p.read_text(encoding="utf-8", errors="ignore")
-
-
-def ingest(agent: str, p: Path, client: QdrantClient, skip_duplicates: bool = True) -> int:
-    """Ingest single document with duplicate detection"""
-    collection = f"agent_{agent.lower()}_memory"
-    doc_id = generate_doc_id(agent, p.name)
+        return extract(p, lambda path, page_range: _cached_docling(path, page_range, profile))
     
-    # Skip if already exists
-    if skip_duplicates and document_exists(client, collection, doc_id):
-        print(f"  [SKIP] {p.name} (already ingested)")
-        return 0
+    text = p.read_text(encoding="utf-8", errors="ignore")
+    return text, {"file": p.name, "route": "text", "pages": None, "ocr_pages": None, "elapsed_sec": 0.0}
+
+
+def extract_window(p: Path, first: int, last: int, profile: str = None):
+    """Extract pages first..last (1-based, inclusive) of a large PDF; returns (text, metrics)"""
+    return extract(p, lambda path, page_range: _cached_docling(path, page_range, profile), page_range=(first, last))
+
+
+def _cached_docling(p: Path, page_range=None, profile: str = None) -> str:
+    """Docling output for the whole file or a page range, from the conversion cache when possible"""
+    extra = {"pages": f"{page_range[0]}-{page_range[1]}"} if page_range else {}
+    # docling only gets scanned pages (or whole scanned files) here, so they are always OCR'd
+    options = conversion_options("default", profile, **extra)
+    return cached_markdown(p, options, lambda: _docling_markdown(p, page_range, profile))
+
+
+def _docling_markdown(p: Path, page_range=None, profile: str = None) -> str:
+    converter = get_converter(profile=profile, scanned_pages=True)
+    doc = converter.convert(str(p), page_range=page_range) if page_range else converter.convert(str(p))
     
     try:
-        text = extract_text(p)
-    except Exception as e:
-        print(f"  [ERROR] Failed to read {p.name}: {e}")
-        return 0
+        return doc.document.export_to_markdown()
+    except AttributeError:
+        # Fallback: manual extraction
+        markdown_parts = []
+        if hasattr(doc.document, 'pages'):
+            for page in doc.document.pages:
+                if hasattr(page, 'elements'):
+                    for element in page.elements:
+                        if hasattr(element, 'text'):
+                            markdown_parts.append(element.text)
+        return "\n".join(markdown_parts) if markdown_parts else ""
+
+
+def delete_document(client: QdrantClient, collection: str, doc_id: str):
+    """Remove every chunk of a document (stale chunks would otherwise outlive a shorter re-ingest)"""
+    client.delete(
+        collection_name=collection,
+        points_selector=Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=doc_id))]),
+    )
+    # Whole-document point written before chunked ingestion (ID = doc_id)
+    client.delete(collection_name=collection, points_selector=[doc_id])
+
+
+def build_points(agent: str, filename: str, doc_id: str, chunks: list, vectors: list, chunk_count: int = None) -> list:
+    chunk_count = chunk_count or len(chunks)
+    return [
+        PointStruct(
+            id=chunk_id(doc_id, c["index"]),
+            payload={
+                "agent": agent,
+                "filename": filename,
+                "document_id": doc_id,
+                "chunk_index": c["index"],
+                "chunk_count": chunk_count,
+                "heading": c["heading"],
+                "content": c["text"],
+            },
+            vector=v,
+        )
+        for c, v in zip(chunks, vectors)
+    ]
+
+
+def delete_points(client: QdrantClient, collection: str, ids: list, batch_size: int = UPSERT_BATCH_SIZE):
+    for start in range(0, len(ids), batch_size):
+        client.delete(collection_name=collection, points_selector=ids[start:start + batch_size])
+
+
+def purge_files(client: QdrantClient, collection: str, manifest, agent: str, gone: dict) -> int:
+    """Delete the chunks of manifest rows whose files are gone and forget them; returns files purged"""
+    purged = []
+    for gone_path, row in gone.items():
+        try:
+            delete_points(client, collection, row["chunk_ids"])
+            purged.append(gone_path)
+            print(f"  [PURGE] {Path(gone_path).name} ({len(row['chunk_ids'])} chunks)")
+        except Exception as e:
+            print(f"  [ERROR] Failed to purge {Path(gone_path).name}: {e}")
+    manifest.forget(agent, purged)
+    return len(purged)
+
+
+def run_pipeline(agent: str, todo: list, client: QdrantClient, collection: str, manifest, run_id: str,
+                 workers: int = None, executor=None, profile: str = None, root: Path = None) -> dict:
+    """Ingest manifest todo entries through the pipeline and checkpoint them under run_id.
+
+    Documents are identified by their path relative to root (see document_key), so files
+    with the same name in different subfolders are separate documents.
+
+    Returns the pipeline summary plus the run "status" (completed | partial).
+    KeyboardInterrupt propagates with the run left resumable.
+    """
+    from functools import partial
+    from ingest_pipeline import IngestPipeline, INGEST_WORKERS, convert_file, convert_window
+    from embedding import EMBED_MODEL
+
+    settings = f"chunks={CHUNK_TOKENS}/{CHUNK_OVERLAP}"
+    writer = QdrantWriter(client, collection)
+    names = {document_key(e["path"], root): e for e in todo}
+    entries = {generate_doc_id(agent, name): e for name, e in names.items()}
+    by_name = {name: e["path"] for name, e in names.items()}
     
-    if not text.strip():
-        print(f"  [SKIP] {p.name} (empty content)")
-        return 0
+    def clear_unknown(doc_id):
+        # Files without a manifest row may have chunks from an older ingest; clear them by document_id.
+        if entries[doc_id]["previous"] is None:
+            delete_document(client, collection, doc_id)
     
-    try:
-        vector = get_embedding(text)
-    except Exception as e:
-        print(f"  [ERROR] Failed to generate embedding for {p.name}: {e}")
-        return 0
-    
-    point = PointStruct(
-        id=doc_id,  # Consistent ID prevents duplicates
-        payload={"agent": agent, "filename": p.name, "content": text},
-        vector=vector
+    def finalize(record):
+        # Checkpoint: runs once the document's last chunk batch is written
+        doc_id, count = record["doc_id"], record["chunk_count"]
+        entry = entries[doc_id]
+        new_ids = [chunk_id(doc_id, i) for i in range(count)]
+        stale = sorted(set((entry["previous"] or {}).get("chunk_ids", [])) - set(new_ids))
+        if stale:
+            delete_points(client, collection, stale)
+        if record.get("streamed"):
+            # Streamed chunks were written before the document's chunk count was known
+            client.set_payload(collection_name=collection, payload={"chunk_count": count}, points=new_ids)
+        manifest.record(agent, entry, doc_id, new_ids, EMBED_MODEL, settings, run_id=run_id)
+    
+    def write(records):
+        points = [
+            point
+            for r in records
+            for point in build_points(agent, r["filename"], r["doc_id"], [r["chunk"]], [r["vector"]], r["chunk_count"])
+        ]
+        # Sent now (not buffered): finalize checkpoints the document once write returns
+        writer.write(points)
+    
+    pipeline = IngestPipeline(
+        agent,
+        embed_fn=get_embeddings,
+        write_fn=write,
+        delete_fn=clear_unknown,
+        done_fn=finalize,
+        doc_id_fn=lambda f: generate_doc_id(agent, document_key(f, root)),
+        name_fn=lambda f: document_key(f, root),
+        convert_fn=partial(convert_file, profile=profile),
+        window_fn=partial(convert_window, profile=profile),
+        executor=executor,
+        workers=workers or INGEST_WORKERS,
     )
+    summary = asyncio.run(pipeline.run([e["path"] for e in todo]))
+    writer.barrier()
+    summary["upserts"] = writer.stats()
     
-    try:
-        client.upsert(collection_name=collection, points=[point])
-        print(f"  [OK] {p.name}")
-        return 1
-    except Exception as e:
-        print(f"  [ERROR] Failed to upsert {p.name}: {e}")
-        return 0
+    manifest.mark(run_id, [by_name[n] for n in pipeline.skipped], "skipped")
+    manifest.mark(run_id, [by_name[n] for n in summary["errors"]], "failed",
+                  {str(by_name[n].resolve()): err for n, err in summary["errors"].items()})
+    summary["status"] = "partial" if summary["errors"] else "completed"
+    manifest.finish_run(run_id, summary["status"], summary)
+    summary["ingested_paths"] = [by_name[n] for n in pipeline.ingested]
+    return summary
+
+
+def ingest_multiple(agent: str, path: str, skip_duplicates: bool = True, workers: int = None, resume: bool = False,
+                    profile: str = None):
+    """Ingest new and changed documents through the staged pipeline (convert | embed | write).
+
+    The ingest manifest decides what to do: unchanged files are skipped after a stat,
+    changed files are re-ingested and lose their stale chunks, and files that were
+    deleted from disk have their chunks purged. skip_duplicates=False (--force)
+    re-ingests everything.
 
+    Every run is checkpointed in the manifest database: a file is marked done as soon
+    as its last chunk batch is written. resume=True (--resume) continues the latest
+    unfinished run for this agent and path with only its remaining files.
+
+    profile selects the docling CPU pipeline profile (fast | balanced | accurate).
+    """
+    from ingest_pipeline import INGEST_WORKERS, print_stage_report
+    from ingest_manifest import IngestManifest
+    from embedding import EMBED_MODEL
 
-def ingest_multiple(agent: str, path: str, skip_duplicates: bool = True):
-    """Ingest multiple documents with progress tracking"""
     p = Path(path)
+    if not p.exists():
+        print(f"ERROR: Path does not exist: {path}")
+        return
+    
     client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
     collection = f"agent_{agent.lower()}_memory"
     
     # Ensure collection exists
     ensure_collection(client, collection)
     
-    count = 0
-    skipped = 0
-    errors = 0
-    start = time()
+    manifest = IngestManifest()
+    settings = f"chunks={CHUNK_TOKENS}/{CHUNK_OVERLAP}"
+    rows = manifest.rows(agent)
+    run = manifest.last_unfinished_run(agent, p) if resume else None
+    purged = 0
     
-    # Gather files
-    if p.is_dir():
-        files = [f for f in p.rglob("*") if f.suffix.lower() in [".txt", ".pdf", ".md"]]
-    elif p.is_file():
-        files = [p] if p.suffix.lower() in [".txt", ".pdf", ".md"] else []
+    if run is not None:
+        # Resume: only the files the interrupted run had not finished
+        run_id = run["run_id"]
+        skip_duplicates = not run["force"]
+        files = [Path(f) for f in manifest.run_files(run_id) if os.path.exists(f)]
+        print(f"\nResuming run {run_id} ({run['status']}): {len(files)} file(s) left")
     else:
-        print(f"ERROR: Path does not exist: {path}")
-        return
+        if resume:
+            print("No unfinished run to resume; starting a new run.")
+        # Gather files
+        if p.is_dir():
+            files = [f for f in p.rglob("*") if f.suffix.lower() in [".txt", ".pdf", ".md"]]
+        else:
+            files = [p] if p.suffix.lower() in [".txt", ".pdf", ".md"] else []
+        
+        # Files that disappeared from disk since they were ingested
+        purged = purge_files(client, collection, manifest, agent, manifest.missing(agent, p, files, rows))
+        
+        if not files:
+            print(f"No documents found in {path}")
+            manifest.close()
+            return
     
-    if not files:
-        print(f"No documents found in {path}")
-        return
+    if skip_duplicates:
+        todo, unchanged = manifest.classify(agent, files, EMBED_MODEL, settings, rows)
+    else:
+        todo, unchanged = manifest.classify(agent, files, EMBED_MODEL, settings, rows={})
+        for entry in todo:
+            entry["previous"] = rows.get(str(entry["path"].resolve()))
     
-    print(f"\nIngesting {len(files)} file(s) for agent {agent.upper()}")
+    if run is None:
+        run_id = manifest.start_run(agent, p, [e["path"] for e in todo], force=not skip_duplicates)
+    else:
+        manifest.mark(run_id, unchanged, "skipped")
+    
+    workers = workers or INGEST_WORKERS
+    print(f"\nIngesting {len(todo)} of {len(files)} file(s) for agent {agent.upper()}")
+    print(f"Run ID: {run_id}")
     print(f"Collection: {collection}")
-    print(f"Duplicate detection: {'ON' if skip_duplicates else 'OFF'}\n")
+    print(f"Unchanged (skipped by manifest): {len(unchanged)}")
+    print(f"Conversion workers: {workers}")
+    print(f"Docling profile: {profile or DOCLING_PROFILE}\n")
     
-    # Process files
-    for i, file in enumerate(files, 1):
-        print(f"[{i}/{len(files)}] Processing {file.name}...")
-        result = ingest(agent, file, client, skip_duplicates)
-        if result == 1:
-            count += 1
-        elif result == 0 and skip_duplicates:
-            # Check if it was skipped vs error by looking at output
-            skipped += 1
+    try:
+        summary = run_pipeline(agent, todo, client, collection, manifest, run_id, workers, profile=profile, root=p)
+    except KeyboardInterrupt:
+        manifest.finish_run(run_id, "interrupted")
+        counts = manifest.run_counts(run_id)
+        manifest.close()
+        print(f"\nInterrupted: {counts.get('done', 0)} file(s) committed, {counts.get('pending', 0)} left.")
+        print(f"Continue with: python ingest_doc.py {agent} {path} --resume")
+        return None
     
-    elapsed = time() - start
+    status = summary["status"]
+    counts = manifest.run_counts(run_id)
+    manifest.close()
+    summary.update({"run_id": run_id, "status": status, "unchanged": len(unchanged), "purged": purged})
     
     # Summary
     print(f"\n{'='*60}")
-    print(f"Ingestion Summary for {agent.upper()}")
+    print(f"Ingestion Summary for {agent.upper()} (run {run_id}: {status})")
     print(f"{'='*60}")
-    print(f"Ingested: {count} files")
-    print(f"Skipped: {skipped - count} files (duplicates)")
-    print(f"Errors: {errors} files")
-    print(f"Time: {elapsed:.2f}s")
+    print(f"Ingested: {summary['ingested']} files")
+    print(f"Unchanged: {len(unchanged)} files")
+    print(f"Skipped: {summary['skipped']} files (empty)")
+    print(f"Purged: {purged} deleted files")
+    print(f"Errors: {len(summary['errors'])} files")
+    print(f"Run totals: {counts.get('done', 0)} done, {counts.get('skipped', 0)} skipped, "
+          f"{counts.get('failed', 0)} failed, {counts.get('pending', 0)} pending")
+    print(f"Time: {summary['elapsed_sec']:.2f}s")
+    if summary["errors"]:
+        print(f"{'-'*60}")
+        print("Partial failures (retry with --resume):")
+        for name, err in sorted(summary["errors"].items()):
+            print(f"  {name}: {err}")
+    print(f"{'-'*60}")
+    print_stage_report(summary)
+    upserts = summary["upserts"]
+    print(f"Upserts: {upserts['points']} points in {upserts['requests']} requests ({upserts['retries']} retries)")
     print(f"{'='*60}")
+    return summary
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python ingest_doc.py <agent> <path> [--force]")
+        print("Usage: python ingest_doc.py <agent> <path> [--force] [--resume] [--workers N] [--profile NAME]")
         print("\nOptions:")
-        print("  --force    Re-ingest documents even if they already exist")
+        print("  --force      Re-ingest documents even if the manifest says they are unchanged")
+        print("  --resume     Continue the last interrupted or partially failed run for this path")
+        print("  --workers N  Conversion processes (default: INGEST_WORKERS or CPU count)")
+        print(f"  --profile    docling CPU profile: {', '.join(PROFILES)} (default: {DOCLING_PROFILE})")
         print("\nExamples:")
         print("  python ingest_doc.py CEO /path/to/docs")
         print("  python ingest_doc.py CFO /path/to/docs --force")
+        print("  python ingest_doc.py CFO /path/to/docs --resume")
+        print("  python ingest_doc.py COO /path/to/docs --profile fast")
         sys.exit(1)
     
     agent = sys.argv[1]
     path = sys.argv[2]
     skip_duplicates = "--force" not in sys.argv
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    profile = sys.argv[sys.argv.index("--profile") + 1] if "--profile" in sys.argv else None
+    if profile is not None and profile.lower() not in PROFILES:
+        print(f"ERROR: Unknown profile {profile!r} (use one of {', '.join(PROFILES)})")
+        sys.exit(1)
     
-    ingest_multiple(agent, path, skip_duplicates)
\ No newline at end of file
+    ingest_multiple(agent, path, skip_duplicates, workers, resume="--resume" in sys.argv, profile=profile)
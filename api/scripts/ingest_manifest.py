@@ -0,0 +1,222 @@
+"""
+Local manifest of ingested files for incremental re-ingestion.
+
+One SQLite row per (agent, path) records the file's size, mtime, content
+hash, document ID, chunk IDs and the embedding model/chunking settings it was
+ingested with. A run loads an agent's rows in one query and then needs only a
+``stat`` per file to decide:
+
+- unchanged: size and mtime match (or the content hash still matches after a
+  touch) and the file was embedded with the current model/settings -> skip.
+- changed / new: re-ingest; chunk IDs that the new version no longer produces
+  are deleted afterwards.
+- deleted: rows under the ingested root whose file is gone -> their chunks are
+  purged from Qdrant and the rows are dropped.
+
+The same database checkpoints ingestion runs: each run gets an ID and a row
+per file to ingest, and a file is marked done in the same transaction that
+records its manifest row, right after its last chunk batch is written. An
+interrupted run can be resumed (``--resume``) from its remaining files
+without re-listing the tree or redoing finished conversions.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INGEST_MANIFEST = os.getenv("INGEST_MANIFEST", os.path.join(os.path.dirname(BASE_DIR), "cache", "ingest_manifest.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    agent TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    chunk_ids TEXT NOT NULL,
+    embed_model TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (agent, path)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    root TEXT NOT NULL,
+    force INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS run_files (
+    run_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (run_id, path)
+);
+"""
+
+# run_files.status: pending -> done | skipped | failed
+# runs.status: running -> completed | partial | interrupted
+
+
+def content_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class IngestManifest:
+    """SQLite-backed record of what has been ingested, keyed by (agent, absolute path)."""
+
+    def __init__(self, path: str = INGEST_MANIFEST):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def rows(self, agent: str) -> Dict[str, dict]:
+        """All manifest rows for an agent, keyed by path (one query per run)."""
+        with self._lock:
+            cur = self._db.execute(
+                "SELECT path, size, mtime_ns, content_hash, doc_id, chunk_ids, embed_model, settings "
+                "FROM files WHERE agent = ?", (agent.lower(),))
+            return {
+                r[0]: {"size": r[1], "mtime_ns": r[2], "content_hash": r[3], "doc_id": r[4],
+                       "chunk_ids": json.loads(r[5]), "embed_model": r[6], "settings": r[7]}
+                for r in cur.fetchall()
+            }
+
+    def classify(self, agent: str, files: Iterable[Path], embed_model: str, settings: str,
+                 rows: Optional[Dict[str, dict]] = None):
+        """Split files into (todo, unchanged) using stat first and the content hash only when stat differs.
+
+        todo is a list of {"path", "size", "mtime_ns", "content_hash", "previous"} dicts.
+        Files that vanish or become unreadable after listing are left out of both lists
+        (a later run purges them if they are gone).
+        """
+        rows = self.rows(agent) if rows is None else rows
+        todo, unchanged = [], []
+        touched = []
+        for f in files:
+            key = str(Path(f).resolve())
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            row = rows.get(key)
+            current = row is not None and row["embed_model"] == embed_model and row["settings"] == settings
+            if current and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+                unchanged.append(f)
+                continue
+            try:
+                digest = content_hash(f)
+            except OSError:
+                continue
+            if current and row["content_hash"] == digest:
+                touched.append((st.st_size, st.st_mtime_ns, agent.lower(), key))
+                unchanged.append(f)
+                continue
+            todo.append({"path": f, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                         "content_hash": digest, "previous": row})
+        if touched:
+            with self._lock:
+                self._db.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE agent = ? AND path = ?", touched)
+                self._db.commit()
+        return todo, unchanged
+
+    def record(self, agent: str, entry: dict, doc_id: str, chunk_ids: List[str], embed_model: str, settings: str,
+               run_id: Optional[str] = None) -> None:
+        """Store the file's manifest row (and mark it done in run_id) in one transaction."""
+        with self._lock:
+            if run_id is not None:
+                self._db.execute("UPDATE run_files SET status = 'done', error = NULL WHERE run_id = ? AND path = ?",
+                                 (run_id, str(Path(entry["path"]).resolve())))
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (agent.lower(), str(Path(entry["path"]).resolve()), entry["size"], entry["mtime_ns"],
+                 entry["content_hash"], doc_id, json.dumps(chunk_ids), embed_model, settings, time.time()),
+            )
+            self._db.commit()
+
+    def missing(self, agent: str, root: Path, seen: Iterable[Path], rows: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+        """Rows under root (a directory or single file) whose path was not seen on disk this run."""
+        rows = self.rows(agent) if rows is None else rows
+        root = str(Path(root).resolve())
+        seen_keys = {str(Path(f).resolve()) for f in seen}
+        prefix = root.rstrip(os.sep) + os.sep
+        return {p: r for p, r in rows.items()
+                if (p == root or p.startswith(prefix)) and p not in seen_keys}
+
+    def forget(self, agent: str, paths: Iterable[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM files WHERE agent = ? AND path = ?",
+                                 [(agent.lower(), p) for p in paths])
+            self._db.commit()
+
+    # -- runs ----------------------------------------------------------------
+    def start_run(self, agent: str, root: Path, paths: Iterable[Path], force: bool = False) -> str:
+        run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        with self._lock:
+            self._db.execute("INSERT INTO runs (run_id, agent, root, force, status, started_at) VALUES (?, ?, ?, ?, 'running', ?)",
+                             (run_id, agent.lower(), str(Path(root).resolve()), int(force), time.time()))
+            self._db.executemany("INSERT OR IGNORE INTO run_files (run_id, path, status) VALUES (?, ?, 'pending')",
+                                 [(run_id, str(Path(p).resolve())) for p in paths])
+            self._db.commit()
+        return run_id
+
+    def last_unfinished_run(self, agent: str, root: Path) -> Optional[dict]:
+        """Most recent run for agent/root that did not complete cleanly."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT run_id, force, status, started_at FROM runs WHERE agent = ? AND root = ? "
+                "AND status IN ('running', 'interrupted', 'partial') ORDER BY started_at DESC LIMIT 1",
+                (agent.lower(), str(Path(root).resolve()))).fetchone()
+        if row is None:
+            return None
+        return {"run_id": row[0], "force": bool(row[1]), "status": row[2], "started_at": row[3]}
+
+    def run_files(self, run_id: str, statuses=("pending", "failed")) -> List[str]:
+        marks = ",".join("?" * len(statuses))
+        with self._lock:
+            cur = self._db.execute(f"SELECT path FROM run_files WHERE run_id = ? AND status IN ({marks}) ORDER BY path",
+                                   (run_id, *statuses))
+            return [r[0] for r in cur.fetchall()]
+
+    def run_counts(self, run_id: str) -> Dict[str, int]:
+        with self._lock:
+            cur = self._db.execute("SELECT status, COUNT(*) FROM run_files WHERE run_id = ? GROUP BY status", (run_id,))
+            return dict(cur.fetchall())
+
+    def mark(self, run_id: str, paths: Iterable[Path], status: str, errors: Optional[Dict[str, str]] = None) -> None:
+        """Set the status of run files; errors maps resolved path -> message."""
+        errors = errors or {}
+        with self._lock:
+            self._db.executemany(
+                "UPDATE run_files SET status = ?, error = ? WHERE run_id = ? AND path = ?",
+                [(status, errors.get(key), run_id, key) for key in (str(Path(p).resolve()) for p in paths)])
+            self._db.commit()
+
+    def finish_run(self, run_id: str, status: str, summary: Optional[dict] = None) -> None:
+        with self._lock:
+            self._db.execute("UPDATE runs SET status = ?, finished_at = ?, summary = ? WHERE run_id = ?",
+                             (status, time.time(), json.dumps(summary) if summary else None, run_id))
+            self._db.commit()
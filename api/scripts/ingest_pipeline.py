@@ -0,0 +1,403 @@
+"""
+Staged, pipelined document ingestion.
+
+ingest_multiple used to run conversion, embedding and upsert one file at a
+time, so docling's CPU work and the Ollama/Qdrant I/O never overlapped. The
+pipeline runs them as concurrent stages joined by bounded queues:
+
+    files --> [convert: process pool] --> chunks --> [embed: async batch workers]
+          --> points --> [write: async batch upserters] --> Qdrant
+
+- convert: text extraction (see extraction_router) + chunking in
+  ``INGEST_WORKERS`` sandboxed processes (default: all cores; see
+  conversion_sandbox for timeouts, memory ceiling and quarantine); at most
+  two conversions per worker are in flight.
+- embed: ``EMBED_WORKERS`` tasks pull chunks from any document and embed them
+  in batches of ``EMBED_BATCH_SIZE``.
+- write: ``WRITE_WORKERS`` tasks upsert points in batches of
+  ``UPSERT_BATCH_SIZE``.
+
+PDFs longer than ``CONVERT_WINDOW_PAGES`` pages are streamed: they are
+converted one page window at a time and each window's chunks are queued as
+soon as it is done, so embedding starts before conversion finishes and a
+worker never holds more than one window of the document. Chunks do not
+overlap across window boundaries.
+
+Queues hold at most ``PIPELINE_QUEUE_SIZE`` items, so a slow stage applies
+backpressure upstream instead of buffering the whole archive in memory. A
+document counts as ingested once all of its chunks have been written; each
+stage reports items, busy time and throughput at the end of the run.
+``done_fn`` is called once per completed document (the ingest manifest uses
+it to record the new chunk IDs and drop stale ones).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from conversion_sandbox import Quarantined, SandboxExecutor
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", "2"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "128"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "512"))
+
+_DONE = object()
+
+
+def plan_windows(path: str) -> Optional[List[Tuple[int, int]]]:
+    """Page windows for a PDF large enough to stream, else None."""
+    from extraction_router import page_windows
+    return page_windows(Path(path))
+
+
+def init_convert_worker(workers: int) -> None:
+    """Worker initializer: give each conversion process its share of the cores."""
+    import docling_profiles
+    docling_profiles.set_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def convert_window(path: str, first: int, last: int, profile: Optional[str] = None):
+    """Process-pool task: extract and chunk one page window; returns (chunks, extraction metrics)."""
+    from ingest_doc import extract_window
+    from chunking import chunk_markdown
+    text, metrics = extract_window(Path(path), first, last, profile)
+    return chunk_markdown(text), metrics
+
+
+def convert_file(path: str, profile: Optional[str] = None):
+    """Process-pool task: extract text and chunk it (runs in a worker with its own docling converter).
+
+    Returns (chunks, extraction metrics); convert_fn may also return just the chunks.
+    """
+    from ingest_doc import extract_with_route
+    from chunking import chunk_markdown
+    text, metrics = extract_with_route(Path(path), profile)
+    return chunk_markdown(text), metrics
+
+
+class StageStats:
+    """Items processed and time spent by one pipeline stage."""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+
+    def add(self, items: int, seconds: float) -> None:
+        self.items += items
+        self.batches += 1
+        self.busy += seconds
+
+    def report(self, wall: float) -> dict:
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "unit": self.unit,
+            "batches": self.batches,
+            "busy_sec": round(self.busy, 2),
+            "per_sec": round(self.items / wall, 2) if wall > 0 else 0.0,
+        }
+
+
+class IngestPipeline:
+    """Convert -> embed -> write with bounded queues between the stages."""
+
+    def __init__(
+        self,
+        agent: str,
+        embed_fn: Callable[[List[str]], list],
+        write_fn: Callable[[List[dict]], None],
+        delete_fn: Optional[Callable[[str], None]] = None,
+        exists_fn: Optional[Callable[[str], bool]] = None,
+        done_fn: Optional[Callable[[dict], None]] = None,
+        convert_fn: Callable[[str], object] = convert_file,
+        windows_fn: Optional[Callable[[str], Optional[List[Tuple[int, int]]]]] = plan_windows,
+        window_fn: Callable[[str, int, int], object] = convert_window,
+        doc_id_fn: Optional[Callable[[Path], str]] = None,
+        name_fn: Optional[Callable[[Path], str]] = None,
+        executor: Optional[Executor] = None,
+        workers: int = INGEST_WORKERS,
+        embed_workers: int = EMBED_WORKERS,
+        write_workers: int = WRITE_WORKERS,
+        embed_batch: int = EMBED_BATCH_SIZE,
+        upsert_batch: int = UPSERT_BATCH_SIZE,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+    ):
+        self.agent = agent
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.delete_fn = delete_fn
+        self.exists_fn = exists_fn
+        self.done_fn = done_fn
+        self.convert_fn = convert_fn
+        self.windows_fn = windows_fn
+        self.window_fn = window_fn
+        self.doc_id_fn = doc_id_fn or (lambda p: p.name)
+        self.name_fn = name_fn or (lambda p: p.name)  # "filename" of records, skipped and errors
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.embed_workers = max(1, embed_workers)
+        self.write_workers = max(1, write_workers)
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        self.queue_size = queue_size
+        self.stats = {
+            "convert": StageStats("convert", "docs"),
+            "embed": StageStats("embed", "chunks"),
+            "write": StageStats("write", "chunks"),
+        }
+        self.ingested: List[str] = []
+        self.skipped: List[str] = []
+        self.errors: Dict[str, str] = {}
+        self.routes: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._open: Set[str] = set()  # streamed documents still converting
+        self._totals: Dict[str, int] = {}
+
+    # -- bookkeeping ---------------------------------------------------------
+    def _fail(self, records: List[dict], stage: str, error: Exception) -> None:
+        for doc_id, filename in {(r["doc_id"], r["filename"]) for r in records}:
+            if doc_id in self._pending:
+                self._pending.pop(doc_id)
+                self.errors[filename] = f"{stage}: {error}"
+                print(f"  [ERROR] {filename} ({stage}): {error}")
+
+    def _written(self, records: List[dict]) -> List[dict]:
+        """Count written chunks; returns one record per document that is now complete."""
+        completed = []
+        for r in records:
+            doc_id = r["doc_id"]
+            if doc_id not in self._pending:
+                continue  # document already failed in another batch
+            self._pending[doc_id] -= 1
+            if self._pending[doc_id] == 0 and doc_id not in self._open:
+                del self._pending[doc_id]
+                completed.append({**r, "chunk_count": self._totals.get(doc_id, r["chunk_count"])})
+        return completed
+
+    async def _complete(self, records: List[dict]) -> None:
+        for r in records:
+            if self.done_fn is not None:
+                try:
+                    await asyncio.to_thread(self.done_fn, r)
+                except Exception as e:
+                    self.errors[r["filename"]] = f"finalize: {e}"
+                    print(f"  [ERROR] {r['filename']} (finalize): {e}")
+                    continue
+            self.ingested.append(r["filename"])
+            print(f"  [OK] {r['filename']} ({r['chunk_count']} chunks)")
+
+    @staticmethod
+    async def _take_batch(queue: asyncio.Queue, size: int):
+        """Block for one item, then drain whatever is ready up to size; returns (batch, saw_done)."""
+        first = await queue.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        while len(batch) < size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    # -- stages --------------------------------------------------------------
+    async def _convert_one(self, path: Path, chunks_q: asyncio.Queue, slots: asyncio.Semaphore) -> None:
+        try:
+            await self._convert_and_enqueue(path, chunks_q)
+        finally:
+            # Held until the chunks are queued, so a slow embed stage throttles conversion.
+            slots.release()
+
+    async def _convert_and_enqueue(self, path: Path, chunks_q: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        doc_id = self.doc_id_fn(path)
+        name = self.name_fn(path)
+        try:
+            if self.exists_fn is not None and await asyncio.to_thread(self.exists_fn, doc_id):
+                self.skipped.append(name)
+                print(f"  [SKIP] {name} (already ingested)")
+                return
+            windows = await asyncio.to_thread(self.windows_fn, str(path)) if self.windows_fn else None
+            if windows:
+                await self._stream_windows(path, doc_id, name, windows, chunks_q)
+                return
+            started = time.perf_counter()
+            chunks = await loop.run_in_executor(self.executor, self.convert_fn, str(path))
+            self.stats["convert"].add(1, time.perf_counter() - started)
+            chunks = self._unpack(chunks)
+        except Exception as e:
+            if isinstance(e, Quarantined):
+                self.skipped.append(name)
+                print(f"  [SKIP] {name} ({e})")
+                return
+            self.errors[name] = f"convert: {e}"
+            print(f"  [ERROR] Failed to read {name}: {e}")
+            return
+
+        if not chunks:
+            self.skipped.append(name)
+            print(f"  [SKIP] {name} (empty content)")
+            return
+        if self.delete_fn is not None:
+            # Stale chunks go before any new chunk of this document reaches a writer.
+            try:
+                await asyncio.to_thread(self.delete_fn, doc_id)
+            except Exception as e:
+                self.errors[name] = f"delete: {e}"
+                print(f"  [ERROR] Failed to clear old chunks for {name}: {e}")
+                return
+        self._pending[doc_id] = len(chunks)
+        for chunk in chunks:
+            await chunks_q.put({"doc_id": doc_id, "path": str(path), "filename": name, "chunk": chunk,
+                                "chunk_count": len(chunks)})
+
+    def _unpack(self, result) -> List[dict]:
+        """convert_fn/window_fn return chunks or (chunks, extraction metrics); count the route taken."""
+        if isinstance(result, tuple):
+            result, metrics = result
+            self.routes[metrics["route"]] = self.routes.get(metrics["route"], 0) + 1
+        return result
+
+    async def _stream_windows(self, path: Path, doc_id: str, name: str, windows: List[Tuple[int, int]],
+                              chunks_q: asyncio.Queue) -> None:
+        """Convert a large document window by window, queueing each window's chunks as soon as it is ready."""
+        loop = asyncio.get_running_loop()
+        total = 0
+        self._pending[doc_id] = 0
+        self._open.add(doc_id)
+        try:
+            for first, last in windows:
+                if doc_id not in self._pending:
+                    return  # a chunk of this document already failed downstream
+                started = time.perf_counter()
+                try:
+                    chunks = self._unpack(await loop.run_in_executor(self.executor, self.window_fn, str(path),
+                                                                     first, last))
+                    if chunks and total == 0 and self.delete_fn is not None:
+                        await asyncio.to_thread(self.delete_fn, doc_id)
+                except Quarantined as e:
+                    self._pending.pop(doc_id, None)
+                    self.skipped.append(name)
+                    print(f"  [SKIP] {name} ({e})")
+                    return
+                except Exception as e:
+                    self._pending.pop(doc_id, None)
+                    self.errors[name] = f"convert: pages {first}-{last}: {e}"
+                    print(f"  [ERROR] Failed to read {name} (pages {first}-{last}): {e}")
+                    return
+                self.stats["convert"].add(1 if last == windows[-1][1] else 0, time.perf_counter() - started)
+                for chunk in chunks:
+                    chunk["index"] = total
+                    total += 1
+                    self._totals[doc_id] = total
+                    self._pending[doc_id] += 1
+                    await chunks_q.put({"doc_id": doc_id, "path": str(path), "filename": name, "chunk": chunk,
+                                        "chunk_count": None, "streamed": True})
+        finally:
+            self._open.discard(doc_id)
+
+        if doc_id not in self._pending:
+            return
+        if total == 0:
+            del self._pending[doc_id]
+            self.skipped.append(name)
+            print(f"  [SKIP] {name} (empty content)")
+        elif self._pending[doc_id] == 0:
+            # every chunk was written while later windows were still converting
+            del self._pending[doc_id]
+            await self._complete([{"doc_id": doc_id, "path": str(path), "filename": name,
+                                   "chunk_count": total, "streamed": True}])
+
+    async def _feed(self, files: List[Path], chunks_q: asyncio.Queue) -> None:
+        slots = asyncio.Semaphore(self.workers * 2)
+        tasks = []
+        for path in files:
+            await slots.acquire()
+            tasks.append(asyncio.create_task(self._convert_one(path, chunks_q, slots)))
+        await asyncio.gather(*tasks)
+
+    async def _embed_worker(self, chunks_q: asyncio.Queue, points_q: asyncio.Queue) -> None:
+        from chunking import embedding_text
+        while True:
+            batch, done = await self._take_batch(chunks_q, self.embed_batch)
+            if batch:
+                started = time.perf_counter()
+                try:
+                    vectors = await asyncio.to_thread(self.embed_fn, [embedding_text(r["chunk"]) for r in batch])
+                except Exception as e:
+                    self._fail(batch, "embed", e)
+                else:
+                    self.stats["embed"].add(len(batch), time.perf_counter() - started)
+                    for record, vector in zip(batch, vectors):
+                        if record["doc_id"] in self._pending:
+                            await points_q.put({**record, "vector": vector})
+            if done:
+                await chunks_q.put(_DONE)  # let the sibling workers see it too
+                return
+
+    async def _write_worker(self, points_q: asyncio.Queue) -> None:
+        while True:
+            batch, done = await self._take_batch(points_q, self.upsert_batch)
+            batch = [r for r in batch if r["doc_id"] in self._pending]
+            if batch:
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.write_fn, batch)
+                except Exception as e:
+                    self._fail(batch, "write", e)
+                else:
+                    self.stats["write"].add(len(batch), time.perf_counter() - started)
+                    await self._complete(self._written(batch))
+            if done:
+                await points_q.put(_DONE)
+                return
+
+    async def run(self, files: List[Path]) -> dict:
+        started = time.perf_counter()
+        chunks_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        points_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        own_executor = self.executor is None
+        if own_executor:
+            self.executor = SandboxExecutor(self.workers, initializer=init_convert_worker, initargs=(self.workers,))
+        try:
+            embedders = [asyncio.create_task(self._embed_worker(chunks_q, points_q))
+                         for _ in range(self.embed_workers)]
+            writers = [asyncio.create_task(self._write_worker(points_q)) for _ in range(self.write_workers)]
+            await self._feed(files, chunks_q)
+            await chunks_q.put(_DONE)
+            await asyncio.gather(*embedders)
+            await points_q.put(_DONE)
+            await asyncio.gather(*writers)
+        finally:
+            if own_executor:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+        wall = time.perf_counter() - started
+        return {
+            "ingested": len(self.ingested),
+            "skipped": len(self.skipped),
+            "errors": dict(self.errors),
+            "elapsed_sec": round(wall, 2),
+            "stages": [s.report(wall) for s in self.stats.values()],
+            "extraction": dict(self.routes),
+        }
+
+
+def print_stage_report(summary: dict) -> None:
+    print(f"{'Stage':<10}{'Items':>10}{'Busy (s)':>12}{'Per sec':>12}")
+    for s in summary["stages"]:
+        print(f"{s['stage']:<10}{s['items']:>10}{s['busy_sec']:>12.2f}{s['per_sec']:>12.2f}  ({s['unit']})")
+    if summary.get("extraction"):
+        print("Extraction: " + ", ".join(f"{route}={n}" for route, n in sorted(summary["extraction"].items())))
@@ -0,0 +1,428 @@
+"""
+Watch-folder ingestion daemon.
+
+Each agent gets a drop folder (by default ``data/inbox/<AGENT>/``). Files that
+land there, or change, are ingested incrementally through the same manifest +
+pipeline path as ``ingest_doc.py``, and files removed from a drop folder have
+their chunks purged. Nobody has to run a batch job.
+
+- Change detection uses watchdog (inotify on Linux) when it is installed and
+  falls back to polling the folders every ``WATCH_POLL_SEC`` seconds.
+- Partial writes are debounced: a file is queued only after its size and
+  mtime have been stable for ``WATCH_DEBOUNCE_SEC`` seconds. Temporary names
+  (``.part``, ``.tmp``, ``.crdownload``, ``~$`` and dot files) are ignored.
+- Queued files are ingested in batches of up to ``WATCH_BATCH_MAX`` per agent
+  by one worker thread that keeps the Qdrant client, manifest and docling
+  process pool warm between batches.
+- Metrics (debouncing/queued/in-flight counts, oldest queued lag, landing ->
+  searchable latency) are written to ``WATCH_METRICS_PATH`` and, when
+  ``WATCH_METRICS_PORT`` is set, served as JSON on ``/metrics``.
+
+Usage:
+    python ingest_watch.py [--root DIR] [--agent CEO=/path/to/folder ...] [--poll]
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(BASE_DIR))
+
+WATCH_ROOT = os.getenv("WATCH_ROOT", os.path.join(ROOT_DIR, "data", "inbox"))
+WATCH_DEBOUNCE_SEC = float(os.getenv("WATCH_DEBOUNCE_SEC", "2"))
+WATCH_POLL_SEC = float(os.getenv("WATCH_POLL_SEC", "2"))
+WATCH_BATCH_MAX = int(os.getenv("WATCH_BATCH_MAX", "64"))
+WATCH_METRICS_PATH = os.getenv("WATCH_METRICS_PATH", os.path.join(os.path.dirname(BASE_DIR), "cache", "ingest_watch.json"))
+WATCH_METRICS_PORT = int(os.getenv("WATCH_METRICS_PORT", "0"))
+
+SUPPORTED_SUFFIXES = {".txt", ".pdf", ".md"}
+TEMP_SUFFIXES = {".part", ".tmp", ".crdownload", ".partial", ".swp"}
+
+
+def is_candidate(path: Path) -> bool:
+    name = path.name
+    if name.startswith(".") or name.startswith("~$"):
+        return False
+    if path.suffix.lower() in TEMP_SUFFIXES:
+        return False
+    return path.suffix.lower() in SUPPORTED_SUFFIXES
+
+
+def _sig(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class DropFolderWatcher:
+    """Debounces drop-folder changes and feeds stable files to ingest_fn in batches."""
+
+    def __init__(
+        self,
+        folders: Dict[str, Path],
+        ingest_fn: Callable[[str, List[Path]], dict],
+        purge_fn: Optional[Callable[[str, List[Path]], int]] = None,
+        debounce: float = WATCH_DEBOUNCE_SEC,
+        poll_interval: float = WATCH_POLL_SEC,
+        batch_max: int = WATCH_BATCH_MAX,
+        use_inotify: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.folders = {agent.upper(): Path(folder) for agent, folder in folders.items()}
+        self.ingest_fn = ingest_fn
+        self.purge_fn = purge_fn
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.batch_max = batch_max
+        self.clock = clock
+        self.mode = "polling"
+        self._use_inotify = use_inotify
+        self._observer = None
+        self._known: Dict[Path, Tuple[int, int]] = {}
+        self._pending: Dict[Path, dict] = {}  # path -> {"agent", "first_seen", "changed", "sig"}
+        self._ready: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._in_flight = 0
+        self.counters = {"ingested": 0, "skipped": 0, "unchanged": 0, "failed": 0, "purged": 0, "batches": 0}
+        self._lags: List[float] = []
+
+    # -- change intake -------------------------------------------------------
+    def _agent_for(self, path: Path) -> Optional[str]:
+        for agent, folder in self.folders.items():
+            try:
+                path.relative_to(folder)
+                return agent
+            except ValueError:
+                continue
+        return None
+
+    def notice(self, path, agent: Optional[str] = None) -> None:
+        """Record that path was created or modified (from inotify or a poll)."""
+        path = Path(path)
+        agent = agent or self._agent_for(path)
+        if agent is None or not is_candidate(path):
+            return
+        now = self.clock()
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = {"agent": agent, "first_seen": now, "changed": now, "sig": _sig(path)}
+            else:
+                entry["changed"] = now
+
+    def removed(self, path, agent: Optional[str] = None) -> None:
+        path = Path(path)
+        agent = agent or self._agent_for(path)
+        if agent is None or not is_candidate(path):
+            return
+        with self._lock:
+            self._pending.pop(path, None)
+            self._known.pop(path, None)
+        self._ready.put(("purge", agent, path, self.clock()))
+
+    def scan(self) -> None:
+        """Polling pass: notice new/changed files and removals since the last scan."""
+        seen = {}
+        for agent, folder in self.folders.items():
+            if not folder.is_dir():
+                continue
+            for path in folder.rglob("*"):
+                if path.is_file() and is_candidate(path):
+                    seen[path] = (agent, _sig(path))
+        for path, (agent, sig) in seen.items():
+            if self._known.get(path) != sig:
+                self._known[path] = sig
+                self.notice(path, agent)
+        for path in [p for p in self._known if p not in seen]:
+            self.removed(path)
+
+    def settle(self) -> None:
+        """Queue pending files whose size/mtime have been stable for the debounce window."""
+        now = self.clock()
+        with self._lock:
+            for path, entry in list(self._pending.items()):
+                sig = _sig(path)
+                if sig is None:
+                    del self._pending[path]
+                    continue
+                if sig != entry["sig"]:
+                    entry["sig"], entry["changed"] = sig, now
+                    continue
+                if now - entry["changed"] >= self.debounce:
+                    del self._pending[path]
+                    self._known[path] = sig
+                    self._ready.put(("ingest", entry["agent"], path, entry["first_seen"]))
+
+    # -- ingestion -----------------------------------------------------------
+    def process_ready(self) -> int:
+        """Ingest/purge everything queued so far, in order and batched per agent; returns jobs handled."""
+        jobs = []
+        while len(jobs) < self.batch_max:
+            try:
+                jobs.append(self._ready.get_nowait())
+            except queue.Empty:
+                break
+        if not jobs:
+            return 0
+        with self._lock:
+            self._in_flight = len(jobs)
+
+        # Only the last event per path counts (a delete then re-create is an ingest,
+        # an ingest then delete is a purge), and jobs run in arrival order: runs of
+        # consecutive jobs of the same kind for the same agent share one batch.
+        last = {path: i for i, (_, _, path, _) in enumerate(jobs)}
+        batches: List[Tuple[str, str, List[tuple]]] = []
+        for i, (kind, agent, path, first_seen) in enumerate(jobs):
+            if last[path] != i:
+                continue
+            if batches and batches[-1][:2] == (kind, agent):
+                batches[-1][2].append((path, first_seen))
+            else:
+                batches.append((kind, agent, [(path, first_seen)]))
+        for kind, agent, items in batches:
+            paths = [p for p, _ in items]
+            try:
+                if kind == "purge":
+                    if self.purge_fn is not None:
+                        self.counters["purged"] += self.purge_fn(agent, paths) or 0
+                    continue
+                # Counts come from the run: unchanged files (manifest) and empty ones are not "ingested"
+                summary = self.ingest_fn(agent, paths) or {}
+                self.counters["ingested"] += summary.get("ingested", 0)
+                self.counters["skipped"] += summary.get("skipped", 0)
+                self.counters["unchanged"] += summary.get("unchanged", 0)
+                self.counters["failed"] += len(summary.get("errors", {}))
+            except Exception as e:
+                self.counters["failed"] += len(paths)
+                print(f"  [ERROR] Watch batch for {agent} failed: {e}")
+                continue
+            finally:
+                self.counters["batches"] += 1
+            done = self.clock()
+            ingested = set(summary.get("ingested_paths", ()))
+            self._lags.extend(done - first_seen for p, first_seen in items if p in ingested)
+            self._lags = self._lags[-200:]
+        with self._lock:
+            self._in_flight = 0
+        return len(jobs)
+
+    def metrics(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            pending = len(self._pending)
+            oldest = min((e["first_seen"] for e in self._pending.values()), default=None)
+            in_flight = self._in_flight
+        queued = list(self._ready.queue)
+        if queued:
+            oldest_queued = min(first_seen for *_, first_seen in queued)
+            oldest = oldest_queued if oldest is None else min(oldest, oldest_queued)
+        lags = self._lags
+        return {
+            "mode": self.mode,
+            "folders": {a: str(f) for a, f in self.folders.items()},
+            "debouncing": pending,
+            "queued": len(queued),
+            "in_flight": in_flight,
+            "oldest_lag_sec": round(now - oldest, 2) if oldest is not None else 0.0,
+            "last_lag_sec": round(lags[-1], 2) if lags else None,
+            "avg_lag_sec": round(sum(lags) / len(lags), 2) if lags else None,
+            "max_lag_sec": round(max(lags), 2) if lags else None,
+            **self.counters,
+        }
+
+    # -- loops ---------------------------------------------------------------
+    def _start_inotify(self) -> bool:
+        if not self._use_inotify:
+            return False
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.notice(event.src_path)
+
+            on_modified = on_created
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.removed(event.src_path)
+                    watcher.notice(event.dest_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    watcher.removed(event.src_path)
+
+        observer = Observer()
+        for folder in self.folders.values():
+            folder.mkdir(parents=True, exist_ok=True)
+            observer.schedule(Handler(), str(folder), recursive=True)
+        observer.start()
+        self._observer = observer
+        self.mode = "inotify"
+        return True
+
+    def _ingest_loop(self) -> None:
+        while not self._stop.is_set():
+            if not self.process_ready():
+                self._stop.wait(0.2)
+
+    def run(self, metrics_path: Optional[str] = WATCH_METRICS_PATH) -> None:
+        """Block until stop(): watch, debounce and ingest."""
+        self.scan()  # files that landed while the daemon was down
+        inotify = self._start_inotify()
+        worker = threading.Thread(target=self._ingest_loop, name="vboarder-ingest-watch", daemon=True)
+        worker.start()
+        print(f"Watching {len(self.folders)} folder(s) via {self.mode}; debounce {self.debounce}s")
+        last_poll = self.clock()
+        tick = min(0.5, self.debounce / 2 or 0.5)
+        try:
+            while not self._stop.wait(tick):
+                if not inotify and self.clock() - last_poll >= self.poll_interval:
+                    self.scan()
+                    last_poll = self.clock()
+                self.settle()
+                if metrics_path:
+                    write_metrics(metrics_path, self.metrics())
+        finally:
+            self._stop.set()
+            if self._observer is not None:
+                self._observer.stop()
+                self._observer.join(2)
+            worker.join(5)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def write_metrics(path: str, metrics: dict) -> None:
+    tmp = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**metrics, "updated_at": time.time()}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def serve_metrics(watcher: DropFolderWatcher, port: int) -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = json.dumps(watcher.metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="vboarder-watch-metrics", daemon=True).start()
+    print(f"Metrics: http://127.0.0.1:{port}/metrics")
+
+
+class IngestService:
+    """Warm ingestion resources shared by every watch batch (client, manifest, docling pool)."""
+
+    def __init__(self, folders: Dict[str, Path], workers: int = None):
+        from conversion_sandbox import SandboxExecutor
+        from qdrant_client import QdrantClient
+        import ingest_doc
+        from ingest_manifest import IngestManifest
+        from ingest_pipeline import INGEST_WORKERS, init_convert_worker
+
+        self.ingest_doc = ingest_doc
+        self.folders = folders
+        self.workers = workers or INGEST_WORKERS
+        self.client = QdrantClient(host=ingest_doc.QDRANT_HOST, port=ingest_doc.QDRANT_PORT)
+        self.manifest = IngestManifest()
+        self.executor = SandboxExecutor(self.workers, initializer=init_convert_worker, initargs=(self.workers,))
+        self._collections = set()
+
+    def _collection(self, agent: str) -> str:
+        collection = f"agent_{agent.lower()}_memory"
+        if collection not in self._collections:
+            self.ingest_doc.ensure_collection(self.client, collection)
+            self._collections.add(collection)
+        return collection
+
+    def ingest(self, agent: str, paths: List[Path]) -> dict:
+        from embedding import EMBED_MODEL
+        from chunking import CHUNK_TOKENS, CHUNK_OVERLAP
+
+        collection = self._collection(agent)
+        todo, unchanged = self.manifest.classify(agent, paths, EMBED_MODEL, f"chunks={CHUNK_TOKENS}/{CHUNK_OVERLAP}")
+        if not todo:
+            return {"ingested": 0, "skipped": 0, "unchanged": len(unchanged), "errors": {}}
+        run_id = self.manifest.start_run(agent, self.folders[agent.upper()], [e["path"] for e in todo])
+        summary = self.ingest_doc.run_pipeline(agent, todo, self.client, collection, self.manifest, run_id,
+                                               self.workers, executor=self.executor, root=self.folders[agent.upper()])
+        return {**summary, "unchanged": len(unchanged)}
+
+    def purge(self, agent: str, paths: List[Path]) -> int:
+        rows = self.manifest.rows(agent)
+        gone = {k: rows[k] for k in (str(Path(p).resolve()) for p in paths) if k in rows}
+        return self.ingest_doc.purge_files(self.client, self._collection(agent), self.manifest, agent, gone)
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+        self.manifest.close()
+
+
+def default_folders(root: str = WATCH_ROOT) -> Dict[str, Path]:
+    """One drop folder per agent: <root>/<AGENT>/ for every existing sub-folder."""
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    return {d.name.upper(): d for d in sorted(root_path.iterdir()) if d.is_dir()}
+
+
+def main(argv: List[str]) -> None:
+    root = WATCH_ROOT
+    folders: Dict[str, Path] = {}
+    if "--root" in argv:
+        root = argv[argv.index("--root") + 1]
+    for i, arg in enumerate(argv):
+        if arg == "--agent" and i + 1 < len(argv):
+            agent, _, folder = argv[i + 1].partition("=")
+            folders[agent.upper()] = Path(folder)
+    folders = folders or default_folders(root)
+    if not folders:
+        print(f"No drop folders: create {root}/<AGENT>/ or pass --agent CEO=/path/to/folder")
+        sys.exit(1)
+
+    service = IngestService(folders)
+    watcher = DropFolderWatcher(folders, service.ingest, service.purge, use_inotify="--poll" not in argv)
+    if WATCH_METRICS_PORT:
+        serve_metrics(watcher, WATCH_METRICS_PORT)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -8,6 +8,11 @@ from docling.datamodel.base_models import InputFormat
 from pathlib import Path
 import json
 
+from conversion_cache import cached_markdown, conversion_options
+
+
+EXPORT_FAILED = "# Export Failed\n\nCould not extract markdown from document."
+
 
 class MarkdownExporter:
     """Handle markdown export with fallback strategies"""
@@ -59,18 +64,24 @@ class MarkdownExporter:
         if result:
             return result
         
-        return "# Export Failed\n\nCould not extract markdown from document."
+        return EXPORT_FAILED
 
 
 def safe_convert_to_markdown(file_path: str) -> str:
-    """Convert document and safely export to markdown"""
+    """Convert document and safely export to markdown (cached by content, docling version and options)"""
+    markdown = cached_markdown(file_path, conversion_options(exporter="fallback"), lambda: _convert(file_path))
+    return markdown or EXPORT_FAILED
+
+
+def _convert(file_path: str) -> str:
+    """Uncached conversion; a failed export returns "" so it is retried next time"""
     converter = DocumentConverter()
     result = converter.convert(file_path)
     
     exporter = MarkdownExporter(result)
     markdown = exporter.export_with_fallback()
     
-    return markdown
+    return "" if markdown == EXPORT_FAILED else markdown
 
 
 if __name__ == "__main__":
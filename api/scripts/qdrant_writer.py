@@ -0,0 +1,139 @@
+"""
+Batched, asynchronous Qdrant upserts.
+
+``client.upsert`` defaults to ``wait=True``, which blocks every request until
+Qdrant has applied it to the segments and updated the HNSW index. Ingestion
+only needs the write to be accepted (Qdrant acknowledges ``wait=False``
+requests once they are in its write-ahead log, so they survive a restart), so
+``QdrantWriter``:
+
+- sends points in batches of ``UPSERT_BATCH_SIZE`` (``add`` accumulates
+  points across calls, ``write`` sends a batch straight away);
+- uses ``wait=False`` unless ``UPSERT_WAIT=1``;
+- retries transient failures (connection errors, timeouts, HTTP 429/5xx) up
+  to ``UPSERT_RETRIES`` times with exponential backoff from
+  ``UPSERT_BACKOFF_SEC``. Point IDs are deterministic, so a retried batch
+  cannot duplicate chunks;
+- ``barrier()`` flushes and then waits until Qdrant has applied everything
+  sent so far. Updates to a collection are applied in order, so one
+  ``wait=True`` request at the end covers all earlier ones; the barrier uses
+  a delete of the nil UUID, which no chunk ID (uuid5) can equal, so it
+  changes nothing.
+
+``ensure_payload_indexes`` creates the keyword indexes used by filtered
+search and by the per-document deletes (``agent``, ``filename``,
+``document_id``); without them those filters scan every payload.
+"""
+
+import os
+import threading
+import time
+from typing import List, Sequence
+
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "128"))
+UPSERT_WAIT = os.getenv("UPSERT_WAIT", "0") == "1"
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", "4"))
+UPSERT_BACKOFF_SEC = float(os.getenv("UPSERT_BACKOFF_SEC", "0.5"))
+
+PAYLOAD_INDEX_FIELDS = ("agent", "filename", "document_id")
+BARRIER_ID = "00000000-0000-0000-0000-000000000000"
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors worth retrying: the request may succeed if sent again."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+    except ImportError:
+        return False
+    if isinstance(error, ResponseHandlingException):  # transport failure (connect/read errors, timeouts)
+        return True
+    return isinstance(error, UnexpectedResponse) and error.status_code in _TRANSIENT_STATUS
+
+
+def ensure_payload_indexes(client, collection: str, fields: Sequence[str] = PAYLOAD_INDEX_FIELDS) -> List[str]:
+    """Create missing keyword payload indexes on collection; returns the fields indexed now."""
+    from qdrant_client.models import PayloadSchemaType
+
+    existing = client.get_collection(collection).payload_schema or {}
+    created = []
+    for field in fields:
+        if field not in existing:
+            # wait=False: on a large collection the index is built in the background
+            client.create_payload_index(collection_name=collection, field_name=field,
+                                        field_schema=PayloadSchemaType.KEYWORD, wait=False)
+            created.append(field)
+    return created
+
+
+class QdrantWriter:
+    """Upserts points into one collection in batches, with retries and a final barrier."""
+
+    def __init__(self, client, collection: str, batch_size: int = UPSERT_BATCH_SIZE, wait: bool = UPSERT_WAIT,
+                 retries: int = UPSERT_RETRIES, backoff: float = UPSERT_BACKOFF_SEC):
+        self.client = client
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.wait = wait
+        self.retries = retries
+        self.backoff = backoff
+        self.counts = {"points": 0, "requests": 0, "retries": 0}
+        self._buffer: list = []
+        self._unsettled = False  # sent with wait=False since the last barrier
+        self._lock = threading.Lock()
+
+    def add(self, points: list) -> None:
+        """Buffer points; full batches are sent as they fill up."""
+        with self._lock:
+            self._buffer.extend(points)
+            if len(self._buffer) < self.batch_size:
+                return
+            cut = len(self._buffer) - len(self._buffer) % self.batch_size
+            ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        self.write(ready)
+
+    def write(self, points: list) -> None:
+        """Send points now, in batches (nothing is left in the buffer)."""
+        for start in range(0, len(points), self.batch_size):
+            self._upsert(points[start:start + self.batch_size], self.wait)
+
+    def flush(self) -> None:
+        with self._lock:
+            ready, self._buffer = self._buffer, []
+        self.write(ready)
+
+    def barrier(self) -> None:
+        """Flush, then block until Qdrant has applied every point sent so far."""
+        self.flush()
+        if self._unsettled:
+            self._retry(lambda: self.client.delete(collection_name=self.collection, points_selector=[BARRIER_ID],
+                                                   wait=True))
+            self._unsettled = False
+
+    def stats(self) -> dict:
+        return dict(self.counts)
+
+    def _upsert(self, points: list, wait: bool) -> None:
+        if not points:
+            return
+        self._retry(lambda: self.client.upsert(collection_name=self.collection, points=points, wait=wait))
+        with self._lock:
+            self.counts["points"] += len(points)
+            self.counts["requests"] += 1
+            self._unsettled = self._unsettled or not wait
+
+    def _retry(self, request) -> None:
+        attempt = 0
+        while True:
+            try:
+                return request()
+            except Exception as e:
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+                with self._lock:
+                    self.counts["retries"] += 1
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
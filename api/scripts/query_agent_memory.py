@@ -1,12 +1,26 @@
 ﻿"""
 query_agent_memory.py - Agent Memory Query Interface
 Query an agent's Qdrant memory using semantic similarity
+
+Importable: the API server's query engine calls ``handle_query`` in-process
+(or from long-lived worker processes), so the Qdrant client, the HTTP session
+to Ollama and the set of known collections are created once and reused.
+Run as a script it prints the same result as JSON (``--pretty`` for a table).
+
+``query_agents`` answers "ask the whole board" lookups: the query is embedded
+once and every agent collection is searched concurrently over the shared
+client, with results merged by score or grouped per agent. (Qdrant's
+``query_batch_points`` batches requests against a single collection only, and
+each agent has its own collection, so the per-collection searches are fanned
+out in parallel rather than sent as one batch.)
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse
+import json
 import requests
 import sys
+import threading
 import time
 
 # Configuration
@@ -14,38 +28,97 @@ OLLAMA_URL = "http://localhost:11434/api/embeddings"
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
 EMBED_MODEL = "embeddinggemma:300m"
+EMBED_TIMEOUT = 5
 DEFAULT_TOP_K = 5
+COLLECTION_CACHE_SEC = 60
+BOARD_ALIASES = {"all", "board"}
+
+
+class QueryError(RuntimeError):
+    """Raised when a query cannot be served (Ollama/Qdrant down, unknown agent)."""
+
+
+_client = None
+_session = None
+_collections = {}  # agent code -> collection name
+_collections_at = 0.0
+_init_lock = threading.Lock()
+
+
+def get_client() -> QdrantClient:
+    """Process-wide Qdrant client, created on first use."""
+    global _client
+    with _init_lock:
+        if _client is None:
+            _client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+        return _client
 
-# Initialize client
-client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+
+def _http() -> requests.Session:
+    global _session
+    with _init_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
 
 
 def get_embedding(text: str, model: str = EMBED_MODEL) -> list:
     """Generate embedding vector using Ollama"""
     try:
-        response = requests.post(
+        response = _http().post(
             OLLAMA_URL,
             json={"model": model, "prompt": text},
-            timeout=5  # Reduced from 20s
+            timeout=EMBED_TIMEOUT
         )
         response.raise_for_status()
         return response.json().get("embedding", [])
     except requests.Timeout:
-        print(f"ERROR: Ollama request timed out (>{5}s). Is Ollama running?")
-        sys.exit(1)
+        raise QueryError(f"Ollama request timed out (>{EMBED_TIMEOUT}s). Is Ollama running?")
     except requests.RequestException as e:
-        print(f"ERROR: Cannot connect to Ollama at {OLLAMA_URL}")
-        print(f"Details: {e}")
-        sys.exit(1)
+        raise QueryError(f"Cannot connect to Ollama at {OLLAMA_URL}: {e}")
+
+
+def agent_collections(refresh: bool = False) -> dict:
+    """Agent code -> memory collection, from one cached get_collections call"""
+    global _collections, _collections_at
+    if refresh or not _collections or time.time() - _collections_at > COLLECTION_CACHE_SEC:
+        _collections = {
+            c.name[len("agent_"):-len("_memory")]: c.name
+            for c in get_client().get_collections().collections
+            if c.name.startswith("agent_") and c.name.endswith("_memory")
+        }
+        _collections_at = time.time()
+    return _collections
 
 
 def collection_exists(collection_name: str) -> bool:
-    """Check if Qdrant collection exists"""
-    try:
-        client.get_collection(collection_name)
+    """Check if Qdrant collection exists (cached; a miss re-lists collections once)"""
+    if collection_name in agent_collections().values():
         return True
-    except UnexpectedResponse:
-        return False
+    return collection_name in agent_collections(refresh=True).values()
+
+
+def available_agents() -> list:
+    """Agent codes that have a memory collection in Qdrant"""
+    return sorted(code.upper() for code in agent_collections())
+
+
+def warm_up() -> None:
+    """Connect to Qdrant and cache the existing agent collections ahead of the first query."""
+    agent_collections(refresh=True)
+
+
+def _search(collection: str, embedding: list, top_k: int) -> list:
+    try:
+        response = get_client().query_points(
+            collection_name=collection,
+            query=embedding,
+            limit=top_k,
+            with_payload=True
+        )
+    except Exception as e:
+        raise QueryError(f"Qdrant query failed for collection '{collection}': {e}")
+    return response.points or []
 
 
 def query_agent(agent_name: str, query_text: str, top_k: int = DEFAULT_TOP_K, silent: bool = False) -> list:
@@ -55,39 +128,19 @@ def query_agent(agent_name: str, query_text: str, top_k: int = DEFAULT_TOP_K, si
 
     # Validate collection exists
     if not collection_exists(collection):
-        print(f"ERROR: Agent '{agent_name}' has no memory collection")
-        print(f"Collection '{collection}' not found in Qdrant")
-        print(f"\nAvailable agents:")
         try:
-            collections = client.get_collections().collections
-            for c in collections:
-                if c.name.startswith("agent_") and c.name.endswith("_memory"):
-                    agent = c.name.replace("agent_", "").replace("_memory", "").upper()
-                    print(f"  - {agent}")
-        except:
-            print("  (Unable to list collections)")
-        return []
+            agents = ", ".join(available_agents()) or "none"
+        except Exception:
+            agents = "unable to list collections"
+        raise QueryError(f"Agent '{agent_name}' has no memory collection '{collection}' (available: {agents})")
 
     # Generate embedding
     embedding = get_embedding(query_text)
     if not embedding:
-        print("ERROR: No embedding vector returned from Ollama")
-        return []
+        raise QueryError("No embedding vector returned from Ollama")
 
     # Query Qdrant
-    try:
-        response = client.query_points(
-            collection_name=collection,
-            query=embedding,
-            limit=top_k,
-            with_payload=True
-        )
-    except Exception as e:
-        print(f"ERROR: Qdrant query failed for collection '{collection}'")
-        print(f"Details: {e}")
-        return []
-
-    results = response.points or []
+    results = _search(collection, embedding, top_k)
     elapsed = round(time.time() - start_time, 3)
 
     # Format results
@@ -106,7 +159,7 @@ def query_agent(agent_name: str, query_text: str, top_k: int = DEFAULT_TOP_K, si
         print(f"\n{'='*70}")
         print(f"Agent: {agent_name.upper()} | Query: \"{query_text}\" | Time: {elapsed}s")
         print(f"{'='*70}")
-        
+
         if not results:
             print("No results found.")
         else:
@@ -114,10 +167,10 @@ def query_agent(agent_name: str, query_text: str, top_k: int = DEFAULT_TOP_K, si
                 content_preview = f["content"][:200]
                 if len(f["content"]) > 200:
                     content_preview += "..."
-                
+
                 print(f"\n[{f['rank']}] Score: {f['score']:.4f} | File: {f['filename']}")
                 print(f"    {content_preview}")
-        
+
         print(f"\n{'='*70}")
         print(f"Retrieved {len(results)}/{top_k} results from {collection}")
         print("Note: Score 1.0 = perfect match, 0.0 = unrelated")
@@ -125,42 +178,101 @@ def query_agent(agent_name: str, query_text: str, top_k: int = DEFAULT_TOP_K, si
     return formatted
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python query_agent_memory.py <AGENT> <QUERY>")
-        print("\nExamples:")
-        print("  python query_agent_memory.py CEO \"Q1 revenue goals\"")
-        print("  python query_agent_memory.py CFO \"financial planning\"")
-        sys.exit(1)
+def query_agents(agent_names, query_text: str, top_k: int = DEFAULT_TOP_K, merge: bool = True):
+    """Query several agents' memories with one embedding.
 
-    agent = sys.argv[1]
-    query = " ".join(sys.argv[2:])
-    query_agent(agent, query)
+    agent_names: iterable of agent codes, or None for every agent with a collection.
+    Returns the top_k hits across all agents by score (merge=True, each tagged with
+    "agent"), or {AGENT: [hits]} with top_k hits per agent (merge=False).
+    Agents without a collection are skipped.
+    """
+    collections = agent_collections()
+    codes = sorted(collections) if agent_names is None else [a.lower() for a in agent_names]
+    if any(c not in collections for c in codes):
+        collections = agent_collections(refresh=True)
+    codes = [c for c in codes if c in collections]
+    if not codes:
+        return [] if merge else {}
 
+    embedding = get_embedding(query_text)
+    if not embedding:
+        raise QueryError("No embedding vector returned from Ollama")
 
+    with ThreadPoolExecutor(max_workers=len(codes)) as pool:
+        hits = dict(zip(codes, pool.map(lambda c: _search(collections[c], embedding, top_k), codes)))
 
-    main()
+    grouped = {
+        code.upper(): [
+            {
+                "agent": code.upper(),
+                "score": round(r.score, 4),
+                "filename": r.payload.get("filename", "unknown"),
+                "content": r.payload.get("content", ""),
+            }
+            for r in points
+        ]
+        for code, points in hits.items()
+    }
+    if not merge:
+        for results in grouped.values():
+            for i, r in enumerate(results):
+                r["rank"] = i + 1
+        return grouped
+    merged = sorted((r for results in grouped.values() for r in results), key=lambda r: -r["score"])[:top_k]
+    for i, r in enumerate(merged):
+        r["rank"] = i + 1
+    return merged
 
-import json
-import sys
 
-if __name__ == "__main__":
-    try:
-        agent = sys.argv[1] if len(sys.argv) > 1 else None
-        query = sys.argv[2] if len(sys.argv) > 2 else None
-        if not agent or not query:
-            raise ValueError("Usage: query_agent_memory.py <agent> <message>")
+def parse_agents(agent: str):
+    """'ALL'/'BOARD' -> None (every agent), 'CEO,CFO' -> ['CEO', 'CFO'], 'CEO' -> ['CEO']"""
+    if agent.lower() in BOARD_ALIASES:
+        return None
+    return [a.strip() for a in agent.split(",") if a.strip()]
 
-        # Simulate existing retrieval
-        top_result = f"Processed query for agent: {agent} → {query}"
 
-        # ✅ Return structured JSON for FastAPI
-        print(json.dumps({
-            "agent": agent,
-            "response": top_result,
-            "status": "ok"
-        }))
+def handle_query(agent: str, query: str, top_k: int = DEFAULT_TOP_K) -> dict:
+    """Structured result for the API server: the top chunks joined as the response text."""
+    agents = parse_agents(agent)
+    if agents is not None and len(agents) == 1:
+        results = query_agent(agents[0], query, top_k=top_k, silent=True)
+    else:
+        results = query_agents(agents, query, top_k=top_k)
+    response = "\n\n".join(
+        f"[{r['agent'] + ': ' if 'agent' in r else ''}{r['filename']}] {r['content']}" for r in results
+    ) or "No results found."
+    return {"agent": agent, "response": response, "results": results, "status": "ok"}
 
-    except Exception as e:
-        print(json.dumps({"error": str(e)}))
+
+def main():
+    args = [a for a in sys.argv[1:] if a != "--pretty"]
+    if len(args) < 2:
+        print("Usage: python query_agent_memory.py [--pretty] <AGENT> <QUERY>")
+        print("\nExamples:")
+        print("  python query_agent_memory.py CEO \"Q1 revenue goals\"")
+        print("  python query_agent_memory.py --pretty CFO \"financial planning\"")
+        print("  python query_agent_memory.py CEO,CFO \"hiring budget\"")
+        print("  python query_agent_memory.py ALL \"launch date\"")
+        sys.exit(1)
+
+    agent = args[0]
+    query = " ".join(args[1:])
+    try:
+        if "--pretty" in sys.argv and parse_agents(agent) is not None and "," not in agent:
+            query_agent(agent, query)
+        elif "--pretty" in sys.argv:
+            for r in query_agents(parse_agents(agent), query):
+                print(f"[{r['rank']}] {r['score']:.4f} | {r['agent']} | {r['filename']}\n    {r['content'][:200]}")
+        else:
+            # ✅ Return structured JSON for FastAPI (subprocess mode)
+            print(json.dumps(handle_query(agent, query)))
+    except QueryError as e:
+        if "--pretty" in sys.argv:
+            print(f"ERROR: {e}")
+        else:
+            print(json.dumps({"error": str(e)}))
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Query execution for the API server.
+
+The server used to start a fresh interpreter per chat message, paying for the
+qdrant-client import, a new connection and a collection check every time.
+``QueryEngine`` keeps that state alive instead, in one of three modes
+(``QUERY_ENGINE_MODE``):
+
+- ``inprocess`` (default): ``handle_query`` runs on a thread in the server
+  process, sharing one Qdrant client and HTTP session.
+- ``pool``: ``QUERY_WORKERS`` long-lived worker processes, each importing the
+  query module once and taking jobs over a pipe. A worker that times out,
+  dies or whose request is cancelled is killed and replaced.
+- ``subprocess``: the legacy one-interpreter-per-request path, kept for
+  Windows setups where the other modes misbehave.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger("vboarder.api")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(BASE_DIR, "query_agent_memory.py")
+
+QUERY_ENGINE_MODE = os.getenv("QUERY_ENGINE_MODE", "inprocess").lower()
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "2"))
+QUERY_TIMEOUT = int(os.getenv("QUERY_TIMEOUT_SEC", "45"))
+
+MODES = ("inprocess", "pool", "subprocess")
+
+
+class QueryFailed(RuntimeError):
+    """The query ran but could not produce an answer."""
+
+
+class QueryTimeout(QueryFailed):
+    """The query did not finish within the configured timeout."""
+
+
+def default_handler(agent: str, query: str) -> dict:
+    import query_agent_memory
+    return query_agent_memory.handle_query(agent, query)
+
+
+def _warm_up() -> None:
+    try:
+        import query_agent_memory
+        query_agent_memory.warm_up()
+    except Exception as e:
+        logger.warning(f"Query engine warm-up failed (will retry on first query): {e}")
+
+
+def parse_query_output(stdout: str) -> str:
+    """Try JSON parsing first; fallback to plain text or delimiter section."""
+    s = stdout.strip()
+    if not s:
+        return s
+    try:
+        data = json.loads(s)
+        if isinstance(data, dict):
+            for key in ("response", "answer", "result"):
+                if key in data:
+                    return str(data[key])
+        return json.dumps(data)
+    except Exception:
+        pass
+    delimiter = "=" * 70
+    return s.split(delimiter)[-1].strip() if delimiter in s else s
+
+
+def _worker_main(conn, handler: Callable, warm: bool) -> None:
+    """Pool worker loop: import once, then serve (agent, query) jobs until told to stop."""
+    if warm:
+        _warm_up()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        agent, query = job
+        try:
+            conn.send(("ok", handler(agent, query)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _PoolWorker:
+    def __init__(self, ctx, handler: Callable, warm: bool):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, handler, warm), daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+
+    def call(self, agent: str, query: str, timeout: float):
+        self.conn.send((agent, query))
+        if not self.conn.poll(timeout):
+            raise QueryTimeout("Query timed out.")
+        return self.conn.recv()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class QueryEngine:
+    """Runs agent memory queries without per-request interpreter startup."""
+
+    def __init__(self, mode: str = QUERY_ENGINE_MODE, workers: int = QUERY_WORKERS,
+                 timeout: float = QUERY_TIMEOUT, handler: Callable = default_handler, warm: bool = True):
+        if mode not in MODES:
+            raise ValueError(f"Unknown QUERY_ENGINE_MODE {mode!r} (use one of {', '.join(MODES)})")
+        self.mode = mode
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self.handler = handler
+        self.warm = warm
+        self.served = 0
+        self.failed = 0
+        self.total_ms = 0.0
+        self._workers = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        if self.mode == "inprocess" and self.warm:
+            await asyncio.to_thread(_warm_up)
+        elif self.mode == "pool" and self._idle is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                worker = _PoolWorker(ctx, self.handler, self.warm)
+                self._workers.append(worker)
+                self._idle.put_nowait(worker)
+        logger.info(f"Query engine started (mode={self.mode}, workers={self.size if self.mode == 'pool' else 1})")
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            await asyncio.to_thread(worker.stop)
+        self._workers = []
+        self._idle = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": len(self._workers) if self.mode == "pool" else 1,
+            "served": self.served,
+            "failed": self.failed,
+            "avg_ms": round(self.total_ms / self.served, 1) if self.served else 0.0,
+        }
+
+    async def run(self, agent: str, message: str) -> str:
+        """Response text for one query; raises QueryTimeout / QueryFailed."""
+        started = time.perf_counter()
+        try:
+            if self.mode == "inprocess":
+                text = await self._run_inprocess(agent, message)
+            elif self.mode == "pool":
+                text = await self._run_pool(agent, message)
+            else:
+                text = await self._run_subprocess(agent, message)
+        except Exception:
+            self.failed += 1
+            raise
+        self.served += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+        return text
+
+    async def _run_inprocess(self, agent: str, message: str) -> str:
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(self.handler, agent, message), self.timeout)
+        except asyncio.TimeoutError:
+            raise QueryTimeout("Query timed out.")
+        except Exception as e:
+            raise QueryFailed(f"{type(e).__name__}: {e}")
+        return str(result.get("response", "")) if isinstance(result, dict) else str(result)
+
+    async def _run_pool(self, agent: str, message: str) -> str:
+        if self._idle is None:
+            await self.start()
+        worker = await self._idle.get()
+        try:
+            status, payload = await asyncio.to_thread(worker.call, agent, message, self.timeout)
+        except BaseException as e:
+            # A hung, dead or abandoned (cancelled) worker cannot be trusted with the next
+            # job: its pipe may still deliver this request's reply. Replace it.
+            self._replace(worker)
+            if isinstance(e, (EOFError, OSError)):
+                raise QueryFailed(f"Query worker exited: {e}")
+            raise
+        self._idle.put_nowait(worker)
+        if status != "ok":
+            raise QueryFailed(payload)
+        return str(payload.get("response", "")) if isinstance(payload, dict) else str(payload)
+
+    def _replace(self, worker: _PoolWorker) -> None:
+        """Kill worker and put a fresh one in the idle queue (no awaits, so it also runs on cancellation)."""
+        worker.process.kill()
+        asyncio.get_running_loop().run_in_executor(None, worker.stop)
+        self._workers.remove(worker)
+        fresh = _PoolWorker(multiprocessing.get_context("spawn"), self.handler, self.warm)
+        self._workers.append(fresh)
+        self._idle.put_nowait(fresh)
+
+    async def _run_subprocess(self, agent: str, message: str) -> str:
+        if not os.path.isfile(SCRIPT_PATH):
+            raise QueryFailed(f"Missing script: {SCRIPT_PATH}")
+        cmd = [sys.executable, SCRIPT_PATH, agent, message]
+        try:
+            res = await run_proc_blocking(cmd, cwd=BASE_DIR, env=os.environ.copy(), timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise QueryTimeout("Query timed out.")
+
+        out_text = (res.stdout or b"").decode("utf-8", errors="replace")
+        err_text = (res.stderr or b"").decode("utf-8", errors="replace")
+        if res.returncode != 0:
+            logger.error(f"Query script failed (code {res.returncode}). stderr:\n{err_text}")
+            raise QueryFailed(f"Query failed (code {res.returncode}): {err_text or out_text.strip()}")
+        if not out_text.strip():
+            raise QueryFailed("Query returned empty output.")
+        return parse_query_output(out_text)
+
+
+async def run_proc_blocking(cmd, cwd=None, env=None, timeout=None):
+    """Run subprocess in a thread to avoid Windows asyncio subprocess issues."""
+    def _run():
+        return subprocess.run(
+            cmd,
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=False,   # keep bytes; we'll decode explicitly
+            timeout=timeout,
+            check=False,
+        )
+    return await asyncio.to_thread(_run)
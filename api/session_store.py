@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import List, Dict, Any
+import json
+import logging
+
+logger = logging.getLogger("VBoarderAPI")
+
+MAX_TURNS_PER_SESSION = 50
+
+BASE_DIR = Path(__file__).parent
+CONV_DIR = BASE_DIR / "conversations"
+
+
+class SessionManager:
+    """Centralized class for managing conversation history persistence.
+
+    This is the single session store for a chat turn: the API layer creates one
+    per request and hands it to ``AgentConnector``, which reads, prunes and
+    writes the history exactly once.
+    """
+
+    def __init__(self, agent_role: str, session_id: str, conv_dir: Path = CONV_DIR):
+        self.agent_role = agent_role
+        self.session_id = session_id
+        self.path = conv_dir / f"{agent_role}_{session_id}.json"
+
+    @staticmethod
+    def prune_history(messages: List[Dict[str, Any]], max_turns: int = MAX_TURNS_PER_SESSION) -> List[Dict[str, Any]]:
+        """Keep only the last max_turns conversational pairs (user+assistant)."""
+        if not messages:
+            return messages
+        user_idxs = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+        if len(user_idxs) <= max_turns:
+            return messages
+        start_idx = user_idxs[-max_turns]
+        return messages[start_idx:]
+
+    @staticmethod
+    def count_turns(messages: List[Dict[str, Any]]) -> int:
+        """Number of user turns in a message list."""
+        return len([m for m in messages if m.get("role") == "user"])
+
+    def read_messages(self) -> List[Dict[str, Any]]:
+        """Read conversation history from file."""
+        if not self.path.exists():
+            return []
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to read session file {self.path}: {e}")
+            return []
+
+    def write_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Write conversation history to file (after pruning)."""
+        pruned_messages = self.prune_history(messages)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with self.path.open("w", encoding="utf-8") as f:
+                json.dump(pruned_messages, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"Failed to write session file {self.path}: {e}")
+            raise
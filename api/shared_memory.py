@@ -1,37 +1,199 @@
-﻿from pathlib import Path
-import json, time, re
+﻿"""
+Shared team knowledge available to all agents.
 
-SHARED_FILE = Path(r"D:\ai\projects\vboarder\data\shared\knowledge.json")
+Facts live in an append-only JSONL log (``SHARED_KNOWLEDGE_PATH``, default
+``data/shared/knowledge.jsonl``). Each process keeps the parsed log in memory
+together with a hash index for de-duplication and only reads the bytes appended
+since its last look, so writes are a single locked append and the prompt block
+is rebuilt only when the log has grown. A legacy ``knowledge.json`` next to the
+log is imported once on first use.
+"""
 
-def _read():
-    if SHARED_FILE.exists():
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_SHARED_FILE = Path(__file__).resolve().parent.parent / "data" / "shared" / "knowledge.jsonl"
+SHARED_FILE = Path(os.getenv("SHARED_KNOWLEDGE_PATH", str(DEFAULT_SHARED_FILE)))
+
+
+def fact_hash(text):
+    return hashlib.sha1(text.strip().lower().encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive cross-process lock on a sidecar lock file."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+class SharedKnowledgeStore:
+    """Append-only fact log with an in-memory dedupe index and a versioned prompt-block cache."""
+
+    def __init__(self, path=SHARED_FILE):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.legacy_path = self.path.with_suffix(".json")
+        self.version = 0
+        self.generation = 0  # bumped when the log is truncated or replaced
+        self._items = []
+        self._hashes = set()
+        self._offset = 0
+        self._block_cache = {}
+        self._lock = threading.RLock()
+        self._migrated = False
+
+    # ----- log reading -----
+    def _reset(self):
+        self._items, self._hashes, self._offset = [], set(), 0
+        self._block_cache.clear()
+        self.version += 1
+        self.generation += 1
+
+    def _sync(self):
+        """Pull in bytes appended since the last read (by this or any other process)."""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            if self._offset:
+                self._reset()
+            return
+        if size == self._offset:
+            return
+        if size < self._offset:
+            self._reset()
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(size - self._offset)
+        end = data.rfind(b"\n") + 1  # ignore a partially written trailing line
+        if not end:
+            return
+        for line in data[:end].splitlines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            self._items.append(item)
+            self._hashes.add(fact_hash(item.get("text", "")))
+        self._offset += end
+        self.version += 1
+
+    def _migrate_legacy(self):
+        """Import the old pretty-printed knowledge.json once, if the log does not exist yet."""
+        self._migrated = True
+        if self.path.exists() or not self.legacy_path.exists():
+            return
         try:
-            txt = SHARED_FILE.read_text(encoding="utf-8")
-            if not txt.strip():
-                return []
-            data = json.loads(txt)
-            if isinstance(data, dict) and "items" in data:
-                return data["items"]
-            if isinstance(data, list):
-                return data
+            data = json.loads(self.legacy_path.read_text(encoding="utf-8") or "[]")
         except Exception:
-            pass
-    return []
+            return
+        items = data["items"] if isinstance(data, dict) and "items" in data else data
+        if isinstance(items, list) and items:
+            with file_lock(self.lock_path):
+                if not self.path.exists():
+                    self._write_lines(items)
+
+    def _write_lines(self, items):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = "".join(json.dumps(i, ensure_ascii=False) + "\n" for i in items)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+
+    def _ensure_ready(self):
+        if not self._migrated:
+            self._migrate_legacy()
+        self._sync()
+
+    # ----- public API -----
+    def append_facts(self, facts):
+        """Append (text, source_agent) pairs in one locked write; returns the newly written items."""
+        with self._lock:
+            self._ensure_ready()
+            with file_lock(self.lock_path):
+                self._sync()
+                new_items, seen = [], set()
+                for text, source_agent in facts:
+                    text = (text or "").strip()
+                    h = fact_hash(text)
+                    if not text or h in self._hashes or h in seen:
+                        continue
+                    seen.add(h)
+                    new_items.append({"ts": time.time(), "source": source_agent, "type": "fact", "text": text})
+                if new_items:
+                    self._write_lines(new_items)
+                    self._sync()
+            return new_items
+
+    def append_fact(self, text, source_agent):
+        return len(self.append_facts([(text, source_agent)])) == 1
+
+    def load(self, max_items=30):
+        with self._lock:
+            self._ensure_ready()
+            return list(self._items[-max_items:] if max_items else self._items)
+
+    def items_since(self, start, generation):
+        """(generation, items after the first ``start``); a different generation means the log was rewritten and all items are returned."""
+        with self._lock:
+            self._ensure_ready()
+            if generation != self.generation:
+                start = 0
+            return self.generation, self._items[start:]
+
+    def block_text(self, max_items=20):
+        """Prompt block of recent facts; cached until the log grows."""
+        with self._lock:
+            self._ensure_ready()
+            cached = self._block_cache.get(max_items)
+            if cached and cached[0] == self.version:
+                return cached[1]
+            items = self._items[-max_items:] if max_items else self._items
+            bullets = [f"- {f['text']}" for f in items if f.get("type") == "fact"]
+            text = "Shared team knowledge available to all agents:\n" + "\n".join(bullets) if bullets else ""
+            self._block_cache[max_items] = (self.version, text)
+            return text
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store():
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = SharedKnowledgeStore(SHARED_FILE)
+        return _STORE
 
-def _write(items):
-    SHARED_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SHARED_FILE.write_text(json.dumps({"items": items}, ensure_ascii=False, indent=2), encoding="utf-8")
 
 def load_shared(max_items=30):
-    items = _read()
-    return items[-max_items:] if max_items else items
+    return get_store().load(max_items=max_items)
 
 def append_fact(text, source_agent):
-    items = _read()
-    norm = text.strip().lower()
-    if not any(i.get("text", "").strip().lower() == norm for i in items[-50:]):
-        items.append({"ts": time.time(), "source": source_agent, "type": "fact", "text": text.strip()})
-        _write(items)
+    return get_store().append_fact(text, source_agent)
 
 FACT_PATTERNS = [
     r"\b(project\s*codename|codename)\b.*\b(is|=)\b\s+.+",
@@ -41,17 +203,15 @@ FACT_PATTERNS = [
     r"\b(stakeholder|owner|contact)\b.*\b(is|=)\b\s+.+",
 ]
 
+# All patterns compiled into one alternation so a message is scanned once.
+FACT_RE = re.compile("|".join(f"(?:{p})" for p in FACT_PATTERNS), flags=re.IGNORECASE)
+
 def maybe_extract_fact(user_text: str):
     if not user_text:
         return None
-    for pat in FACT_PATTERNS:
-        if re.search(pat, user_text, flags=re.IGNORECASE):
-            return user_text.strip()
+    if FACT_RE.search(user_text):
+        return user_text.strip()
     return None
 
 def shared_block_text(max_items=20):
-    facts = load_shared(max_items=max_items)
-    bullets = [f"- {f['text']}" for f in facts if f.get("type") == "fact"]
-    if not bullets:
-        return ""
-    return "Shared team knowledge available to all agents:\n" + "\n".join(bullets)
+    return get_store().block_text(max_items=max_items)
@@ -3,28 +3,36 @@ import json
 import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from shared_memory import shared_block_text  # fixed import
-
-from shared_memory import shared_block_text
-from rag_memory import init_db_pool, search_knowledge_base
+from fact_index import relevant_block_text
+from session_store import SessionManager
+from context_window import ContextBuilder, DEFAULT_CONTEXT_BUDGET
+from embeddings import embed_query
+from knowledge_index import get_index
+from rag_memory import get_resources, search_knowledge_base
 import asyncio
 class AgentConnector:
-    """Connects to Ollama and manages agent conversations with session support."""
+    """Connects to Ollama and manages agent conversations with session support.
+
+    History is persisted through the injected ``SessionManager`` only; each turn
+    reads it once, prunes it once and writes it once.
+    """
 
-    def __init__(self, agent_role="ceo", session_id="default"):
+    def __init__(self, agent_role="ceo", session_id="default", session: Optional[SessionManager] = None):
         self.agent_role = agent_role.lower()
         self.session_id = session_id
         self.model = "mistral"
-        self.conversations_dir = "../data/conversations"
+        self.session = session or SessionManager(self.agent_role.upper(), session_id)
         self.agents_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents")
 
-        os.makedirs(self.conversations_dir, exist_ok=True)
         os.makedirs(self.agents_dir, exist_ok=True)
 
         self.agent_config = self._load_agent_config()
-        self.conversation_file = os.path.join(self.conversations_dir, f"{self.agent_role}_{self.session_id}.json")
-        self.conversation_history = self._load_conversation()
-        self._knowledge_cache = None
+        self.context = ContextBuilder(
+            self.session,
+            budget=int(self.agent_config.get("context_token_budget", DEFAULT_CONTEXT_BUDGET)),
+        )
+        self.conversation_history: List[Dict[str, Any]] = []
+        self._query_vector_cache = None
 
     def _load_agent_config(self):
         agent_folder = os.path.join(self.agents_dir, self.agent_role.upper())
@@ -67,41 +75,50 @@ class AgentConnector:
 
         return config
 
-    def _load_knowledge(self):
-        if self._knowledge_cache is not None:
-            return self._knowledge_cache
-        knowledge_content = []
-        for knowledge_file in self.agent_config.get("knowledge_files", []):
-            agent_folder = os.path.join(self.agents_dir, self.agent_role.upper())
-            file_path = os.path.join(agent_folder, knowledge_file)
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        knowledge_content.append(f"=== {knowledge_file} ===\n{content}\n")
-                except Exception as e:
-                    print(f"Error loading knowledge file {knowledge_file}: {e}")
-        self._knowledge_cache = "\n".join(knowledge_content) if knowledge_content else ""
-        return self._knowledge_cache
-
-    def _load_conversation(self):
-        if not os.path.exists(self.conversation_file):
-            return []
+    def _query_vector(self, query: str):
+        """Embed the current message at most once per turn; None if embeddings are unavailable."""
+        if self._query_vector_cache is None or self._query_vector_cache[0] != query:
+            self._query_vector_cache = (query, embed_query(query))
+        return self._query_vector_cache[1]
+
+    def _load_knowledge(self, query: str) -> str:
+        """Top-k knowledge chunks relevant to the current message (not the whole knowledge base)."""
+        knowledge_files = self.agent_config.get("knowledge_files", [])
+        if not knowledge_files:
+            return ""
+        agent_folder = os.path.join(self.agents_dir, self.agent_role.upper())
+        index = get_index(self.agent_role, agent_folder, knowledge_files)
         try:
-            with open(self.conversation_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            hits = index.search(query, self._query_vector(query))
         except Exception as e:
-            print(f"Error loading conversation history: {e}")
-            return []
+            print(f"Error searching knowledge files: {e}")
+            return ""
+        return "\n".join(f"=== {name} ===\n{chunk}\n" for name, chunk in hits)
+
+    def _start_turn(self, user_message: str) -> List[Dict[str, Any]]:
+        """Read the session once, append the user message and prune to the turn limit."""
+        history = self.session.read_messages()
+        history.append({
+            "role": "user",
+            "content": user_message,
+            "timestamp": datetime.now().isoformat()
+        })
+        self.conversation_history = self.session.prune_history(history)
+        return self.conversation_history
 
-    def _save_conversation(self):
+    def _finish_turn(self, assistant_message: str) -> None:
+        """Append the assistant reply and write the session once."""
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": assistant_message,
+            "timestamp": datetime.now().isoformat()
+        })
         try:
-            with open(self.conversation_file, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, indent=2, ensure_ascii=False)
+            self.session.write_messages(self.conversation_history)
         except Exception as e:
             print(f"Error saving conversation history: {e}")
 
-    def _build_system_prompt(self, concise: bool):
+    def _build_system_prompt(self, concise: bool, query: str = ""):
         style = (
             "Answer in 1-2 short sentences. Do not list steps or principles. Do not restate your role/title. Avoid repetition."
             if concise else
@@ -118,63 +135,81 @@ class AgentConnector:
         if self.agent_role != 'sec' or 'persona_content' not in self.agent_config:
             base_prompt += f"\n\nSTYLE: {style}"
 
-        knowledge = self._load_knowledge()
+        knowledge = self._load_knowledge(query)
         if knowledge:
             base_prompt += f"\n\n=== YOUR KNOWLEDGE BASE ===\n{knowledge}\n\nUse this knowledge to inform your responses, but speak naturally and don't just quote it."
 
         return base_prompt
 
-    def chat(self, user_message: str, concise: bool = False):
-        self.conversation_history = self._load_conversation()
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_message,
-            "timestamp": datetime.now().isoformat()
-        })
-
-        messages = [{"role": "system", "content": self._build_system_prompt(concise=concise)}]
+    def _build_messages(self, concise: bool) -> List[Dict[str, str]]:
+        query = self.conversation_history[-1]["content"] if self.conversation_history else ""
+        messages = [{"role": "system", "content": self._build_system_prompt(concise=concise, query=query)}]
 
         try:
-            _shared = shared_block_text(max_items=20)
+            _shared = relevant_block_text(self._query_vector(query))
             if _shared:
                 messages.insert(0, {"role": "system", "content": _shared})
         except Exception:
             pass
 
-        for msg in self.conversation_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.extend(self.context.build(self.conversation_history))
+        return messages
+
+    def _chat_options(self, concise: bool) -> Dict[str, Any]:
+        if self.agent_role == 'sec':
+            return {
+                "temperature": 0.3,
+                "top_p": 0.9,
+                "num_predict": 250,
+                "stop": ["\n\n\n"]
+            }
+        return {
+            "temperature": 0.5 if concise else 0.7,
+            "top_p": 0.85 if concise else 0.9,
+            "num_predict": 120 if concise else 250,
+            "stop": ["\n\n- ", "\n\n1.", "\n\n\n"]
+        }
+
+    def chat(self, user_message: str, concise: bool = False):
+        self._start_turn(user_message)
+        messages = self._build_messages(concise)
 
         try:
-            if self.agent_role == 'sec':
-                options = {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "num_predict": 250,
-                    "stop": ["\n\n\n"]
-                }
-            else:
-                options = {
-                    "temperature": 0.5 if concise else 0.7,
-                    "top_p": 0.85 if concise else 0.9,
-                    "num_predict": 120 if concise else 250,
-                    "stop": ["\n\n- ", "\n\n1.", "\n\n\n"]
-                }
-
-            response = ollama.chat(model=self.model, messages=messages, options=options)
+            response = ollama.chat(model=self.model, messages=messages, options=self._chat_options(concise))
             assistant_message = response['message']['content']
-
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_message,
-                "timestamp": datetime.now().isoformat()
-            })
-            self._save_conversation()
-            return assistant_message
         except Exception as e:
             error_msg = f"Error communicating with Ollama: {str(e)}"
             print(error_msg)
             return error_msg
 
+        self._finish_turn(assistant_message)
+        return assistant_message
+
+    async def chat_stream(self, user_message: str, concise: bool = False):
+        """Async generator yielding token chunks; the turn is persisted once the stream ends."""
+        # Session I/O and the query/knowledge embeddings block; keep them off the event loop
+        await asyncio.to_thread(self._start_turn, user_message)
+        messages = await asyncio.to_thread(self._build_messages, concise)
+
+        parts = []
+        try:
+            client = ollama.AsyncClient()
+            stream = await client.chat(
+                model=self.model, messages=messages, options=self._chat_options(concise), stream=True
+            )
+            async for chunk in stream:
+                token = chunk['message']['content']
+                if token:
+                    parts.append(token)
+                    yield token
+        except Exception as e:
+            error_msg = f"Error communicating with Ollama: {str(e)}"
+            print(error_msg)
+            yield error_msg
+            return
+
+        self._finish_turn("".join(parts))
+
     def get_conversation_summary(self):
         return {
             "session_id": self.session_id,
@@ -187,20 +222,8 @@ class AgentConnector:
     # === RAG Memory Hook ===
     async def recall_rag_context(self, message):
         try:
-            pool = await init_db_pool()
-            rag_data = await search_knowledge_base(pool, self.agent_role, message)
-            if rag_data:
-                print(f"[RAG] Retrieved {len(rag_data)} chars for {self.agent_role}")
-                return rag_data
-        except Exception as e:
-            print(f"[RAG Error] {e}")
-        return ""
-
-    # === RAG Memory Hook ===
-    async def recall_rag_context(self, message):
-        try:
-            pool = await init_db_pool()
-            rag_data = await search_knowledge_base(pool, self.agent_role, message)
+            resources = await get_resources()
+            rag_data = await search_knowledge_base(resources.pool, self.agent_role, message)
             if rag_data:
                 print(f"[RAG] Retrieved {len(rag_data)} chars for {self.agent_role}")
                 return rag_data
@@ -0,0 +1,121 @@
+"""
+Streaming response encoding for /chat_stream.
+
+Model tokens are coalesced into frames (flushed every ``flush_interval`` seconds
+or once ``max_frame_chars`` are buffered) so a response costs a few writes
+instead of one JSON document and one socket write per token. Frames are
+encoded either as Server-Sent Events (``data: {...}\\n\\n`` plus comment
+heartbeats) or as the legacy newline-delimited JSON shape.
+"""
+
+from typing import AsyncIterator, Dict, Any, Optional
+import asyncio
+import json
+import os
+
+STREAM_FORMAT_SSE = "sse"
+STREAM_FORMAT_NDJSON = "ndjson"
+STREAM_FORMATS = {STREAM_FORMAT_SSE, STREAM_FORMAT_NDJSON}
+
+MEDIA_TYPES = {
+    STREAM_FORMAT_SSE: "text/event-stream",
+    STREAM_FORMAT_NDJSON: "application/x-ndjson",
+}
+
+FLUSH_INTERVAL_SEC = float(os.getenv("STREAM_FLUSH_MS", "30")) / 1000
+MAX_FRAME_CHARS = int(os.getenv("STREAM_MAX_FRAME_CHARS", "512"))
+HEARTBEAT_SEC = float(os.getenv("STREAM_HEARTBEAT_SEC", "15"))
+
+SSE_HEARTBEAT = ": ping\n\n"
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """Pick the stream format: explicit flag first, then the Accept header, else legacy NDJSON."""
+    if requested and requested.lower() in STREAM_FORMATS:
+        return requested.lower()
+    if accept and "text/event-stream" in accept.lower():
+        return STREAM_FORMAT_SSE
+    return STREAM_FORMAT_NDJSON
+
+
+def stream_headers(fmt: str) -> Dict[str, str]:
+    """Response headers that keep proxies from buffering the stream."""
+    headers = {"Cache-Control": "no-cache"}
+    if fmt == STREAM_FORMAT_SSE:
+        headers["X-Accel-Buffering"] = "no"
+    return headers
+
+
+def encode_event(payload: Dict[str, Any], fmt: str) -> str:
+    """Serialize one event in the negotiated wire format.
+
+    NDJSON keeps json.dumps' default ASCII escaping so legacy consumers get the
+    same bytes as before; SSE frames carry raw UTF-8.
+    """
+    if fmt == STREAM_FORMAT_SSE:
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps(payload) + "\n"
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    flush_interval: float = FLUSH_INTERVAL_SEC,
+    max_frame_chars: int = MAX_FRAME_CHARS,
+    heartbeat_interval: Optional[float] = HEARTBEAT_SEC,
+) -> AsyncIterator[Optional[str]]:
+    """Group tokens into frames by time window or size.
+
+    Yields joined token strings. When ``heartbeat_interval`` is set and nothing
+    has been emitted for that long, yields ``None`` so the caller can send a
+    keep-alive.
+    """
+    loop = asyncio.get_running_loop()
+    it = tokens.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    buf = []
+    size = 0
+    deadline = 0.0
+    last_emit = loop.time()
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+
+            now = loop.time()
+            if buf:
+                timeout: Optional[float] = max(deadline - now, 0.0)
+            elif heartbeat_interval:
+                timeout = max(last_emit + heartbeat_interval - now, 0.0)
+            else:
+                timeout = None
+
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if pending in done:
+                try:
+                    token = pending.result()
+                except StopAsyncIteration:
+                    pending = None
+                    break
+                pending = None
+                if not token:
+                    continue
+                if not buf:
+                    deadline = loop.time() + flush_interval
+                buf.append(token)
+                size += len(token)
+                if size < max_frame_chars:
+                    continue
+
+            if buf:
+                yield "".join(buf)
+                buf, size = [], 0
+            else:
+                yield None
+            last_emit = loop.time()
+
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -1,4 +1,6 @@
-﻿CREATE EXTENSION IF NOT EXISTS vector;
+﻿-- Generated by agents/pgvector_store.py render_schema() (768-dim, HNSW).
+-- Re-render for a different PGVECTOR_DIM / PGVECTOR_INDEX instead of editing by hand.
+CREATE EXTENSION IF NOT EXISTS vector;
 
 CREATE TABLE IF NOT EXISTS documents (
     id SERIAL PRIMARY KEY,
@@ -8,22 +10,46 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- One partition per agent keeps each ANN index small and lets agent-scoped
+-- searches touch a single partition.
 CREATE TABLE IF NOT EXISTS chunks (
-    id SERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
     document_id INT REFERENCES documents(id) ON DELETE CASCADE,
+    agent_role TEXT NOT NULL,
     content TEXT,
-    embedding vector(1536),
+    embedding vector(768),
     chunk_index INT,
     metadata JSONB,
     token_count INT,
-    created_at TIMESTAMP DEFAULT NOW()
-);
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (agent_role, id)
+) PARTITION BY LIST (agent_role);
+
+CREATE TABLE IF NOT EXISTS chunks_air PARTITION OF chunks FOR VALUES IN ('air');
+CREATE TABLE IF NOT EXISTS chunks_ceo PARTITION OF chunks FOR VALUES IN ('ceo');
+CREATE TABLE IF NOT EXISTS chunks_cfo PARTITION OF chunks FOR VALUES IN ('cfo');
+CREATE TABLE IF NOT EXISTS chunks_clo PARTITION OF chunks FOR VALUES IN ('clo');
+CREATE TABLE IF NOT EXISTS chunks_cmo PARTITION OF chunks FOR VALUES IN ('cmo');
+CREATE TABLE IF NOT EXISTS chunks_coo PARTITION OF chunks FOR VALUES IN ('coo');
+CREATE TABLE IF NOT EXISTS chunks_cos PARTITION OF chunks FOR VALUES IN ('cos');
+CREATE TABLE IF NOT EXISTS chunks_cto PARTITION OF chunks FOR VALUES IN ('cto');
+CREATE TABLE IF NOT EXISTS chunks_sec PARTITION OF chunks FOR VALUES IN ('sec');
+CREATE TABLE IF NOT EXISTS chunks_default PARTITION OF chunks DEFAULT;
+
+CREATE INDEX IF NOT EXISTS chunks_embedding_idx ON chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX IF NOT EXISTS chunks_document_idx ON chunks (document_id);
 
-CREATE OR REPLACE FUNCTION match_chunks(query_embedding vector(1536), match_count int)
-RETURNS TABLE(id int, content text, similarity float)
-AS }
-    SELECT id, content, 1 - (embedding <=> query_embedding) AS similarity
-    FROM chunks
-    ORDER BY embedding <-> query_embedding
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector(768),
+    match_count int,
+    agent_filter text DEFAULT NULL
+)
+RETURNS TABLE(id bigint, document_id int, content text, similarity float)
+LANGUAGE sql STABLE
+AS $$
+    SELECT c.id, c.document_id, c.content, 1 - (c.embedding <=> query_embedding) AS similarity
+    FROM chunks c
+    WHERE agent_filter IS NULL OR c.agent_role = agent_filter
+    ORDER BY c.embedding <=> query_embedding
     LIMIT match_count;
-} LANGUAGE sql STABLE;
+$$;